@@ -1,11 +1,37 @@
 __version__ = "1.00.05"
 DAT_VERSION = f"{__version__} (2024-06-20)"
 
+import importlib
 import __main__ as main
-from .dat import DatManager, _DAT_MOUNT_COMMANDS
+from .dat import DatManager, _DAT_MOUNT_COMMANDS, _DAT_AUTO_RELOAD
 from .do_fn import DoManager, do_argv
 from .dat import Dat, DatContainer
-from . import dat_tools
+from . import dat_pipeline
+from . import dat_bench
+from . import dat_server
+from . import dat_batch
+from . import dat_sweep
+from . import dat_scheduler
+from . import dat_workers
+from . import dat_queue
+from . import dat_cost
+from . import dat_speculate
+from . import dat_capture
+from . import dat_metric_cache
+
+
+def __getattr__(name: str):
+    """Imports 'dat_tools' (and 'dat_columns' and 'dat_stream') on first use, since
+    they import pandas which is slow to load, and most dat commands (and all
+    forwarded to a 'dat --server') skip them."""
+    if name in ("dat_tools", "dat_columns", "dat_stream"):
+        return importlib.import_module("." + name, __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _cmd_list(prefix: str = ""):
+    from .dat_tools import cmd_list
+    return cmd_list(prefix)
 
 
 if not hasattr(main, "NO_DAT_DVC_INIT"):
@@ -13,14 +39,16 @@ if not hasattr(main, "NO_DAT_DVC_INIT"):
     do = Dat.manager.do = DoManager()  # not available during load of do_fn
 
     from .dat import Dat, DatContainer
-    from . import dat_tools
 
     cmds = Dat.manager.config.get(_DAT_MOUNT_COMMANDS, [])
     do.mount_all(cmds, relative_to=Dat.manager.folder)
-    do.mount(module=dat_tools, at="dat_tools")
-    do.mount(module=dat_tools, at="dt")
-    do.mount(value=dat_tools.cmd_list, at="dt.list")
-    do.mount(value=dat_tools.cmd_list, at="dat_tools.list")
+    do.mount(module="dvc_dat.dat_tools", at="dat_tools")  # Imported on first use
+    do.mount(module="dvc_dat.dat_tools", at="dt")
+    do.mount(value=_cmd_list, at="dt.list")
+    do.mount(value=_cmd_list, at="dat_tools.list")
+    do.mount(module=dat_bench, at="dat_bench")
+    do.mount(value=dat_bench.BENCH_SPEC, at="bench")
+    do.auto_reload = bool(Dat.manager.config.get(_DAT_AUTO_RELOAD, False))
 
 
 __all__ = [
@@ -32,4 +60,18 @@ __all__ = [
     "do",
     "do_argv",
     "dat_tools",
+    "dat_pipeline",
+    "dat_bench",
+    "dat_server",
+    "dat_batch",
+    "dat_sweep",
+    "dat_scheduler",
+    "dat_workers",
+    "dat_queue",
+    "dat_cost",
+    "dat_speculate",
+    "dat_capture",
+    "dat_metric_cache",
+    "dat_columns",
+    "dat_stream",
 ]
@@ -1,11 +1,25 @@
 #!/usr/bin/env python
 import os
 import sys
-from dvc_dat import do_argv, Dat, DAT_VERSION
+from dvc_dat import do_argv, Dat, DAT_VERSION, dat_server
 
 
 def main():
     argv = list(sys.argv)
+    if (code := dat_server.forward(argv)) is not None:
+        sys.exit(code)
+    return start(argv)
+
+
+def start(argv):
+    """Runs 'argv' in-process (after dvc_dat_client found no server for it)."""
+    if len(argv) == 2 and argv[1] == "--server":
+        return dat_server.serve()
+    else:
+        return run(argv)
+
+
+def run(argv):
     if len(argv) == 2 and argv[1] == "--info":
         print("\n# -- Dat Configuration Info -- ")
         print(f"# Dat version      : {DAT_VERSION}")
@@ -1,19 +1,30 @@
 import json
 import os
+import time
+import pickle
 import shutil
 import weakref
+import tempfile
+import itertools
+from collections import Counter
 from abc import abstractmethod
 from datetime import datetime
 from enum import Enum, auto
 from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union, Callable, \
-    Iterable
+    Iterable, Set, Tuple
 import yaml
+from .dat_trace import traced
 # from .dvc_dat_config import SPEC_JSON, SPEC_YAML
 
 _RESULT_JSON = "_results_.json"
+_CHECKPOINT_PKL = "_checkpoint_.pkl"
+_CHECKPOINT_JSON = "_checkpoint_.json"   # The run time and attempt of the checkpoint
 _DAT_BASE = "dat.base"
 _DAT_CLASS = "dat.class"
+_DAT_PATH = "dat.path"
 _DAT_PATH_OVERWRITE = "dat.path_overwrite"
+_DAT_EPHEMERAL = "dat.ephemeral"
+_EPHEMERAL_ROOTS = ["/dev/shm", tempfile.gettempdir()]   # tmpfs first, if present
 _DEFAULT_PATH_TEMPLATE = "anonymous/Dat{unique}"
 _NO_ARG = "$$NO_ARG$$"
 
@@ -24,6 +35,7 @@ _DAT_CONFIG_YAML = ".datconfig.yaml"
 _DAT_FOLDER = "sync_folder"
 _DAT_FOLDERS = "dat_folders"
 _DAT_MOUNT_COMMANDS = "mount_commands"
+_DAT_AUTO_RELOAD = "auto_reload"
 _DEFAULT_DAT_FOLDER = "dat_data"
 
 
@@ -70,6 +82,8 @@ class Dat(object):
       .copy() .................... Copies the dat to a new location
       .move() .................... Moves the dat to a new location
       .save([path]) .............. Saves persistable to disk (optionally sets its path)
+      .checkpoint(state) ......... Saves the state of a run, for a resumed run
+      .restore([default]) ........ Returns the last state saved by checkpoint
 
     Static Utility Methods
       .get(Dat|dict, [key1, key2, ...])
@@ -95,6 +109,7 @@ class Dat(object):
     _path: str      # The immutable absolute path of this Dat
     _spec: Spec     # The immutable spec of this Dat
     _result: Spec   # The mutable state or result of this Dat
+    _run_clock: Optional[Tuple[float, float, int]]  # Start, prior seconds, & attempt
 
     @staticmethod
     def get(source: Union["Dat", dict],
@@ -176,6 +191,8 @@ class Dat(object):
                  _no_backing: bool = False):
         super().__init__()
         self._result = {}
+        self._ephemeral = False
+        self._run_clock = None
         if _no_backing:
             self._path, self._spec = path, spec
         else:
@@ -198,9 +215,16 @@ class Dat(object):
         return self._result
 
     def get_path(self) -> str:
-        """Returns the absolute path of this Dat."""
+        """Returns the absolute path of this Dat.  (An ephemeral Dat's folder is only
+        created, on tmpfs, once its path is asked for.)"""
+        if self._ephemeral and not os.path.isdir(self._path):
+            os.makedirs(self._path, exist_ok=True)
         return self._path
 
+    def is_ephemeral(self) -> bool:
+        """Returns True if this Dat is only in memory (see create_ephemeral)."""
+        return self._ephemeral
+
     def get_path_name(self) -> str:
         """Returns the name (relative path) of this Dat."""
         return Dat.manager.get_path_name(self._path)
@@ -213,11 +237,67 @@ class Dat(object):
         """Flags a Dat to have a version of its folder's contents saved
         to in the backing store.
         """
+        if self._ephemeral:
+            return      # Its results are kept in memory until it is persisted
         if True or self._result:
             with open(os.path.join(self._path, _RESULT_JSON), "w") as out:
                 txt = json.dumps(self._result, indent=2)
                 out.write(txt)
 
+    def checkpoint(self, state: Any) -> None:
+        """Atomically saves 'state' (any picklable value) in this Dat's folder, so
+        that when a failed run is resumed ('dat --resume') 'restore' returns it.
+        (A run that succeeds removes its checkpoint, so the next run starts afresh.)"""
+        started, prior, attempt = self._run_clock or (time.time(), 0.0, 0)
+        info = {"run_seconds": prior + time.time() - started, "attempt": attempt}
+        self._write_atomically(_CHECKPOINT_PKL, pickle.dumps(
+            state, protocol=pickle.HIGHEST_PROTOCOL))
+        self._write_atomically(_CHECKPOINT_JSON, json.dumps(info).encode())
+
+    def restore(self, default: Any = None) -> Any:
+        """Returns the state last saved by 'checkpoint', or 'default' if none was."""
+        try:
+            with open(os.path.join(self._path, _CHECKPOINT_PKL), "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return default
+
+    def get_checkpoint(self) -> Dict[str, Any]:
+        """Returns the last checkpoint as {"state":, "run_seconds":, "attempt":}
+        (the seconds this Dat had been run for in all, and the number of the run, when
+        it was saved), or {} if there is none."""
+        info = self.get_checkpoint_info()
+        return {"state": self.restore(), **info} if info else {}
+
+    def get_checkpoint_info(self) -> Dict[str, Any]:
+        """Returns the {"run_seconds":, "attempt":} of the last checkpoint (without
+        loading its state), or {} if there is none."""
+        try:
+            with open(os.path.join(self._path, _CHECKPOINT_JSON)) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def clear_checkpoint(self) -> None:
+        """Removes the last checkpoint (if any)."""
+        for name in (_CHECKPOINT_JSON, _CHECKPOINT_PKL):
+            try:
+                os.remove(os.path.join(self._path, name))
+            except FileNotFoundError:
+                pass
+
+    def _write_atomically(self, name: str, data: bytes) -> None:
+        fd, temp = tempfile.mkstemp(dir=self.get_path(), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp, os.path.join(self._path, name))
+        except BaseException:
+            os.remove(temp)
+            raise
+
     def delete(self, *, must_exist=True) -> bool:
         """Deletes the folder and its contents from the filesystem.
         This deletion will also be reflected as a deletion pushed to git.
@@ -232,6 +312,21 @@ class Dat(object):
                 return False
         return True
 
+    def persist(self, path: str = None, *, overwrite: bool = False) -> "Dat":
+        """Saves an ephemeral Dat (its spec, results, and any files in its folder) as
+        a new Dat at 'path' (by default its spec's 'dat.path'), returning the new Dat.
+        """
+        if not self._ephemeral:
+            raise Exception(f"DAT PERSIST: {self!r} is not ephemeral.")
+        path = path or Dat.get(self._spec, _DAT_PATH, None)
+        dat = Dat.manager.create(path=path, spec=self._spec, overwrite=overwrite)
+        if os.path.isdir(self._path):
+            shutil.copytree(self._path, dat.get_path(), dirs_exist_ok=True)
+            shutil.rmtree(self._path)
+        dat._result = self._result
+        dat.save()
+        return dat
+
     def copy(self, new_path: str) -> "Dat":
         """Copies this Dat to a new location."""
         new_path_ = Dat.manager.resolve_path(new_path)
@@ -375,6 +470,9 @@ class DatManager(object):
     DAT_ADDS_LIST = ".dat_adds.txt"  # List of Dat names to be updated in DVC
 
     def __init__(self, folder=None):
+        self.counters = Counter()   # Usage counts and times (in seconds), see stats()
+        self.claimed_paths: Set[str] = set()   # Created by expand_dat_path for create
+        self._ephemeral_ids = itertools.count(1)
         self.folder = folder or os.getcwd()
         while True:
             if os.path.exists(config := os.path.join(self.folder, _DAT_CONFIG_JSON)):
@@ -416,6 +514,7 @@ class DatManager(object):
             path = None  # os.path.join(os.getcwd(), default)
         return path
 
+    @traced("DatManager.create", arg="path")
     def create(self, *,
                path: str = None,
                spec: Spec = None,
@@ -445,17 +544,38 @@ class DatManager(object):
         spec: Dict = spec or {}
         path: str = self.resolve_path(
             self.expand_dat_path(path, overwrite=overwrite))
-        if not os.path.exists(path):
-            os.makedirs(path)
+        made = path in self.claimed_paths or not os.path.exists(path)
+        self.claimed_paths.discard(path)
         try:
-            txt = yaml.safe_dump(spec, indent=2)
-        except Exception as e:
-            raise Exception(f"Non-JSON data in Dat.spec: {e}\nSPEC={spec}")
-        with open(os.path.join(path, SPEC_YAML), "w") as out:
-            out.write(txt)
-            out.write("\n")
+            if not os.path.exists(path):
+                os.makedirs(path)
+            try:
+                txt = yaml.safe_dump(spec, indent=2)
+            except Exception as e:
+                raise Exception(f"Non-JSON data in Dat.spec: {e}\nSPEC={spec}")
+            with open(os.path.join(path, SPEC_YAML), "w") as out:
+                out.write(txt)
+                out.write("\n")
+        except BaseException:
+            if made:     # Releases the (claimed) folder for later creates
+                shutil.rmtree(path, ignore_errors=True)
+            raise
         return self._make_dat_instance(path, spec)
 
+    def create_ephemeral(self, *, spec: Spec = None) -> "Dat":
+        """Creates a Dat that is only in memory: nothing is written for it, saving it
+        leaves its results in memory, and it is not cached by path.  Its folder is
+        only created (on tmpfs when available) if its path is asked for, and it can
+        be saved as a regular Dat with 'dat.persist()'.  ('delete' removes its folder.)
+        """
+        root = next(r for r in _EPHEMERAL_ROOTS if os.path.isdir(r))
+        name = f"dat_ephemeral_{os.getpid()}_{next(self._ephemeral_ids)}"
+        dat = self._make_dat_instance(os.path.join(root, name), spec or {},
+                                      cache=False)
+        dat._ephemeral = True
+        return dat
+
+    @traced("DatManager.load", arg="name_or_path")
     def load(self, name_or_path: str, *,
              cwd: Optional[str] = None) -> T:
         """Loads (Instantiates) this Dat from disk.
@@ -482,16 +602,21 @@ class DatManager(object):
         else:
             raise KeyError(f"LOAD_DAT: Could not find {name_or_path!r}")
         if path in self.dat_cache:
+            self.counters["dat_cache_hits"] += 1
             return self.dat_cache[path]
+        self.counters["dat_cache_misses"] += 1
         path = os.path.abspath(path)
         try:
-            spec = ()
+            spec, start = (), time.perf_counter()
             if os.path.exists(fpath := os.path.join(path, SPEC_JSON)):
                 with open(fpath) as f:
                     spec = json.load(f)
             elif os.path.exists(fpath := os.path.join(path, SPEC_YAML)):
                 with open(fpath) as f:
                     spec = yaml.safe_load(f)
+            if spec != ():
+                self.counters["spec_files_parsed"] += 1
+                self.counters["spec_parse_time"] += time.perf_counter() - start
         except Exception as e:
             if not os.path.exists(path):
                 raise KeyError(F"LOAD_DAT: Folder not found {path!r}.")
@@ -500,12 +625,19 @@ class DatManager(object):
         if spec == ():
             raise KeyError(F"LOAD_DAT: Spec file missing for {path!r}.")
         dat = self._make_dat_instance(path, spec)
+        self.load_results(dat)
+        return dat
+
+    @staticmethod
+    def load_results(dat: "Dat") -> "Spec":
+        """(Re)reads the results of 'dat' from its folder, e.g. after another process
+        has run it.  Leaves the results unchanged if none have been saved."""
         try:
-            with open(os.path.join(path, _RESULT_JSON)) as f:
+            with open(os.path.join(dat.get_path(), _RESULT_JSON)) as f:
                 dat._result = json.load(f)
         except FileNotFoundError:
             pass
-        return dat
+        return dat._result
 
     @staticmethod
     def exists(path: str) -> bool:
@@ -544,25 +676,48 @@ class DatManager(object):
                 **(variables or {})}
             expanded_path = os.path.join(self.sync_folder,
                                          path_spec.format_map(format_vars))
-            if not os.path.exists(expanded_path):
+            if "{unique}" in path_spec and not overwrite:
+                try:    # Creating the folder claims it, even vs. other threads/processes
+                    os.makedirs(expanded_path)
+                except FileExistsError:
+                    count += 1
+                    continue
+                self.claimed_paths.add(expanded_path)
+                return expanded_path
+            elif expanded_path in self.claimed_paths:   # Claimed by an earlier expansion
+                return expanded_path                    # (and released by create)
+            elif not os.path.exists(expanded_path):
                 return expanded_path
             elif overwrite:
                 shutil.rmtree(expanded_path)
                 return expanded_path
-            elif "{unique}" not in path_spec:
-                raise Exception(f"DAT: Create failed, dir {expanded_path!r} exists")
             else:
-                count += 1
+                raise Exception(f"DAT: Create failed, dir {expanded_path!r} exists")
 
     def resolve_path(self, name: str) -> str:
+        self.counters["resolve_path_calls"] += 1
         for folder in self.sync_folders:
             path = os.path.join(folder, name)
+            self.counters["resolve_path_probes"] += 1
             if os.path.exists(os.path.join(path, SPEC_JSON)) or \
                     os.path.exists(os.path.join(path, SPEC_YAML)):
                 return path
         return os.path.join(self.sync_folder, name)
 
-    def _make_dat_instance(self, path: str, spec: Dict) -> "Dat":
+    def evict(self, path: str) -> None:
+        """Removes the Dat at 'path' from the cache, so its next load reads it from
+        disk (e.g. in a warm worker, after the Dat was recreated or rerun)."""
+        self.dat_cache.pop(path, None)
+        self.dat_cache.pop(os.path.abspath(path), None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns counts of Dat cache hits/misses, spec files parsed (and the seconds
+        spent parsing them), and resolve_path calls (and folders probed)."""
+        keys = ["dat_cache_hits", "dat_cache_misses", "spec_files_parsed",
+                "spec_parse_time", "resolve_path_calls", "resolve_path_probes"]
+        return {k: round(self.counters[k], 6) for k in keys}
+
+    def _make_dat_instance(self, path: str, spec: Dict, *, cache=True) -> "Dat":
         from . import Dat
         klass_name = Dat.get(spec, _DAT_CLASS, "Dat")
         klass = self._find_subclass_by_name(Dat, klass_name)
@@ -571,7 +726,8 @@ class DatManager(object):
 
         dat = klass(path=path, spec=spec, _no_backing=True)
 
-        self.dat_cache[path] = dat
+        if cache:
+            self.dat_cache[path] = dat
         return dat
 
     def _find_subclass_by_name(self, klass, name):
@@ -0,0 +1,116 @@
+import sys
+import json
+import time
+import shlex
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Tuple
+
+from dvc_dat.do_fn import DoManager, _do_argv, _parse_argv
+from dvc_dat.dat_sweep import describe_result
+
+"""
+Runs many dat commands in one warm process (see 'dat --batch').
+
+    dat --batch nightly.txt --jobs 8 --summary nightly.jsonl
+    grep hello cmds.txt | dat --batch -
+
+BATCH FILES
+- Each line is one command, either as its dat argv:
+      my_cmd --set dat.title=Nightly arg1 --kw value
+  (a leading 'dat' or 'do' is ignored, so shell script lines can be used as is)
+- or as a JSON object with any of the keys:
+      {"args": ["my_cmd", "arg1"], "overrides": {"dat": {"title": "Nightly"}},
+       "kwargs": {"kw": "value"}}
+- Blank lines and lines starting with '#' are skipped.
+
+SUMMARY
+- Each line gets a summary entry with its line number, status ("ok" or
+  "failed"), seconds taken, and its result (or its error).  A table of these
+  is printed at the end, and the entries are written as JSON lines into the
+  'summary' file if one is given.
+- With 'jobs' > 1 lines run in parallel threads, so their output interleaves.
+"""
+
+OK = "ok"
+FAILED = "failed"
+_CLI_ONLY_FLAGS = ("jobs", "summary")    # (Besides the dat options before the command)
+
+
+def read_batch(source: str) -> List[Tuple[int, str]]:
+    """Returns the (line number, text) of each command in a batch file (or stdin)."""
+    if source == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(source) as f:
+            lines = f.read().splitlines()
+    return [(number, line.strip()) for number, line in enumerate(lines, 1)
+            if line.strip() and not line.strip().startswith("#")]
+
+
+def parse_batch_line(text: str) -> Tuple[Dict, List[str], Dict[str, Any]]:
+    """Returns the (overrides, args, kwargs) of one batch line."""
+    if text.startswith("{"):
+        entry = json.loads(text)
+        overrides, args = entry.get("overrides", {}), entry.get("args", [])
+        kwargs = entry.get("kwargs", {})
+        args = shlex.split(args) if isinstance(args, str) else list(args)
+    else:
+        argv = shlex.split(text)
+        if argv and argv[0] in ("dat", "do"):
+            argv = argv[1:]
+        overrides, args, kwargs, options = _parse_argv(argv)
+        if options:
+            raise Exception(f"BATCH: --{next(iter(options))} cannot be used within "
+                            f"a batch line")
+    if flags := [f for f in _CLI_ONLY_FLAGS if f in kwargs]:
+        raise Exception(f"BATCH: --{flags[0]} cannot be used within a batch line")
+    return overrides, args, kwargs
+
+
+def run_batch(source: str, *, jobs: int = 1, summary: str = None,
+              do: DoManager = None) -> List[Dict[str, Any]]:
+    """Runs each command of a batch file, 'jobs' at a time, and returns a summary
+    entry for each one."""
+    if do is None:
+        from dvc_dat import do
+    lines = read_batch(source)
+
+    def run_line(line: Tuple[int, str]) -> Dict[str, Any]:
+        number, text = line
+        start = time.time()
+        entry: Dict[str, Any] = {"line": number, "command": text}
+        try:
+            overrides, args, kwargs = parse_batch_line(text)
+            result = _do_argv(do, overrides, args, kwargs)
+            entry.update(status=OK, result=describe_result(result))
+        except Exception as e:
+            entry.update(status=FAILED, error=f"{type(e).__name__}: {e}")
+        entry["seconds"] = round(time.time() - start, 3)
+        return entry
+
+    if jobs > 1:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            entries = list(pool.map(
+                lambda line: contextvars.copy_context().run(run_line, line), lines))
+    else:
+        entries = [run_line(line) for line in lines]
+    if summary:
+        with open(summary, "w") as out:
+            for entry in entries:
+                out.write(json.dumps(entry) + "\n")
+    print(summary_table(entries))
+    return entries
+
+
+def summary_table(entries: Iterable[Dict[str, Any]]) -> str:
+    """Returns the summary entries of a batch as a short printable table."""
+    entries = list(entries)
+    failed = sum(e["status"] != OK for e in entries)
+    lines = [f"# Batch summary: {len(entries) - failed} ok, {failed} failed",
+             f"#  {'line':>5}  {'status':6} {'seconds':>8}  result"]
+    for e in entries:
+        outcome = e["result"] if e["status"] == OK else e["error"]
+        lines.append(f"#  {e['line']:5d}  {e['status']:6} {e['seconds']:8.3f}  "
+                     f"{str(outcome)[:60]}")
+    return "\n".join(lines)
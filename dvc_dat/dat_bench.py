@@ -0,0 +1,220 @@
+import os
+import sys
+import json
+import time
+import shutil
+import functools
+import tempfile
+import statistics
+import subprocess
+from typing import Any, Callable, Dict, List
+
+import yaml
+
+from dvc_dat.dat import Dat, DatContainer, SPEC_JSON, SPEC_YAML
+
+"""
+Benchmarks for the hot paths of dvc_dat, run over a synthetic tree of Dats that is
+built in a temporary folder within the sync folder (so Dats are resolved and loaded
+by their names, as they are in use) and removed afterwards.
+
+    dat bench                                 # Runs the benchmarks with defaults
+    dat --sets "bench.dats=2000, bench.format=json" bench
+    dat --set bench.save_baseline=true bench  # Also saves this run as the baseline
+
+Each run is itself a dated Dat (under "benchmarks/" in the sync folder) whose
+results hold the timings, so 'dat_report' over the "benchmarks" container with
+the 'dat_bench.bench_point' metric charts the timings over time.
+
+API
+---
+- make_sync_folder(root, dats=, depth=, spec_keys=, payload_bytes=, fmt=)
+- run_benchmarks(dat) ...... The 'dat.do' fn of the "bench" command
+- bench_point(dat) ......... A point_fn returning the timings of one bench Dat
+
+PARAMETERS (the "bench" section of the spec)
+    dats .......... Number of leaf Dats in the synthetic sync folder
+    depth ......... Nesting depth of the DatContainers holding the leaves
+    spec_keys ..... Number of keys in each leaf's spec
+    payload_bytes . Size of the payload file written into each leaf
+    format ........ "yaml" or "json" spec files
+    repeat ........ Number of times each benchmark is timed (the median is kept)
+    cli_runs ...... Number of timed in-process 'dat' CLI startups (0 to skip)
+    baseline ...... Name of the bench Dat that timings are compared against
+    tolerance ..... Ratio over the baseline at which a timing is a regression
+    save_baseline . If true, this run is copied to become the new baseline
+"""
+
+BENCH_SPEC = {
+    "dat": {
+        "do": "dat_bench.run_benchmarks",
+        "path": "benchmarks/{YYYY}-{MM}-{DD}_{HH}{mm}{unique}",
+    },
+    "bench": {
+        "dats": 500,
+        "depth": 2,
+        "spec_keys": 20,
+        "payload_bytes": 1024,
+        "format": "yaml",
+        "repeat": 3,
+        "cli_runs": 3,
+        "baseline": "benchmarks/baseline",
+        "tolerance": 1.25,
+        "save_baseline": False,
+    }
+}
+_BENCH = "bench"
+_BENCH_TIMINGS = "bench.timings"
+_BENCH_REGRESSIONS = "bench.regressions"
+
+
+def make_sync_folder(root: str, *,
+                     dats: int = 500,
+                     depth: int = 2,
+                     spec_keys: int = 20,
+                     payload_bytes: int = 1024,
+                     fmt: str = "yaml") -> List[str]:
+    """Creates a synthetic tree of Dats under 'root' (itself a DatContainer) whose
+    leaves are spread over 'depth' levels of nested DatContainers.
+    Returns the paths of the leaf Dats."""
+    container_spec = {"dat": {"class": "DatContainer"}}
+    _write_spec(root, container_spec, fmt)
+    fanout = max(2, round(dats ** (1 / (depth + 1)))) if depth else 1
+    leaves = []
+    for i in range(dats):
+        folder, n = root, i
+        for level in range(depth):
+            folder = os.path.join(folder, f"group{n % fanout}")
+            n //= fanout
+            if not os.path.exists(folder):
+                _write_spec(folder, container_spec, fmt)
+        folder = os.path.join(folder, f"dat{i}")
+        spec = {"dat": {"kind": "Synthetic"}, "index": i,
+                "params": {f"key{k}": f"value{k}_{i}" for k in range(spec_keys)}}
+        _write_spec(folder, spec, fmt)
+        with open(os.path.join(folder, "payload.bin"), "wb") as f:
+            f.write(os.urandom(payload_bytes))
+        leaves.append(folder)
+    return leaves
+
+
+def run_benchmarks(dat: Dat) -> Dict[str, float]:
+    """Times the hot paths of dvc_dat over a synthetic sync folder, records the
+    timings into the results of 'dat', and flags regressions against the baseline."""
+    container_folder = os.path.dirname(dat.get_path())
+    if not Dat.manager.exists(container_folder):
+        _write_spec(container_folder, {"dat": {"class": "DatContainer"}}, "yaml")
+    from dvc_dat import DoManager
+    from dvc_dat.dat_tools import Cube, to_excel
+    params = dict(BENCH_SPEC[_BENCH], **(Dat.get(dat, _BENCH, None) or {}))
+    repeat, fmt = int(params["repeat"]), params["format"]
+    timings: Dict[str, float] = {}
+    scratch = tempfile.mkdtemp(prefix="dat_bench_", dir=Dat.manager.sync_folder)
+    try:
+        root = os.path.join(scratch, "sync")
+        leaves = make_sync_folder(root, dats=int(params["dats"]),
+                                  depth=int(params["depth"]),
+                                  spec_keys=int(params["spec_keys"]),
+                                  payload_bytes=int(params["payload_bytes"]), fmt=fmt)
+        names = [os.path.relpath(p, Dat.manager.sync_folder) for p in leaves]
+
+        def time_it(name: str, fn: Callable[[], Any],
+                    setup: Callable[[], Any] = None) -> None:
+            samples = []
+            for _ in range(repeat):
+                if setup:       # (Untimed)
+                    setup()
+                start = time.perf_counter()
+                fn()
+                samples.append(time.perf_counter() - start)
+            timings[name] = round(statistics.median(samples), 6)
+
+        uncached = functools.partial(_evict_cached_dats, scratch)  # Loads each repeat
+        time_it("load", lambda: [Dat.manager.load(n) for n in names], uncached)
+        time_it("resolve_path", lambda: [Dat.manager.resolve_path(n) for n in names])
+        time_it("get_dats", lambda: Dat.manager.load(root).get_dats(), uncached)
+        do_ = DoManager()
+        base_folder = os.path.join(scratch, "bases")
+        os.makedirs(base_folder)
+        for level in range(int(params["depth"]) + 2):
+            base = {f"key{k}": level for k in range(int(params["spec_keys"]))}
+            if level:
+                Dat.set(base, "dat.base", f"base{level - 1}")
+            with open(os.path.join(base_folder, f"base{level}.{fmt}"), "w") as f:
+                yaml.safe_dump(base, f) if fmt == "yaml" else json.dump(base, f)
+        do_.mount(folder=base_folder)
+        top = {"dat": {"base": f"base{int(params['depth']) + 1}"}}
+
+        def expand_cold():
+            do_.base_objects.clear()
+            do_.expanded_specs.clear()
+            do_.expand_spec(top)
+        time_it("expand_spec_cold", expand_cold)
+        time_it("expand_spec_warm", lambda: do_.expand_spec(top))
+        container: DatContainer = Dat.manager.load(root)
+        cube: List[Any] = []
+        time_it("cube", lambda: cube.append(Cube(dats=container, point_fns=[
+            lambda d: Dat.get(d, "index", 0), lambda d: Dat.get(d, "params", {})])))
+        df = cube[-1].get_df()
+        time_it("to_excel", lambda: to_excel(df, folder=scratch, title="bench",
+                                             verbose=False))
+        if cli_runs := int(params["cli_runs"]):
+            repeat = cli_runs
+            package_parent = os.path.dirname(os.path.dirname(__file__))
+            env = dict(os.environ, DAT_NO_SERVER="1", PYTHONPATH=os.pathsep.join(
+                filter(None, [package_parent, os.environ.get("PYTHONPATH")])))
+            time_it("cli_startup", lambda: subprocess.run(
+                [sys.executable, "-m", "dvc_dat"], env=env, check=False,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+        _evict_cached_dats(scratch)
+    Dat.set(dat.get_results(), _BENCH_TIMINGS, timings)
+    regressions = check_regressions(timings, params["baseline"],
+                                    float(params["tolerance"]))
+    Dat.set(dat.get_results(), _BENCH_REGRESSIONS, regressions)
+    dat.save()
+    for name, ratio in regressions.items():
+        print(f"# REGRESSION: {name!r} took {ratio:.2f}x its baseline time")
+    if str(params["save_baseline"]).lower() in ("true", "1", "yes"):
+        baseline_path = Dat.manager.resolve_path(params["baseline"])
+        if os.path.exists(baseline_path):
+            shutil.rmtree(baseline_path)
+        dat.copy(params["baseline"])
+    return timings
+
+
+def check_regressions(timings: Dict[str, float], baseline: str,
+                      tolerance: float) -> Dict[str, float]:
+    """Returns the ratio to the baseline's timing for each timing that exceeds the
+    baseline by more than 'tolerance' (nothing if there is no baseline)."""
+    if not baseline or not Dat.manager.exists(baseline):
+        return {}
+    prior = Dat.get(Dat.manager.load(baseline).get_results(), _BENCH_TIMINGS, {})
+    return {name: round(seconds / prior[name], 3) for name, seconds in timings.items()
+            if prior.get(name) and seconds > tolerance * prior[name]}
+
+
+def bench_point(dat: Dat) -> Dict[str, Any]:
+    """Point fn for 'dat_report' returning the run time and timings of a bench Dat."""
+    results = dat.get_results()
+    return {"run_at": Dat.get(results, "dat.run_at", ""),
+            **Dat.get(results, _BENCH_TIMINGS, {})}
+
+
+def _evict_cached_dats(folder: str) -> None:
+    """Removes the Dats within 'folder' from the Dat.manager cache."""
+    prefix = os.path.join(folder, "")
+    for path in list(Dat.manager.dat_cache.keys()):
+        if path == folder or path.startswith(prefix):
+            Dat.manager.dat_cache.pop(path, None)
+
+
+def _write_spec(folder: str, spec: Dict[str, Any], fmt: str) -> None:
+    os.makedirs(folder, exist_ok=True)
+    if fmt == "json":
+        with open(os.path.join(folder, SPEC_JSON), "w") as f:
+            json.dump(spec, f)
+    else:
+        with open(os.path.join(folder, SPEC_YAML), "w") as f:
+            yaml.safe_dump(spec, f)
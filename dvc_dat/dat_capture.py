@@ -0,0 +1,268 @@
+import os
+import sys
+import logging
+import threading
+import traceback
+import contextlib
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterator, Optional, Set, Tuple
+
+from dvc_dat.dat import Dat
+
+"""
+Captures the output of each Dat run whose spec sets 'dat.capture' into its folder,
+while still showing it on the console, so the output of parallel runs is kept apart
+and not lost.  (Capture is opt-in, since the logs are added to the Dat's folder.)
+
+    stdout.log ... What the run printed to sys.stdout
+    stderr.log ... What it printed to sys.stderr, its 'logging' records, and the
+                   traceback of its failure (if it failed)
+
+SPEC SECTION
+    dat:
+      capture:               # Or 'capture: true' to use these defaults
+        max_bytes: 10000000  # Size at which a log is rotated (or truncated)
+        backups: 1           # Rotated logs kept (stdout.log.1, ...); 0 truncates
+        buffer_bytes: 1000000  # Output buffered in memory; beyond it is dropped
+        console: true        # Also writes the output to the console
+
+CAPTURE
+- While a run is in progress sys.stdout and sys.stderr are replaced by streams that
+  send each write to the innermost run of the writing thread or task (tracked by a
+  contextvar, so threads started with a copied context and asyncio tasks work).
+- Writes only append to a bounded in-memory buffer, which a background thread
+  writes to the log files every 0.5 seconds, so chatty runs are not slowed by
+  file I/O.  Once the buffer is full, output is dropped until it is next written,
+  and the log notes how many bytes were dropped where they would have been (as it
+  does for output that could not be written to the log).
+- Log files are only created once the run has output, and are appended to by
+  later runs of the same Dat.
+- Ephemeral Dats (which have no folder) are not captured.
+- Output written by subprocesses and C extensions directly to file descriptors 1
+  and 2 is not captured.
+"""
+
+STDOUT_LOG = "stdout.log"
+STDERR_LOG = "stderr.log"
+MAX_BYTES = 10_000_000
+BACKUPS = 1
+BUFFER_BYTES = 1_000_000
+FLUSH_SECONDS = 0.5
+_DAT_CAPTURE = "dat.capture"
+_LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+_current_capture: ContextVar[Optional["_Capture"]] = \
+    ContextVar("dat_capture", default=None)
+
+
+class _LogFile(object):
+    """A log file fed from a bounded buffer, rotated or truncated at max_bytes."""
+
+    def __init__(self, path: str, *, max_bytes: int, backups: int,
+                 buffer_bytes: int):
+        self.path, self.max_bytes, self.backups = path, max_bytes, backups
+        self.buffer_bytes = buffer_bytes
+        self.chunks: Deque[bytes] = deque()
+        self.buffered = 0           # Bytes in 'chunks'
+        self.dropped = 0            # Bytes dropped since the last flush
+        self._file = None
+        self._closed = False
+        self._lock = threading.Lock()        # Guards the buffer
+        self._io_lock = threading.Lock()     # Guards the file, so flushes keep order
+
+    def write(self, text: str) -> None:
+        data = text.encode(errors="replace")
+        with self._lock:     # (Once dropping, so later output is not out of order)
+            if self.dropped or self.buffered + len(data) > self.buffer_bytes:
+                self.dropped += len(data)
+            else:
+                self.chunks.append(data)
+                self.buffered += len(data)
+
+    def flush(self) -> None:
+        with self._io_lock:
+            self._flush()
+
+    def close(self) -> None:
+        with self._io_lock:
+            self._flush()
+            self._closed = True
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    def _flush(self) -> None:
+        if self._closed:     # e.g. a flush of the flusher thread after the run
+            return
+        with self._lock:
+            data, dropped = b"".join(self.chunks), self.dropped
+            self.chunks.clear()
+            self.buffered = self.dropped = 0
+        lost = len(data) + dropped
+        if dropped:
+            data += f"\n[... {dropped} bytes of output dropped ...]\n".encode()
+        try:
+            if data:
+                self._append(data)
+        except OSError:      # Noted as dropped by the next flush that can write
+            with self._lock:
+                self.dropped += lost
+            raise
+
+    def _append(self, data: bytes) -> None:
+        if self._file is None:
+            self._file = open(self.path, "ab")
+        size = self._file.tell()
+        if size + len(data) <= self.max_bytes:
+            pass
+        elif self.backups > 0:
+            if size > 0:
+                self._rotate()
+        elif size >= self.max_bytes:     # Already truncated
+            return
+        else:
+            data = data[:self.max_bytes - size] + \
+                f"\n[... truncated at {self.max_bytes} bytes ...]\n".encode()
+        self._file.write(data)
+        self._file.flush()
+
+    def _rotate(self) -> None:
+        self._file.close()
+        for n in range(self.backups, 0, -1):
+            source = self.path if n == 1 else f"{self.path}.{n - 1}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{n}")
+        self._file = open(self.path, "ab")
+
+
+class _Capture(object):
+    """The stdout and stderr logs of one Dat run."""
+
+    def __init__(self, folder: str, config: Dict[str, Any]):
+        options = {"max_bytes": int(config.get("max_bytes", MAX_BYTES)),
+                   "backups": int(config.get("backups", BACKUPS)),
+                   "buffer_bytes": int(config.get("buffer_bytes", BUFFER_BYTES))}
+        self.console = config.get("console", True) not in (False, "false")
+        self.logs = {"stdout": _LogFile(os.path.join(folder, STDOUT_LOG), **options),
+                     "stderr": _LogFile(os.path.join(folder, STDERR_LOG), **options)}
+
+    def flush(self) -> None:
+        for log in self.logs.values():
+            log.flush()
+
+    def close(self) -> None:
+        for log in self.logs.values():
+            log.close()
+
+
+class _TeeStream(object):
+    """Replaces sys.stdout or sys.stderr, sending writes to the current capture and
+    (unless it has 'console' off) to the replaced stream."""
+
+    def __init__(self, name: str, stream: Any):
+        self.name, self.stream = name, stream
+
+    def write(self, text: str) -> int:
+        capture = _current_capture.get()
+        if capture is None:
+            return self.stream.write(text)
+        capture.logs[self.name].write(text)
+        if capture.console:
+            self.stream.write(text)
+        return len(text)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+    def __getattr__(self, name: str) -> Any:   # e.g. fileno, isatty, encoding
+        return getattr(self.stream, name)
+
+
+class _CaptureHandler(logging.Handler):
+    """Writes log records into the stderr log of the current capture."""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if (capture := _current_capture.get()) is None:
+            return
+        try:
+            line = self.format(record) + "\n"
+        except Exception:    # noqa -- Like logging, never fail the run
+            return
+        capture.logs["stderr"].write(line)
+        others = [h for h in logging.getLogger().handlers if h is not self]
+        if capture.console and not others and record.levelno >= logging.WARNING:
+            sys.__stderr__.write(line)   # What logging's 'lastResort' would show
+
+
+_active: Set[_Capture] = set()
+_lock = threading.Lock()
+_flusher: Optional[Tuple[threading.Thread, threading.Event]] = None   # & its stop
+_handler = _CaptureHandler()
+_handler.setFormatter(logging.Formatter(_LOG_FORMAT))
+
+
+@contextlib.contextmanager
+def capture_output(dat: Dat) -> Iterator[Optional[_Capture]]:
+    """Captures the output of a Dat run (see above) into the Dat's folder."""
+    config = Dat.get(dat, _DAT_CAPTURE, False)
+    if config in (False, None, "false") or dat.is_ephemeral():
+        yield None
+        return
+    capture = _Capture(dat.get_path(), config if isinstance(config, dict) else {})
+    _start(capture)
+    token = _current_capture.set(capture)
+    try:
+        yield capture
+    except BaseException:
+        capture.logs["stderr"].write(traceback.format_exc())
+        raise
+    finally:
+        _current_capture.reset(token)
+        _stop(capture)
+
+
+def _start(capture: _Capture) -> None:
+    global _flusher
+    with _lock:
+        if not _active:
+            for name in ("stdout", "stderr"):
+                if not isinstance(getattr(sys, name), _TeeStream):
+                    setattr(sys, name, _TeeStream(name, getattr(sys, name)))
+            logging.getLogger().addHandler(_handler)
+        _active.add(capture)
+        if _flusher is None:
+            stop = threading.Event()
+            thread = threading.Thread(target=_flush_loop, args=(stop,), daemon=True)
+            _flusher = thread, stop
+            thread.start()
+
+
+def _stop(capture: _Capture) -> None:
+    global _flusher
+    stopping = None
+    with _lock:
+        _active.discard(capture)
+        if not _active:
+            for name in ("stdout", "stderr"):
+                if isinstance(stream := getattr(sys, name), _TeeStream):
+                    setattr(sys, name, stream.stream)
+            logging.getLogger().removeHandler(_handler)
+            stopping, _flusher = _flusher, None
+    if stopping:      # Joined so it is not writing as the logs are closed
+        thread, stop = stopping
+        stop.set()
+        thread.join()
+    capture.close()
+
+
+def _flush_loop(stop: threading.Event) -> None:
+    """(In a background thread) Writes the buffered output of active captures."""
+    while not stop.wait(FLUSH_SECONDS):
+        with _lock:
+            captures = list(_active)
+        for capture in captures:
+            try:
+                capture.flush()
+            except (OSError, ValueError):   # e.g. the Dat's folder was removed
+                pass
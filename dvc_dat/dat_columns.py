@@ -0,0 +1,222 @@
+from typing import Any, Dict, Hashable, Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+"""
+A columnar store for the points of a Cube, so Cubes of millions of points are not
+kept as millions of dicts.  (Imported by dat_tools, since it imports pandas.)
+
+DATA COLUMNS
+- Each key of the points is a column, kept as a NumPy buffer (grown by doubling)
+  with a mask of the rows given a value.  The buffer's type follows the values
+  given, widening as 'DataFrame(points)' would: bools, ints, floats (ints and
+  floats are floats), or objects (strings, None, and mixes of the others).
+- Rows without a value are NaN in the DataFrame, and missing from the points.
+
+INDEX COLUMNS
+- The indicies of a block of points (the Dat each came from within its containers)
+  are set once for the whole block, as codes of a categorical column.
+- Indicies are keyed by the name of their DatContainer, or by their depth (an int)
+  for plain lists of Dats.  Each is named when the DataFrame or points are built:
+  depths are named "list", and names that collide with a data column get a number
+  ("list3", "run3", ...).  The index columns come before the data columns.
+
+ZERO COPY
+- 'get_df' wraps the buffers in a DataFrame without copying them, except for int
+  and bool columns with missing rows (which are widened to hold NaN), and strings
+  (which pandas converts to its string type).  Appending to the store after that
+  may change the DataFrame's values, so it should be built once the store is full.
+"""
+
+_MIN_CAPACITY = 16
+_INT64_RANGE = (-2 ** 63, 2 ** 63)
+_FILLS = {"b": False, "i": 0, "f": np.nan, "O": np.nan}
+_DTYPES = {"b": np.bool_, "i": np.int64, "f": np.float64, "O": object}
+
+
+class ColumnStore(object):
+    """The points of a Cube, as typed column buffers."""
+
+    def __init__(self, points: Iterable[Dict[str, Any]] = None):
+        self.size = 0
+        self.columns: Dict[str, _Column] = {}
+        self.index: Dict[Hashable, _IndexColumn] = {}   # By container name or depth
+        if points:
+            self.extend(points)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def extend(self, points: Iterable[Dict[str, Any]],
+               indicies: Dict[Hashable, str] = None) -> None:
+        """Appends points, which all have the given indicies."""
+        start = row = self.size
+        for point in points:
+            for key, value in point.items():
+                column = self.columns.get(key)
+                if column is None:
+                    column = self.columns[key] = _Column()
+                column.set(row, value)
+            row += 1
+        self.size = row
+        for key, value in (indicies or {}).items():
+            column = self.index.get(key)
+            if column is None:
+                column = self.index[key] = _IndexColumn()
+            column.fill(start, row, value)
+
+    def get_df(self) -> DataFrame:
+        """Returns the points as a DataFrame (sharing the store's buffers)."""
+        data = {name: column.values(self.size)
+                for name, column in self._named_index()}
+        for name, column in self.columns.items():
+            data[name] = column.values(self.size)
+        return DataFrame(data, copy=False)
+
+    def get_points(self) -> List[Dict[str, Any]]:
+        """Returns the points as dicts (index keys first)."""
+        rows: List[Dict[str, Any]] = [{} for _ in range(self.size)]
+        for name, column in [*self._named_index(), *self.columns.items()]:
+            values, present = column.items(self.size)
+            for row, value, has_value in zip(rows, values, present):
+                if has_value:
+                    row[name] = value
+        return rows
+
+    def _named_index(self) -> List[Tuple[str, "_IndexColumn"]]:
+        """Returns the index columns by name, merging those given the same name
+        (the values of a later, i.e. deeper, index replacing those of earlier)."""
+        named: Dict[str, _IndexColumn] = {}
+        for name, column in zip(self._index_names(), self.index.values()):
+            named[name] = named[name].merge(column) if name in named else column
+        return list(named.items())
+
+    def _index_names(self) -> List[str]:
+        names = []
+        for key in self.index:
+            if key not in self.columns and isinstance(key, str):
+                names.append(key)
+                continue
+            # "list" used for unique unnamed indicies (encoded as ints)
+            new_key = base = "list" if isinstance(key, int) else key
+            i = 2
+            while new_key in self.columns:
+                i += 1
+                new_key = f"{base}{i}"
+            names.append(new_key)
+        return names
+
+
+class _Column(object):
+    """A typed buffer of the values of one key, and a mask of rows that have one."""
+    __slots__ = ("kind", "buffer", "present")
+
+    def __init__(self):
+        self.kind = "b"
+        self.buffer = np.zeros(0, dtype=np.bool_)
+        self.present = np.zeros(0, dtype=np.bool_)
+
+    def set(self, row: int, value: Any) -> None:
+        kind = _kind(value)
+        if kind != self.kind:
+            self._widen(kind)
+        if row >= len(self.buffer):
+            self._grow(row + 1)
+        self.buffer[row] = value
+        self.present[row] = True
+
+    def values(self, size: int) -> np.ndarray:
+        """Returns the column's values, NaN where missing (a view when possible)."""
+        values, present = self.buffer[:size], self.present[:size]
+        if len(values) < size:       # Rows added after the last value
+            values = np.concatenate([values, np.full(
+                size - len(values), _FILLS[self.kind], dtype=_DTYPES[self.kind])])
+            present = np.concatenate([present, np.zeros(size - len(present), bool)])
+        if self.kind in "bi" and not present.all():
+            values = values.astype(np.float64 if self.kind == "i" else object)
+            values[~present] = np.nan
+        return values
+
+    def items(self, size: int) -> Tuple[List[Any], List[bool]]:
+        """Returns the column's values as Python objects, and which are present."""
+        return self.buffer[:size].tolist(), self.present[:size].tolist()
+
+    def _widen(self, kind: str) -> None:
+        kinds = {self.kind, kind}
+        if not self.present.any():
+            new_kind = kind
+        elif kinds == {"i", "f"}:
+            new_kind = "f"
+        else:
+            new_kind = "O"
+        if new_kind != self.kind:
+            self.buffer = self.buffer.astype(_DTYPES[new_kind])
+            self.buffer[~self.present] = _FILLS[new_kind]
+            self.kind = new_kind
+
+    def _grow(self, size: int) -> None:
+        capacity = max(size, 2 * len(self.buffer), _MIN_CAPACITY)
+        extra = capacity - len(self.buffer)
+        self.buffer = np.concatenate([self.buffer, np.full(
+            extra, _FILLS[self.kind], dtype=_DTYPES[self.kind])])
+        self.present = np.concatenate([self.present, np.zeros(extra, np.bool_)])
+
+
+class _IndexColumn(object):
+    """The values of an index, as the codes of a categorical (-1 if missing)."""
+    __slots__ = ("codes", "categories", "lookup")
+
+    def __init__(self):
+        self.codes = np.zeros(0, dtype=np.int32)
+        self.categories: List[str] = []
+        self.lookup: Dict[str, int] = {}
+
+    def fill(self, start: int, end: int, value: str) -> None:
+        code = self.lookup.get(value)
+        if code is None:
+            code = self.lookup[value] = len(self.categories)
+            self.categories.append(value)
+        if end > len(self.codes):
+            capacity = max(end, 2 * len(self.codes), _MIN_CAPACITY)
+            self.codes = np.concatenate([
+                self.codes, np.full(capacity - len(self.codes), -1, np.int32)])
+        self.codes[start:end] = code
+
+    def merge(self, other: "_IndexColumn") -> "_IndexColumn":
+        """Returns a column with the values of 'other', or else of this column."""
+        merged = _IndexColumn()
+        merged.codes = np.full(max(len(self.codes), len(other.codes)), -1, np.int32)
+        for source in (self, other):
+            for code, value in enumerate(source.categories):
+                if value not in merged.lookup:
+                    merged.lookup[value] = len(merged.categories)
+                    merged.categories.append(value)
+                merged.codes[np.flatnonzero(source.codes == code)] = \
+                    merged.lookup[value]
+        return merged
+
+    def values(self, size: int) -> pd.Categorical:
+        codes = self.codes[:size]
+        if len(codes) < size:
+            codes = np.concatenate([codes, np.full(size - len(codes), -1, np.int32)])
+        return pd.Categorical.from_codes(codes, self.categories)
+
+    def items(self, size: int) -> Tuple[List[Any], List[bool]]:
+        codes = self.codes[:size].tolist()
+        codes += [-1] * (size - len(codes))
+        return [self.categories[c] if c >= 0 else None for c in codes], \
+            [c >= 0 for c in codes]
+
+
+def _kind(value: Any) -> str:
+    """Returns the buffer kind for a value ('b', 'i', 'f', or 'O')."""
+    if isinstance(value, (bool, np.bool_)):
+        return "b"
+    elif isinstance(value, (int, np.integer)):
+        low, high = _INT64_RANGE
+        return "i" if low <= value < high else "O"
+    elif isinstance(value, (float, np.floating)):
+        return "f"
+    return "O"
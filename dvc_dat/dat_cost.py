@@ -0,0 +1,247 @@
+import os
+import json
+import math
+import heapq
+import threading
+import statistics
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple, Union
+
+from dvc_dat.dat import Dat
+from dvc_dat.dat_run_cache import _qualified_name
+
+"""
+Estimates the run time of Dats from the recorded run times of earlier Dats, so that
+parallel runs can start their longest work first, and 'do.estimate' can give ETAs.
+
+HISTORY
+- Recording is opt-in: with "cost_history" set in the .datconfig (to true for the
+  '.dat_cost_history.jsonl' file of the sync folder, or to a path relative to the
+  .datconfig folder), each completed run appends its 'dat.do', 'dat.kind', key
+  params, and seconds to that file.  (Runs in other processes and on other hosts
+  sharing the file are read as they are appended.)
+- The file is only read once an estimate is needed (or it is due to be compacted),
+  so runs that are never estimated only pay for their one appended line.
+- CostModel.learn(dats) adds the recorded 'dat.run_time' of existing Dats (kept in
+  memory if there is no history file).
+- A spec's key params are the dotted keys listed in its "dat.cost_params", or else
+  every scalar value outside of its "dat" section.
+
+ESTIMATES
+- A spec is estimated from the recent runs with its 'dat.do' and 'dat.kind':
+  the median time of the runs with identical key params, or else the median of the
+  3 runs with the most similar params (numeric params are compared by their
+  relative difference).  Failing that, from all runs of its 'dat.do'.
+- Specs with no history have no estimate (None).
+
+ORDERING
+- do.map (and so sweeps) start runs longest-estimate-first, and pipelines start
+  the ready stage with the longest estimated path to the end of the pipeline.
+  Runs with no estimate are ordered as if they were the longest estimated run.
+"""
+
+_DAT_DO = "dat.do"
+_DAT_KIND = "dat.kind"
+_DAT_COST_PARAMS = "dat.cost_params"
+_DAT_RUN_TIME = "dat.run_time"
+_DAT_WALL_TIME = "dat.resources.wall_time"
+_HISTORY_FILE = ".dat_cost_history.jsonl"
+_DAT_COST_HISTORY = "cost_history"    # The .datconfig setting of the history file
+MAX_RUNS = 200            # Runs kept per ('dat.do', 'dat.kind')
+MAX_FILE_RUNS = 20000     # Runs in the history file before it is compacted
+MAX_FILE_BYTES = 2 ** 22  # Size of the history file before its runs are counted
+_NEAREST = 3              # Similar runs used when none have identical params
+_MAX_PARAMS = 50          # Default key params used per spec
+
+Key = Tuple[str, str]
+
+
+class CostModel(object):
+    """The recorded run times of Dats, indexed by their 'dat.do' and 'dat.kind'."""
+
+    def __init__(self, path: str = None):
+        self.path = path or history_path()    # (None if runs are not recorded)
+        self.runs: Dict[Key, Deque[Dict[str, Any]]] = {}
+        self._offset = 0          # Bytes of the history file read so far
+        self._file_runs = 0       # Runs in the history file
+        self._lock = threading.Lock()
+
+    def record(self, dat: Union[Dat, Dict], seconds: float = None) -> bool:
+        """Records the run time of a Dat (by default its recorded wall time).
+        Returns False if it has no 'dat.do' or run time."""
+        spec = dat.get_spec() if isinstance(dat, Dat) else dat
+        if seconds is None and isinstance(dat, Dat):
+            seconds = _recorded_seconds(dat.get_results())
+        if seconds is None or not (key := _key(spec)):
+            return False
+        run = {"do": key[0], "kind": key[1], "params": key_params(spec),
+               "seconds": round(float(seconds), 6)}
+        if not self.path:
+            with self._lock:
+                self._add(run)
+            return True
+        try:    # Read back by _refresh, in order with the runs of other processes
+            with open(self.path, "a") as f:    # One short write, so appends interleave
+                f.write(json.dumps(run, sort_keys=True, default=repr) + "\n")
+            if os.path.getsize(self.path) <= MAX_FILE_BYTES:
+                return True
+        except OSError:
+            with self._lock:
+                self._add(run)
+            return True
+        with self._lock:
+            self._refresh()
+            if self._file_runs > MAX_FILE_RUNS:
+                self._compact()
+        return True
+
+    def learn(self, dats: Iterable[Dat]) -> int:
+        """Records the run times saved in the results of existing Dats, returning
+        the number recorded."""
+        return sum(self.record(dat) for dat in dats)
+
+    def estimate(self, spec: Union[Dat, Dict]) -> Optional[float]:
+        """Returns the estimated seconds to run a Dat or spec, or None if unknown."""
+        spec = spec.get_spec() if isinstance(spec, Dat) else spec
+        if not (key := _key(spec)):
+            return None
+        with self._lock:
+            self._refresh()
+        if runs := list(self.runs.get(key, ())):
+            params = key_params(spec)
+            distances = [(_distance(params, run["params"]), run["seconds"])
+                         for run in runs]
+            if same := [seconds for distance, seconds in distances if distance == 0]:
+                return statistics.median(same)
+            nearest = heapq.nsmallest(_NEAREST, distances, key=lambda d: d[0])
+            return statistics.median(seconds for _, seconds in nearest)
+        same_do = [run["seconds"] for (fn, _), runs in list(self.runs.items())
+                   if fn == key[0] for run in list(runs)]
+        return statistics.median(same_do) if same_do else None
+
+    def order(self, specs: List[Union[Dat, Dict]]) -> List[int]:
+        """Returns the indices of the specs, longest estimated run first."""
+        costs = fill_unknown([self.estimate(spec) for spec in specs])
+        return sorted(range(len(specs)), key=lambda i: -costs[i])
+
+    def _refresh(self) -> None:
+        """Reads the runs appended to the history file since it was last read."""
+        if not self.path:
+            return
+        try:
+            if os.path.getsize(self.path) < self._offset:    # Compacted elsewhere
+                self.runs, self._offset, self._file_runs = {}, 0, 0
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read()
+        except OSError:
+            return
+        end = data.rfind(b"\n") + 1     # A partly written last line is read later
+        for line in data[:end].splitlines():
+            try:
+                self._add(json.loads(line))
+                self._file_runs += 1
+            except (ValueError, KeyError):
+                pass
+        self._offset += end
+
+    def _add(self, run: Dict[str, Any]) -> None:
+        key = (run["do"], run["kind"])
+        if key not in self.runs:
+            self.runs[key] = deque(maxlen=MAX_RUNS)
+        self.runs[key].append(run)
+
+    def _compact(self) -> None:
+        """Rewrites the history file with only the runs that are kept."""
+        temp = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp, "w") as f:
+            for runs in self.runs.values():
+                for run in runs:
+                    f.write(json.dumps(run, sort_keys=True, default=repr) + "\n")
+            self._offset = f.tell()
+        os.replace(temp, self.path)
+        self._file_runs = sum(map(len, self.runs.values()))
+
+
+def history_path() -> Optional[str]:
+    """Returns the history file set by the .datconfig "cost_history" (or None)."""
+    setting = Dat.manager.config.get(_DAT_COST_HISTORY)
+    if not setting:
+        return None
+    elif setting is True:
+        return os.path.join(Dat.manager.sync_folder, _HISTORY_FILE)
+    return os.path.join(Dat.manager.folder, setting)
+
+
+def key_params(spec: Dict) -> Dict[str, Any]:
+    """Returns the key params of a spec, as {DOTTED_KEY: VALUE}."""
+    if (keys := Dat.get(spec, _DAT_COST_PARAMS, None)) is not None:
+        return {key: Dat.get(spec, key, None) for key in keys}
+    params = {}
+    _flatten({k: v for k, v in spec.items() if k != "dat"}, "", params)
+    return dict(sorted(params.items())[:_MAX_PARAMS])
+
+
+def fill_unknown(costs: List[Optional[float]]) -> List[float]:
+    """Returns the costs with the unknown (None) ones set to the largest known one."""
+    longest = max((c for c in costs if c is not None), default=0.0)
+    return [longest if c is None else c for c in costs]
+
+
+def makespan(costs: List[float], workers: int) -> float:
+    """Returns the time to run tasks of the given costs (started longest first)
+    on 'workers' parallel workers."""
+    finishes = [0.0] * max(1, workers)
+    for cost in sorted(costs, reverse=True):
+        heapq.heapreplace(finishes, finishes[0] + cost)
+    return max(finishes)
+
+
+def _key(spec: Dict) -> Optional[Key]:
+    fn = Dat.get(spec, _DAT_DO, None)
+    if fn is None:
+        return None
+    elif not isinstance(fn, str):
+        fn = _qualified_name(fn)
+    return fn, str(Dat.get(spec, _DAT_KIND, ""))
+
+
+def _recorded_seconds(results: Dict) -> Optional[float]:
+    """Returns the wall time recorded in a Dat's results (or parsed from its
+    'HH:MM:SS.mmm' run time), or None if it has not been run."""
+    if (seconds := Dat.get(results, _DAT_WALL_TIME, None)) is not None:
+        return float(seconds)
+    try:
+        hours, minutes, seconds = Dat.get(results, _DAT_RUN_TIME, "").split(":")
+        return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    except ValueError:
+        return None
+
+
+def _flatten(tree: Dict, prefix: str, out: Dict[str, Any]) -> None:
+    for key, value in tree.items():
+        if isinstance(value, dict):
+            _flatten(value, f"{prefix}{key}.", out)
+        elif isinstance(value, (int, float, bool)) or \
+                (isinstance(value, str) and len(value) <= 100):
+            out[f"{prefix}{key}"] = value
+
+
+def _distance(a: Dict[str, Any], b: Dict[str, Any]) -> float:
+    """Returns how different two sets of key params are (0 if identical)."""
+    distance = 0.0
+    for key in a.keys() | b.keys():
+        x, y = a.get(key), b.get(key)
+        if x == y:
+            continue
+        elif _is_number(x) and _is_number(y):
+            distance += min(1.0, abs(x - y) / max(abs(x), abs(y)))
+        else:
+            distance += 1.0
+    return distance
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and \
+        math.isfinite(value)
+
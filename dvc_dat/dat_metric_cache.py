@@ -0,0 +1,127 @@
+import os
+import json
+import hashlib
+import threading
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+from dvc_dat.dat import Dat
+from dvc_dat.dat_run_cache import get_source_file, _file_hash, _fingerprint, \
+    _qualified_name
+
+"""
+A persistent cache of the outputs of Cube point_fns (metrics) on each Dat, so that
+re-building a Cube over a large container only runs its metrics on new or changed
+Dats.  (Used by 'Cube(..., cache=True)' and the 'dat_report' "cache" setting.)
+
+CACHE KEYS
+- An output is reused while each of these is unchanged:
+  - the Dat (its name within its folder),
+  - the size and mtime of each file under the Dat's folder,
+  - the metric's dotted name (or the qualified name of a metric fn), and
+  - the source file of the module defining the metric.
+
+STORAGE
+- The outputs for the Dats of a folder (e.g. a DatContainer) are appended as JSON
+  lines to the '.dat_metric_cache.jsonl' file of that folder.  Outputs that are not
+  JSON serializable, and the exceptions of failing metrics, are not cached.
+- A file holding many replaced outputs is rewritten with only the current ones
+  when it is next read.  (Outputs appended by another process while this happens
+  are lost, and so are recomputed the next time.)
+"""
+
+_CACHE_FILE = ".dat_metric_cache.jsonl"
+_MIN_COMPACT_LINES = 1000     # Lines in a cache file before it may be rewritten
+
+Metric = Tuple[str, Union[str, None]]     # The dotted name and source hash of a fn
+Entry = Dict[str, Any]
+
+
+class MetricCache(object):
+    """The cached metric outputs of the Dats within some number of folders."""
+
+    def __init__(self):
+        self.folders: Dict[str, Dict[Tuple[str, str], Entry]] = {}
+        self.fingerprints: Dict[str, str] = {}      # Of each Dat looked up
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, dat: Dat, metrics: List[Metric]) -> Dict[int, Any]:
+        """Returns {INDEX: OUTPUT} for each of the metrics with a current output."""
+        path = dat.get_path()
+        self.fingerprints[path] = fingerprint = dat_fingerprint(path)
+        entries = self._entries(os.path.dirname(path))
+        hits, name = {}, os.path.basename(path)
+        for i, (metric, source) in enumerate(metrics):
+            entry = entries.get((name, metric))
+            if entry and entry["fingerprint"] == fingerprint and \
+                    entry["source"] == source:
+                hits[i] = json.loads(entry["output"])    # A copy to be modified
+        self.hits += len(hits)
+        self.misses += len(metrics) - len(hits)
+        return hits
+
+    def store(self, dat: Dat, metrics: List[Metric], outputs: Dict[int, Any]) -> None:
+        """Records the outputs of the given metrics (by index) of a looked up Dat."""
+        path = dat.get_path()
+        folder, name = os.path.split(path)
+        entries, lines = self._entries(folder), []
+        for i, output in outputs.items():
+            try:
+                text = json.dumps(output, sort_keys=True)
+            except (TypeError, ValueError):
+                continue
+            metric, source = metrics[i]
+            entry = {"dat": name, "metric": metric, "source": source,
+                     "fingerprint": self.fingerprints[path], "output": text}
+            entries[(name, metric)] = entry
+            lines.append(json.dumps(entry) + "\n")
+        if lines:
+            try:
+                with open(os.path.join(folder, _CACHE_FILE), "a") as f:
+                    f.write("".join(lines))
+            except OSError:     # e.g. a read-only folder, so just not cached
+                pass
+
+    def _entries(self, folder: str) -> Dict[Tuple[str, str], Entry]:
+        with self._lock:
+            if folder not in self.folders:
+                self.folders[folder] = _read_entries(folder)
+            return self.folders[folder]
+
+
+def metric_key(fn_spec: Union[str, Callable], fn: Callable) -> Metric:
+    """Returns the (name, source hash) of a metric given as a dotted name or fn."""
+    name = fn_spec if isinstance(fn_spec, str) else _qualified_name(fn)
+    source = get_source_file(fn)
+    return name, _file_hash(source) if source else None
+
+
+def dat_fingerprint(path: str) -> str:
+    """Returns a hash of the size and mtime of each file under a Dat's folder."""
+    txt = json.dumps(_fingerprint(path))
+    return hashlib.sha256(txt.encode()).hexdigest()[:32]
+
+
+def _read_entries(folder: str) -> Dict[Tuple[str, str], Entry]:
+    """Reads a folder's cache file (rewriting it if it is mostly replaced entries)."""
+    path, entries, count = os.path.join(folder, _CACHE_FILE), {}, 0
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    entries[(entry["dat"], entry["metric"])] = entry
+                    count += 1
+                except (ValueError, KeyError):    # e.g. a partly written line
+                    pass
+    except OSError:
+        return entries
+    if count > max(_MIN_COMPACT_LINES, 2 * len(entries)):
+        temp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temp, "w") as f:
+                f.write("".join(json.dumps(e) + "\n" for e in entries.values()))
+            os.replace(temp, path)
+        except OSError:
+            pass
+    return entries
@@ -0,0 +1,192 @@
+import os
+import time
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Any, Dict, List, Set, Tuple, Union
+
+from dvc_dat.dat import Dat, DatContainer
+from dvc_dat.do_fn import DoManager, _map_worker
+from dvc_dat.dat_scheduler import Scheduler, get_resources, thread_env
+from dvc_dat.dat_cost import fill_unknown
+
+"""
+Runs the stage Dats within a DatContainer as a pipeline whose stages execute in
+parallel as soon as the stages they depend upon have completed.
+
+API
+---
+- stage_graph(dc) -> {stage_name: {dependency_name, ...}, ...}
+- critical_paths(graph, costs) -> {stage_name: cost to the pipeline's end, ...}
+- run_pipeline(dc, workers=, executor=) -> {stage_name: result, ...}
+
+
+STAGES
+- The stages of a pipeline are the top-most Dats contained within the container.
+- Each stage is named by its path relative to the container's folder.
+- Each stage is run just as 'do(stage_dat)' would run it.
+
+DEPENDENCIES
+- "dat.depends_on" lists the names of the stages that must complete before a stage.
+- "dat.inputs" lists the input files of a stage as paths relative to its folder
+  (e.g. "../preprocessing/results.txt"); a stage depends upon every other stage
+  whose folder contains one of its inputs.  Inputs outside the pipeline are ignored.
+- Ready stages start as the CPUs and memory declared in their "dat.resources" fit
+  on this machine (see the dat_scheduler module), those with the longest estimated
+  run time to the end of the pipeline first (see the dat_cost module).
+
+TIMELINE
+- When the pipeline completes, a per-stage timeline is written into the
+  container's results under "pipeline.timeline", with the start and end of each
+  stage in seconds after the pipeline began.
+"""
+
+_DAT_DEPENDS_ON = "dat.depends_on"   # names of the stages this stage follows
+_DAT_INPUTS = "dat.inputs"           # input paths relative to the Dat's folder
+_PIPELINE_TIMELINE = "pipeline.timeline"
+_PIPELINE_RUN_TIME = "pipeline.run_time"
+
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+def get_stages(dc: DatContainer) -> Dict[str, Dat]:
+    """Returns the top-most Dats within 'dc' indexed by their relative path names."""
+    stages, root = {}, dc.get_path()
+    for path in dc.get_dat_paths():     # sorted, so parents precede their children
+        if not any(path.startswith(os.path.join(p, "")) for p in stages.values()):
+            stages[os.path.relpath(path, root)] = path
+    return {name: Dat.manager.load(path) for name, path in stages.items()}
+
+
+def stage_graph(dc: DatContainer,
+                stages: Dict[str, Dat] = None) -> Dict[str, Set[str]]:
+    """Returns the set of stages that each stage of the pipeline depends upon."""
+    stages = get_stages(dc) if stages is None else stages
+    folders = {name: os.path.join(dat.get_path(), "") for name, dat in stages.items()}
+    graph = {}
+    for name, dat in stages.items():
+        deps = set(Dat.get(dat, _DAT_DEPENDS_ON, []))
+        for input_path in Dat.get(dat, _DAT_INPUTS, []):
+            path = os.path.normpath(os.path.join(dat.get_path(), input_path))
+            deps.update(other for other, folder in folders.items()
+                        if other != name and path.startswith(folder))
+        if unknown := deps - set(stages):
+            raise Exception(f"PIPELINE: Stage {name!r} depends on unknown stages "
+                            f"{sorted(unknown)}")
+        graph[name] = deps
+    _check_acyclic(graph)
+    return graph
+
+
+def run_pipeline(dc: DatContainer, *,
+                 workers: int = None,
+                 executor: str = "thread") -> Dict[str, Any]:
+    """Runs all stages of the pipeline in 'dc', each as soon as its dependencies
+    have completed, using a pool of 'workers' threads or processes.
+
+    Stages that depend upon a failed stage are skipped.  The timeline of the run is
+    saved into the container's results, and then an exception is raised if any
+    stage failed.  Otherwise, a dict of the results of each stage is returned.
+    """
+    from . import do
+    stages = get_stages(dc)
+    graph = stage_graph(dc, stages)
+    status: Dict[str, str] = {}
+    results: Dict[str, Any] = {}
+    timeline: List[Dict[str, Any]] = []
+    running, start = {}, time.time()
+    scheduler = Scheduler(slots=workers)
+    resources = {name: scheduler.fit(get_resources(dat)) for name, dat in stages.items()}
+    priority = critical_paths(graph, dict(zip(stages, fill_unknown(
+        [do.cost_model.estimate(dat) for dat in stages.values()]))))
+    with do._make_executor(executor, workers) as pool:
+
+        def submit_ready_stages():
+            skipping = True
+            while skipping:      # Repeats so skips propagate down chains of stages
+                skipping = False
+                for name in sorted(graph):
+                    if name not in status and \
+                            {status.get(d) for d in graph[name]} & {FAILED, SKIPPED}:
+                        status[name], skipping = SKIPPED, True
+                        timeline.append({"stage": name, "status": SKIPPED})
+            ready = [name for name in sorted(graph, key=lambda n: (-priority[n], n))
+                     if name not in status and name not in running.values() and
+                     all(status.get(d) == DONE for d in graph[name])]
+            while (name := scheduler.next_runnable(ready, resources)) is not None:
+                if executor == "process":
+                    future = pool.submit(_run_stage, None, stages[name].get_path(),
+                                         thread_env(resources[name]))
+                else:
+                    future = pool.submit(contextvars.copy_context().run,
+                                         _run_stage, do, stages[name])
+                running[future] = name
+
+        submit_ready_stages()
+        while running:
+            finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                scheduler.release(resources[name])
+                (result, error), began, ended = future.result()
+                status[name] = FAILED if error else DONE
+                results[name] = result
+                timeline.append({"stage": name, "status": status[name],
+                                 "start": round(began - start, 3),
+                                 "end": round(ended - start, 3),
+                                 "duration": round(ended - began, 3),
+                                 "depends_on": sorted(graph[name]),
+                                 **({"error": error} if error else {})})
+                if executor == "process":
+                    Dat.manager.load_results(stages[name])
+            submit_ready_stages()
+    timeline.sort(key=lambda t: (t.get("start", float("inf")), t["stage"]))
+    Dat.set(dc.get_results(), _PIPELINE_TIMELINE, timeline)
+    Dat.set(dc.get_results(), _PIPELINE_RUN_TIME, round(time.time() - start, 3))
+    dc.save()
+    if failed := [t for t in timeline if t["status"] == FAILED]:
+        raise Exception(f"PIPELINE: Stage {failed[0]['stage']!r} failed "
+                        f"({len(failed)} failed in all):\n{failed[0]['error']}")
+    return results
+
+
+def critical_paths(graph: Dict[str, Set[str]],
+                   costs: Dict[str, float]) -> Dict[str, float]:
+    """Returns the cost of the longest chain of stages from each stage (inclusive)
+    to the end of the pipeline."""
+    dependents = {name: [other for other, deps in graph.items() if name in deps]
+                  for name in graph}
+    paths: Dict[str, float] = {}
+
+    def path(name: str) -> float:
+        if name not in paths:
+            paths[name] = costs[name] + max(map(path, dependents[name]), default=0.0)
+        return paths[name]
+
+    for stage in graph:
+        path(stage)
+    return paths
+
+
+def _run_stage(manager: Union[DoManager, None], dat: Union[Dat, str],
+               env: Dict[str, str] = None) -> Tuple[Tuple[Any, Any], float, float]:
+    """Runs one stage in a worker, returning its (result, error) and its start and
+    end times."""
+    began = time.time()
+    outcome = _map_worker(manager, dat, None, (), {}, env)
+    return outcome, began, time.time()
+
+
+def _check_acyclic(graph: Dict[str, Set[str]]) -> None:
+    """Raises an exception if the dependency graph contains a cycle."""
+    remaining = {name: set(deps) for name, deps in graph.items()}
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            raise Exception(f"PIPELINE: Dependency cycle among stages "
+                            f"{sorted(remaining)}")
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
@@ -0,0 +1,93 @@
+import os
+import time
+import cProfile
+import pstats
+import tracemalloc
+from typing import Any, Callable
+
+from dvc_dat.dat import Dat
+
+"""
+Profiling support for do runs (see 'dat --profile').
+
+- CPU mode runs the do fn under cProfile, saves the stats to 'profile.prof' in the
+  Dat's folder, and prints the functions with the most self time.
+  (Inspect the saved stats with:  python -m pstats profile.prof)
+- ALLOC mode runs the do fn under tracemalloc, saves the source lines allocating the
+  most memory to 'allocations.txt' in the Dat's folder, and prints the top ones.
+- Ephemeral Dats' folders are removed after their runs, so their profiles are saved
+  in a folder of their own under '.dat_profiles' in the sync folder instead.
+"""
+
+CPU = "cpu"
+ALLOC = "alloc"
+PROFILE_MODES = (CPU, ALLOC)
+PROFILE_FILE = "profile.prof"
+ALLOCATIONS_FILE = "allocations.txt"
+TOP_N = 10           # Number of entries printed in the summary
+TOP_N_SAVED = 50     # Number of allocation sites saved to ALLOCATIONS_FILE
+EPHEMERAL_PROFILES = ".dat_profiles"   # Sync folder's folder of ephemeral profiles
+
+
+def profiled_call(mode: str, folder: str, fn: Callable, *args, **kwargs) -> Any:
+    """Calls 'fn(*args, **kwargs)' under the 'cpu' or 'alloc' profiler, saves its
+    profile into 'folder', prints a short summary, and returns fn's result."""
+    if mode == CPU:
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(fn, *args, **kwargs)
+        finally:
+            path = os.path.join(folder, PROFILE_FILE)
+            profiler.dump_stats(path)
+            print(cpu_summary(pstats.Stats(profiler), path))
+    elif mode == ALLOC:
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start(10)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            if started:
+                tracemalloc.stop()
+            path = os.path.join(folder, ALLOCATIONS_FILE)
+            print(alloc_summary(snapshot, peak, path))
+    else:
+        raise ValueError(f"PROFILE: Unknown mode {mode!r}, expected one of "
+                         f"{PROFILE_MODES}")
+
+
+def profile_folder(dat: Dat) -> str:
+    """Returns the folder to save the profile of a run of 'dat' in (see above)."""
+    if not dat.is_ephemeral():
+        return dat.get_path()
+    name = f"{time.strftime('%Y-%m-%d_%H%M%S')}_{dat.get_path_tail()}"
+    folder = os.path.join(Dat.manager.sync_folder, EPHEMERAL_PROFILES, name)
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def cpu_summary(stats: pstats.Stats, path: str) -> str:
+    """Returns the top functions by self time as a short printable table."""
+    rows = sorted(stats.stats.items(), key=lambda item: -item[1][2])[:TOP_N]
+    lines = [f"# CPU profile saved to {path}",
+             f"#  {'self(s)':>8} {'cum(s)':>8} {'calls':>8}  function"]
+    for (file, line, name), (_, calls, self_time, cum_time, _) in rows:
+        where = f"{os.path.basename(file)}:{line}" if line else file
+        lines.append(f"#  {self_time:8.3f} {cum_time:8.3f} {calls:8d}  "
+                     f"{name} ({where})")
+    return "\n".join(lines)
+
+
+def alloc_summary(snapshot: tracemalloc.Snapshot, peak: int, path: str) -> str:
+    """Saves the top allocation sites to 'path' and returns a printable summary."""
+    top = snapshot.statistics("lineno")
+    with open(path, "w") as out:
+        out.write(f"Peak traced memory: {peak / 2**20:.3f} MB\n")
+        for stat in top[:TOP_N_SAVED]:
+            out.write(f"{stat}\n")
+    lines = [f"# Allocation profile saved to {path}",
+             f"#  Peak traced memory: {peak / 2**20:.3f} MB"]
+    lines += [f"#  {stat}" for stat in top[:TOP_N]]
+    return "\n".join(lines)
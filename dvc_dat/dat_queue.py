@@ -0,0 +1,280 @@
+import os
+import json
+import time
+import uuid
+import socket
+import threading
+import contextlib
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from dvc_dat.dat import Dat
+from dvc_dat.dat_sweep import describe_result
+
+"""
+A work queue kept within the sync folder, so that 'dat --worker' processes on any
+hosts sharing its mount can run queued Dats without a broker service.
+
+    dat --enqueue runs/mspipe/24-06_3/stage1 runs/mspipe/24-06_3/stage2
+    dat --worker [--queue NAME] [--lease SECONDS] [--exit-when-empty]
+
+API
+---
+- WorkQueue(name).enqueue(dats, do_spec=, args=, kwargs=) -> [entry, ...]
+- WorkQueue(name).wait(entries) -> {entry: outcome, ...}
+- WorkQueue(name).status() -> {"pending": N, "running": N, "done": N, "failed": N}
+- run_worker(queue, lease=, exit_when_empty=, max_runs=) -> {"done": N, "failed": N}
+
+QUEUE FOLDER  ("queues/NAME" within the sync folder; NAME defaults to "default")
+    pending/ENTRY.json    The Dat (by its name in the sync folder) and its do fn
+    pending/ENTRY.lock    The claim of the worker running it
+    done/ENTRY.json       The entry with its worker, seconds, and result
+    failed/ENTRY.json     The entry with its worker, seconds, and error
+Entries are named by their enqueue time, so they are claimed in FIFO order.
+
+CLAIMS
+- A worker claims an entry by creating its lock file exclusively (O_EXCL), which
+  only one worker on any host can do.  It then runs the Dat's 'dat.do' (saving its
+  results within the Dat as usual), moves the entry to done/ or failed/ (an atomic
+  rename), and removes its lock.
+- While a worker runs an entry it touches the lock every lease/3 seconds.  A lock
+  that has not been touched for its lease has expired (its worker died), and the
+  next worker breaks it by renaming it aside (only one rename can succeed) and
+  runs the entry again.  A worker whose claim was broken leaves the entry to the
+  worker that broke it.
+- Lease expiry compares lock mtimes (set by the file server) with local clocks, so
+  hosts should run NTP, and leases should be well above their clock skew.
+"""
+
+QUEUES_FOLDER = "queues"
+DEFAULT_QUEUE = "default"
+LEASE_SECONDS = 60.0      # A claim not renewed in this time can be broken
+POLL_SECONDS = 2.0        # How often idle workers look for pending entries
+PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+_ENTRY, _LOCK = ".json", ".lock"
+
+
+class Claim(object):
+    """A worker's claim on one queue entry, renewed by a heartbeat while held."""
+
+    def __init__(self, queue: "WorkQueue", entry: str, token: str, lease: float):
+        self.queue = queue
+        self.entry = entry
+        self.token = token
+        self.lease = lease
+        self.spec = _read_json(queue.entry_path(entry)) or {}
+        self._stop = threading.Event()
+        self._heartbeat = None
+
+    def __enter__(self) -> "Claim":
+        self._heartbeat = threading.Thread(target=self._beat, daemon=True)
+        self._heartbeat.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._heartbeat.join()
+
+    def is_held(self) -> bool:
+        """True if this claim's lock has not been broken by another worker."""
+        lock = _read_json(self.queue.lock_path(self.entry))
+        return bool(lock) and lock.get("token") == self.token
+
+    def _beat(self) -> None:
+        while not self._stop.wait(self.lease / 3):
+            if not self.is_held():
+                return
+            with contextlib.suppress(FileNotFoundError):
+                os.utime(self.queue.lock_path(self.entry))
+
+
+class WorkQueue(object):
+    """A FIFO queue of Dats to run, kept in a folder within the sync folder."""
+
+    def __init__(self, name: str = None, *, folder: str = None):
+        self.name = name or DEFAULT_QUEUE
+        self.folder = folder or os.path.join(Dat.manager.sync_folder, QUEUES_FOLDER,
+                                             self.name)
+        for state in (PENDING, DONE, FAILED):
+            os.makedirs(os.path.join(self.folder, state), exist_ok=True)
+
+    def enqueue(self, dats: Iterable[Union[Dat, str]], *,
+                do_spec: str = None, args: Iterable = (),
+                kwargs: Dict[str, Any] = None) -> List[str]:
+        """Queues each Dat (or Dat name) to be run by a worker, with 'do_spec' in
+        place of its own 'dat.do' if given.  Returns the queue entry of each."""
+        entries = []
+        for dat in dats:
+            path = dat.get_path() if isinstance(dat, Dat) else \
+                Dat.manager.resolve_path(dat)
+            if not Dat.manager.exists(path):
+                raise Exception(f"QUEUE: No Dat found at {path!r}")
+            entry = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+            _write_json(self.entry_path(entry), {
+                "dat": Dat.manager.get_path_name(path), "do": do_spec,
+                "args": list(args), "kwargs": kwargs or {},
+                "queued_at": time.strftime("%Y-%m-%d %H:%M:%S")})
+            entries.append(entry)
+        return entries
+
+    def claim(self, *, lease: float = LEASE_SECONDS,
+              worker: str = None) -> Optional[Claim]:
+        """Claims the oldest pending entry that is unclaimed (or whose claim has
+        expired), or returns None if there is none."""
+        worker = worker or worker_name()
+        for entry in self.pending():
+            lock = self.lock_path(entry)
+            if os.path.exists(lock) and not self._break_expired(lock):
+                continue
+            token = uuid.uuid4().hex
+            try:
+                fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:     # Claimed first by another worker
+                continue
+            with os.fdopen(fd, "w") as f:
+                json.dump({"worker": worker, "token": token, "lease": lease}, f)
+            if not os.path.exists(self.entry_path(entry)):   # Finished meanwhile
+                os.remove(lock)
+                continue
+            return Claim(self, entry, token, lease)
+        return None
+
+    def complete(self, claim: Claim, outcome: Dict[str, Any]) -> bool:
+        """Moves a claimed entry into done/ (or failed/ if 'outcome' has an "error")
+        and releases its claim.  Returns False (doing nothing) if the claim was
+        broken by another worker."""
+        if not claim.is_held():
+            return False
+        state = FAILED if outcome.get("error") else DONE
+        _write_json(self.entry_path(claim.entry, state), {**claim.spec, **outcome})
+        for path in (self.entry_path(claim.entry), self.lock_path(claim.entry)):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+        return True
+
+    def pending(self) -> List[str]:
+        """Returns the pending entries (including those being run) oldest first."""
+        return self._entries(PENDING)
+
+    def status(self) -> Dict[str, int]:
+        """Returns the number of entries pending, running, done, and failed."""
+        pending = self.pending()
+        running = sum(os.path.exists(self.lock_path(e)) for e in pending)
+        return {PENDING: len(pending) - running, RUNNING: running,
+                DONE: len(self._entries(DONE)), FAILED: len(self._entries(FAILED))}
+
+    def outcome(self, entry: str) -> Optional[Dict[str, Any]]:
+        """Returns the completed entry (with its status), or None if not complete."""
+        for state in (DONE, FAILED):
+            if (found := _read_json(self.entry_path(entry, state))) is not None:
+                return {"status": state, **found}
+        return None
+
+    def wait(self, entries: Iterable[str], *, poll: float = POLL_SECONDS,
+             timeout: float = None) -> Dict[str, Dict[str, Any]]:
+        """Waits for the entries to complete, returning the outcome of each."""
+        remaining, outcomes = list(entries), {}
+        deadline = None if timeout is None else time.time() + timeout
+        while remaining:
+            for entry in list(remaining):
+                if (found := self.outcome(entry)) is not None:
+                    outcomes[entry] = found
+                    remaining.remove(entry)
+            if remaining:
+                if deadline is not None and time.time() > deadline:
+                    raise TimeoutError(f"QUEUE: {len(remaining)} entries of "
+                                       f"{self.name!r} did not complete in time")
+                time.sleep(poll)
+        return outcomes
+
+    def entry_path(self, entry: str, state: str = PENDING) -> str:
+        return os.path.join(self.folder, state, entry + _ENTRY)
+
+    def lock_path(self, entry: str) -> str:
+        return os.path.join(self.folder, PENDING, entry + _LOCK)
+
+    def _entries(self, state: str) -> List[str]:
+        names = os.listdir(os.path.join(self.folder, state))
+        return sorted(n[:-len(_ENTRY)] for n in names
+                      if n.endswith(_ENTRY) and not n.startswith("."))
+
+    @staticmethod
+    def _break_expired(lock: str) -> bool:
+        """Breaks the lock if its lease has expired, returning True if it did."""
+        try:
+            lease = (_read_json(lock) or {}).get("lease", LEASE_SECONDS)
+            if time.time() - os.stat(lock).st_mtime < lease:
+                return False
+            aside = f"{lock}.{uuid.uuid4().hex[:8]}.broken"
+            os.rename(lock, aside)        # Only one of the breaking workers succeeds
+        except FileNotFoundError:         # Released or broken by another worker
+            return False
+        if time.time() - os.stat(aside).st_mtime < lease:
+            # Another worker broke and re-claimed it between our stat and rename, so
+            # put back its fresh claim (unless a third worker has claimed it since).
+            with contextlib.suppress(FileExistsError):
+                os.link(aside, lock)
+            os.remove(aside)
+            return False
+        os.remove(aside)
+        return True
+
+
+def run_worker(queue: Union[WorkQueue, str] = None, *,
+               lease: float = LEASE_SECONDS,
+               poll: float = POLL_SECONDS,
+               exit_when_empty: bool = False,
+               max_runs: int = None,
+               do=None) -> Dict[str, int]:
+    """Claims and runs queued Dats until interrupted (or until no entry can be
+    claimed, if 'exit_when_empty'), returning the number done and failed."""
+    from dvc_dat.do_fn import _map_worker
+    if do is None:
+        from dvc_dat import do
+    queue = queue if isinstance(queue, WorkQueue) else WorkQueue(queue)
+    worker, counts = worker_name(), {DONE: 0, FAILED: 0}
+    print(f"# Dat worker {worker} serving queue {queue.folder}", flush=True)
+    try:
+        while max_runs is None or sum(counts.values()) < max_runs:
+            if (claim := queue.claim(lease=lease, worker=worker)) is None:
+                if exit_when_empty:
+                    break
+                time.sleep(poll)
+                continue
+            start = time.time()
+            with claim:
+                result, error = _map_worker(
+                    do, Dat.manager.resolve_path(claim.spec["dat"]), claim.spec["do"],
+                    claim.spec.get("args", []), claim.spec.get("kwargs", {}))
+            outcome = {"worker": worker, "seconds": round(time.time() - start, 3)}
+            if error:
+                outcome["error"] = error
+            else:
+                outcome["result"] = describe_result(result)
+            if queue.complete(claim, outcome):
+                counts[FAILED if error else DONE] += 1
+                print(f"# {worker}: {FAILED if error else DONE} {claim.spec['dat']} "
+                      f"in {outcome['seconds']}s", flush=True)
+    except KeyboardInterrupt:     # Its claim expires, so another worker reruns it
+        pass
+    return counts
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _write_json(path: str, value: Any) -> None:
+    """Writes a JSON file atomically (readers see the whole file or no file)."""
+    folder, name = os.path.split(path)
+    temp = os.path.join(folder, f".{name}.{uuid.uuid4().hex[:8]}")
+    with open(temp, "w") as f:
+        json.dump(value, f, indent=2)
+    os.replace(temp, path)
+
+
+def _read_json(path: str) -> Optional[Any]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
@@ -0,0 +1,162 @@
+import os
+import json
+import shutil
+import hashlib
+import inspect
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+from dvc_dat.dat import Dat, SPEC_JSON, SPEC_YAML, _RESULT_JSON
+
+"""
+A persistent cache of completed do runs, used to skip re-running a Dat whose spec,
+code, and inputs are unchanged since an earlier successful run.
+
+RUN CACHE KEYS
+- A run is keyed by the hash of:
+  - its expanded spec (canonical JSON with sorted keys),
+  - the args and kwargs of the call,
+  - the source file of the module defining its 'dat.do' fn, and
+  - the size and mtime of each file under each of its declared 'dat.cache_inputs'
+    (relative inputs are resolved like Dat names, relative to the sync folder; an
+    input that does not exist yet is keyed as missing, so it reruns once created).
+- 'dat.cache_inputs' is separate from the 'dat.inputs' of pipeline stages, which
+  are relative to the stage's own folder (and so unknown until its Dat exists).
+
+ENABLING
+- The cache is opt-in per spec via its "dat.cache" key:
+    "dat.cache": "reuse" (or true) -- On a hit, 'do' returns the prior result
+                                      without creating or running a new Dat.
+    "dat.cache": "link"            -- On a hit, a new Dat is created and the
+                                      prior Dat's files are hard linked into it.
+- Entries are stored as JSON files in the '.dat_run_cache' folder of the sync folder,
+  and are only created for runs whose result is JSON serializable.
+"""
+
+_DAT_CACHE = "dat.cache"
+_DAT_CACHE_INPUTS = "dat.cache_inputs"
+_DAT_CACHED_FROM = "dat.cached_from"
+_RUN_CACHE_FOLDER = ".dat_run_cache"
+_MISSING = "-missing-"      # The fingerprint of an input that does not exist
+REUSE = "reuse"
+LINK = "link"
+
+
+def get_cache_mode(spec: Dict) -> Optional[str]:
+    """Returns REUSE, LINK, or None based upon the spec's "dat.cache" setting."""
+    mode = Dat.get(spec, _DAT_CACHE, None)
+    if isinstance(mode, str):
+        mode = mode.strip().lower()
+    if mode in (True, "true", "yes", REUSE):
+        return REUSE
+    elif mode == LINK:
+        return LINK
+    else:
+        return None
+
+
+class RunCache(object):
+    """Index of completed runs, stored as one JSON file per run key."""
+
+    def __init__(self, folder: str = None):
+        self.folder = folder or os.path.join(Dat.manager.sync_folder, _RUN_CACHE_FOLDER)
+
+    def key(self, spec: Dict, fn: Union[str, Callable, None], source: Optional[str],
+            args: Iterable, kwargs: Dict[str, Any]) -> str:
+        """Returns the run key for a spec, its do fn's source file, and call args."""
+        parts = {
+            "spec": spec,
+            "args": list(args),
+            "kwargs": kwargs,
+            "fn": fn if isinstance(fn, str) else _qualified_name(fn),
+            "source": _file_hash(source) if source else None,
+            "inputs": [_fingerprint(p) for p in Dat.get(spec, _DAT_CACHE_INPUTS, [])],
+        }
+        txt = json.dumps(parts, sort_keys=True, default=repr)
+        return hashlib.sha256(txt.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Returns the {"path":, "result":} entry for a key whose Dat still exists."""
+        entry_path = os.path.join(self.folder, f"{key}.json")
+        try:
+            with open(entry_path) as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if not Dat.manager.exists(entry["path"]):
+            os.remove(entry_path)
+            return None
+        return entry
+
+    def put(self, key: str, dat: Dat, result: Any) -> bool:
+        """Records a completed run, returns False if its result is not JSON."""
+        try:
+            txt = json.dumps({"path": dat.get_path(), "result": result}, indent=2)
+        except (TypeError, ValueError):
+            return False
+        os.makedirs(self.folder, exist_ok=True)
+        entry_path = os.path.join(self.folder, f"{key}.json")
+        tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as out:
+            out.write(txt)
+        os.replace(tmp_path, entry_path)   # Atomic, readers never see partial entries
+        return True
+
+
+def link_outputs(source: Dat, target: Dat) -> None:
+    """Hard links (or copies across devices) the files of 'source' into 'target',
+    and copies its results, noting where they came from."""
+    for root, dirs, files in os.walk(source.get_path()):
+        rel = os.path.relpath(root, source.get_path())
+        os.makedirs(os.path.join(target.get_path(), rel), exist_ok=True)
+        for name in files:
+            if rel == "." and name in (SPEC_JSON, SPEC_YAML, _RESULT_JSON):
+                continue
+            src = os.path.join(root, name)
+            dst = os.path.join(target.get_path(), rel, name)
+            if os.path.exists(dst):
+                os.remove(dst)
+            try:
+                os.link(src, dst)
+            except OSError:
+                shutil.copy2(src, dst)
+    target._result = json.loads(json.dumps(source.get_results()))
+    Dat.set(target.get_results(), _DAT_CACHED_FROM, source.get_path_name())
+    target.save()
+
+
+def get_source_file(fn: Callable) -> Optional[str]:
+    """Returns the source file of the module defining a do fn (or None)."""
+    try:
+        return inspect.getsourcefile(fn)
+    except TypeError:
+        return None
+
+
+def _qualified_name(fn: Any) -> str:
+    return f"{getattr(fn, '__module__', '')}.{getattr(fn, '__qualname__', repr(fn))}"
+
+
+def _file_hash(path: str) -> Optional[str]:
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def _fingerprint(input_path: str) -> List[Any]:
+    """Returns the (relative path, size, mtime) of each file under an input path."""
+    path = input_path if os.path.isabs(input_path) else \
+        Dat.manager.resolve_path(input_path)
+    if not os.path.exists(path):
+        return [input_path, _MISSING]
+    elif os.path.isfile(path):
+        stat = os.stat(path)
+        return [input_path, stat.st_size, stat.st_mtime_ns]
+    result = [input_path]
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            stat = os.stat(file := os.path.join(root, name))
+            result.append([os.path.relpath(file, path), stat.st_size, stat.st_mtime_ns])
+    return result
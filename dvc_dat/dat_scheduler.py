@@ -0,0 +1,119 @@
+import os
+from typing import Any, Dict, List, NamedTuple, Tuple, Union
+
+from dvc_dat.dat import Dat
+
+"""
+Packs parallel Dat runs (do.map, sweeps, and pipelines) onto this machine according
+to the resources that each Dat declares in its spec:
+
+    dat:
+      resources:
+        cpus: 4          # CPUs used by the run (default: its share, see below)
+        mem_gb: 12       # Memory used by the run in GB (default 0)
+        exclusive: true  # Runs alone on the machine (default false)
+
+SCHEDULING
+- The machine's capacity is its CPU count and its available memory (MemAvailable
+  in /proc/meminfo, or MemTotal if unavailable).
+- Runs start in order as long as their declared CPUs and memory fit within the
+  capacity left over by the runs in progress (and within the worker count).
+  Runs that do not fit yet are passed over by smaller runs that do.
+- A run that does not declare its CPUs gets an equal share of the machine per
+  worker (CPU count / workers), so by default the worker count limits the runs.
+- A run declaring more than the machine's capacity is run alone, with its
+  resources limited to the machine's.
+- Process workers run each Dat with OMP_NUM_THREADS (and the matching MKL,
+  OpenBLAS, and numexpr variables) set to its CPU count, so numeric libraries do
+  not oversubscribe the machine.  (Threads share one environment, so it is not
+  set for thread workers.)
+"""
+
+_DAT_RESOURCES_CPUS = "dat.resources.cpus"
+_DAT_RESOURCES_MEM_GB = "dat.resources.mem_gb"
+_DAT_RESOURCES_EXCLUSIVE = "dat.resources.exclusive"
+_THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS",
+                    "NUMEXPR_NUM_THREADS")
+_MEMINFO = "/proc/meminfo"
+_TOLERANCE = 1e-6     # Of sums of CPU shares (e.g. 9 shares of 8/9 CPUs) vs capacity
+
+
+class Resources(NamedTuple):
+    cpus: float = None     # None until given a default share by Scheduler.fit
+    mem_gb: float = 0
+    exclusive: bool = False
+
+
+def get_resources(dat: Dat) -> Resources:
+    """Returns the resources declared in the 'dat.resources' section of a Dat's spec."""
+    exclusive = Dat.get(dat, _DAT_RESOURCES_EXCLUSIVE, False)
+    cpus = Dat.get(dat, _DAT_RESOURCES_CPUS, None)
+    return Resources(cpus=None if cpus is None else float(cpus),
+                     mem_gb=float(Dat.get(dat, _DAT_RESOURCES_MEM_GB, 0)),
+                     exclusive=exclusive is True or str(exclusive).lower() == "true")
+
+
+def machine_capacity() -> Tuple[int, float]:
+    """Returns the CPU count and available memory (in GB) of this machine."""
+    mem_gb = float("inf")
+    try:
+        with open(_MEMINFO) as f:
+            info = dict(line.split(":", 1) for line in f if ":" in line)
+        kb = info.get("MemAvailable") or info.get("MemTotal")
+        mem_gb = int(kb.split()[0]) / 2**20 if kb else mem_gb
+    except OSError:       # Not on linux, so memory is not scheduled
+        pass
+    return os.cpu_count() or 1, mem_gb
+
+
+def thread_env(resources: Resources) -> Dict[str, str]:
+    """Returns the environment variables limiting numeric libraries' thread counts."""
+    threads = str(max(1, int(resources.cpus)))
+    return {var: threads for var in _THREAD_ENV_VARS}
+
+
+class Scheduler(object):
+    """Tracks the resources held by running Dats, and picks which to start next."""
+
+    def __init__(self, slots: int = None, cpus: float = None, mem_gb: float = None):
+        machine_cpus, machine_mem_gb = machine_capacity()
+        self.slots = slots or machine_cpus
+        self.cpus = machine_cpus if cpus is None else cpus
+        self.mem_gb = machine_mem_gb if mem_gb is None else mem_gb
+        self.running: List[Resources] = []
+
+    def fit(self, resources: Resources) -> Resources:
+        """Returns the resources with undeclared CPUs set to a worker's share of the
+        machine, and limited to (and exclusive of) the machine if they exceed it."""
+        if resources.cpus is None:
+            resources = resources._replace(cpus=self.cpus / self.slots)
+        if resources.cpus > self.cpus or resources.mem_gb > self.mem_gb:
+            return resources._replace(cpus=min(resources.cpus, self.cpus),
+                                      mem_gb=min(resources.mem_gb, self.mem_gb),
+                                      exclusive=True)
+        return resources
+
+    def fits(self, resources: Resources) -> bool:
+        """True if a run needing 'resources' can start now."""
+        if not self.running:
+            return True
+        elif resources.exclusive or any(r.exclusive for r in self.running) or \
+                len(self.running) >= self.slots:
+            return False
+        cpus = sum(r.cpus for r in self.running) + resources.cpus
+        mem_gb = sum(r.mem_gb for r in self.running) + resources.mem_gb
+        return cpus <= self.cpus + _TOLERANCE and mem_gb <= self.mem_gb + _TOLERANCE
+
+    def next_runnable(self, pending: List[Any],
+                      resources: Union[List[Resources], Dict[Any, Resources]]) -> Any:
+        """Returns (and removes) the first of the pending keys (indices or names)
+        whose resources fit, marking them as held.  Returns None if none fit."""
+        for position, key in enumerate(pending):
+            if self.fits(resources[key]):
+                self.running.append(resources[key])
+                del pending[position]
+                return key
+        return None
+
+    def release(self, resources: Resources) -> None:
+        self.running.remove(resources)
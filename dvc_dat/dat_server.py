@@ -0,0 +1,191 @@
+import os
+import sys
+import json
+import socket
+import signal
+import selectors
+import traceback
+import contextlib
+from typing import Any, Dict, List, Optional
+
+import dvc_dat_client
+from dvc_dat_client import _STDOUT, _STDERR, _EXIT, _HEADER
+from dvc_dat.dat import Dat, _DAT_CONFIG_JSON, _DAT_CONFIG_YAML
+
+"""
+A warm 'dat' server, so shell loops of dat commands skip interpreter startup,
+.datconfig discovery, mount scanning, and do module imports.
+
+    dat --server &          # Starts the server for this .datconfig folder
+    dat my_cmd ...          # Now runs on the server (in-process if none is running)
+
+SERVER
+- Listens on a Unix domain socket keyed by the .datconfig folder (socket_path()).
+- Each command runs in a child forked from the server, so it starts with the
+  server's loaded modules and caches, and cannot corrupt them.
+  Before forking, the server loads the command's base (so later commands reuse
+  it) and reloads any base whose file has changed (see do.reload).
+- The server restarts itself when its .datconfig file changes.
+- The socket is only usable by its user (mode 0600), since commands run as them.
+
+CLIENT
+- 'dat' forwards its argv, CWD, and environment to the server, streams back the
+  command's stdout and stderr, and exits with the command's exit code.  This is
+  done by 'dvc_dat_client' before dvc_dat is imported, so the client skips its
+  startup too.
+- Stdin is not forwarded, so commands with a '-' (stdin) argument run in-process.
+  Set DAT_NO_SERVER=1 to always run in-process.
+"""
+
+_POLL_SECONDS = 1.0                           # How often .datconfig is checked
+
+
+def socket_path(folder: str = None) -> str:
+    """Returns the server socket path for a .datconfig folder."""
+    return dvc_dat_client.socket_path(folder or Dat.manager.folder)
+
+
+def forward(argv: List[str]) -> Optional[int]:
+    """Runs 'argv' on the server, streaming back its output.
+    Returns its exit code, or None if no server is running."""
+    return dvc_dat_client.forward(argv, Dat.manager.folder)
+
+
+def serve() -> None:
+    """Serves dat commands until interrupted, restarting if .datconfig changes."""
+    from dvc_dat import do
+    path = socket_path()
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    with probe, contextlib.suppress(OSError):
+        probe.connect(path)
+        raise Exception(f"DAT SERVER: Already running on {path!r}")
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(path)
+    config = _config_file()
+    config_mtime = _get_mtime(config)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)   # Children are reaped by the OS
+    try:
+        umask = os.umask(0o177)       # Binds the socket as mode 0600
+        try:
+            listener.bind(path)
+        finally:
+            os.umask(umask)
+        listener.listen()
+        listener.settimeout(_POLL_SECONDS)
+        print(f"# Dat server listening on {path}", flush=True)
+        while _get_mtime(config) == config_mtime:
+            try:
+                conn, _ = listener.accept()
+            except socket.timeout:
+                continue
+            with conn:
+                conn.settimeout(None)
+                request = json.loads(conn.makefile("rb").readline() or "{}")
+                if "argv" not in request:
+                    continue
+                do.reload()
+                _warm(do, request["argv"])
+                sys.stdout.flush()
+                sys.stderr.flush()
+                if os.fork() == 0:
+                    listener.close()
+                    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                    _relay(conn, request)
+    except KeyboardInterrupt:
+        return
+    finally:
+        listener.close()
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+    print(f"# {config} changed, restarting the dat server", flush=True)
+    argv = getattr(sys, "orig_argv", None) or [sys.executable, "-m", "dvc_dat",
+                                                "--server"]
+    os.execv(sys.executable, argv)
+
+
+def _relay(conn: socket.socket, request: Dict[str, Any]) -> None:
+    """(In a child of the server) Runs the request in a grandchild, and relays its
+    stdout and stderr back over 'conn' followed by its exit code."""
+    out_r, out_w = os.pipe()
+    err_r, err_w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        conn.close()
+        os.dup2(os.open(os.devnull, os.O_RDONLY), 0)
+        os.dup2(out_w, 1)
+        os.dup2(err_w, 2)
+        for fd in (out_r, out_w, err_r, err_w):
+            os.close(fd)
+        os._exit(_run(request))
+    os.close(out_w)
+    os.close(err_w)
+    selector = selectors.DefaultSelector()
+    selector.register(out_r, selectors.EVENT_READ, _STDOUT)
+    selector.register(err_r, selectors.EVENT_READ, _STDERR)
+    try:
+        while selector.get_map():
+            for key, _ in selector.select():
+                if data := os.read(key.fd, 65536):
+                    _send(conn, key.data, data)
+                else:
+                    selector.unregister(key.fd)
+                    os.close(key.fd)
+        _, status = os.waitpid(pid, 0)
+        _send(conn, _EXIT, str(os.waitstatus_to_exitcode(status)).encode())
+    except OSError:           # The client went away, so stop its command
+        with contextlib.suppress(OSError):
+            os.kill(pid, signal.SIGTERM)
+    os._exit(0)
+
+
+def _run(request: Dict[str, Any]) -> int:
+    """Runs a forwarded command in-process and returns its exit code."""
+    from dvc_dat.__main__ import run
+    os.chdir(request["cwd"])
+    os.environ.clear()
+    os.environ.update(request["env"])
+    sys.argv = list(request["argv"])
+    code = 0
+    try:
+        run(sys.argv)
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            code = e.code or 0
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException:     # noqa -- Reported to the client like an uncaught error
+        traceback.print_exc()
+        code = 1
+    sys.stdout.flush()
+    sys.stderr.flush()
+    return code
+
+
+def _warm(do, argv: List[str]) -> None:
+    """Loads the base of the command in 'argv' into the server, ignoring errors."""
+    from dvc_dat.do_fn import _parse_argv
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), \
+            contextlib.redirect_stderr(devnull), contextlib.suppress(Exception):
+        _, args, _, _ = _parse_argv(argv[1:])
+        if args:
+            do.load(args[0])
+
+
+def _send(conn: socket.socket, channel: bytes, data: bytes) -> None:
+    conn.sendall(_HEADER.pack(channel, len(data)) + data)
+
+
+def _config_file() -> Optional[str]:
+    for name in (_DAT_CONFIG_JSON, _DAT_CONFIG_YAML):
+        if os.path.exists(path := os.path.join(Dat.manager.folder, name)):
+            return path
+    return None
+
+
+def _get_mtime(path: Optional[str]) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns if path else None
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,281 @@
+import os
+import json
+import time
+import uuid
+import ctypes
+import shutil
+import threading
+import statistics
+import traceback
+import contextlib
+import multiprocessing
+from multiprocessing import connection
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Union
+
+from dvc_dat.dat import Dat, _RESULT_JSON
+
+"""
+Speculative re-execution of stragglers within do.map (and so within sweeps).
+
+    do.map(None, dats, workers=8, speculate=2.0)
+    dat --sweep model.lr=0.1,0.01 my_cmd --jobs 8 --speculate 2
+
+SPECULATION
+- A run is a straggler once it has taken 'speculate' times its expected run time:
+  its estimate from the run times of earlier runs (see dat_cost), or else the
+  median run time of the runs of this batch that have completed (once 3 have).
+- A straggler gets one duplicate run, started (when fewer than 'workers' runs are
+  in progress, i.e. at the tail of the batch) on a copy of its Dat's folder placed
+  in a scratch folder.  The copy is only made when the duplicate is started, and
+  only of the files that were in the folder before its run began (as they are
+  then), so runs that do not straggle are never copied.
+- Whichever run finishes first is kept and the other is killed.  If the duplicate
+  wins, its folder is atomically exchanged with the Dat's folder (renameat2 with
+  RENAME_EXCHANGE on Linux, else two renames), and the straggler's folder removed.
+  The results of a speculated Dat note the winner under "dat.speculated".
+
+LIMITS
+- Each run is in its own forked process (killable, unlike pooled workers), so
+  speculation requires the "process" executor.
+- Do fns should only write within their Dat's folder, and should not record its
+  absolute path, since a duplicate runs at a different path.  (Pipelines, whose
+  stages read their siblings' folders, are not run speculatively.)
+"""
+
+_DAT_SPECULATED = "dat.speculated"
+_SCRATCH_FOLDER = ".dat_scratch"
+MIN_SAMPLES = 3            # Completed runs needed to use the batch median
+MIN_SECONDS = 1.0          # Runs are never duplicated before this many seconds
+POLL_SECONDS = 0.1         # How often running runs are checked
+ORIGINAL, DUPLICATE = "original", "duplicate"
+_RENAME_EXCHANGE = 2
+_AT_FDCWD = -100
+
+
+class _Attempt(object):
+    """One run of a Dat (in a forked process) at a given folder."""
+
+    def __init__(self, kind: str, process: multiprocessing.Process,
+                 conn: connection.Connection, folder: str):
+        self.kind, self.process, self.conn, self.folder = kind, process, conn, folder
+
+    def kill(self) -> None:
+        with contextlib.suppress(OSError, ValueError):
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class _Task(object):
+    """A submitted run, with its attempts and the files its duplicate copies."""
+
+    def __init__(self, path: str, call: Dict[str, Any], expected: Optional[float]):
+        self.path, self.call, self.expected = path, call, expected
+        self.future = Future()
+        self.started = time.time()
+        self.entries: Set[str] = set()    # Paths in its folder before its run
+        self.attempts: List[_Attempt] = []
+        self.speculated = False
+
+
+class SpeculativePool(object):
+    """Runs Dats in forked processes, duplicating those that straggle."""
+
+    def __init__(self, workers: int, speculate: float, *, manager=None,
+                 min_seconds: float = None):
+        self.workers = workers
+        self.speculate = speculate
+        self.manager = manager
+        self.min_seconds = MIN_SECONDS if min_seconds is None else min_seconds
+        self.durations: List[float] = []     # Run times of this batch's runs
+        self.tasks: List[_Task] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        methods = multiprocessing.get_all_start_methods()
+        self._context = multiprocessing.get_context("fork" if "fork" in methods
+                                                    else None)
+        self._monitor = threading.Thread(target=self._watch, daemon=True)
+        self._monitor.start()
+
+    def __enter__(self) -> "SpeculativePool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.shutdown()
+
+    def submit(self, path: str, do_spec: Union[str, Callable, None], args: Iterable,
+               kwargs: Dict[str, Any], env: Dict[str, str] = None, *,
+               expected: float = None) -> Future:
+        """Starts running the Dat at 'path', returning the future of its
+        (result, error).  'expected' is its estimated run time, if known."""
+        task = _Task(path, {"do_spec": do_spec, "args": args, "kwargs": kwargs,
+                            "env": env}, expected)
+        task.entries = _list_entries(path)
+        with self._lock:
+            task.attempts.append(self._start(ORIGINAL, task, path))
+            self.tasks.append(task)
+        return task.future
+
+    def shutdown(self) -> None:
+        self._stop.set()
+        self._monitor.join()
+        with self._lock:
+            for task in self.tasks:
+                self._finish(task, None, (None, "Speculative pool shut down"))
+
+    def _watch(self) -> None:
+        while not self._stop.is_set():
+            with self._lock:
+                conns = [a.conn for t in self.tasks for a in t.attempts]
+            if conns:
+                ready = connection.wait(conns, timeout=POLL_SECONDS)
+            else:
+                ready = []
+                self._stop.wait(POLL_SECONDS)
+            with self._lock:
+                for task in list(self.tasks):
+                    for attempt in list(task.attempts):
+                        if attempt.conn in ready:
+                            self._collect(task, attempt)
+                self._speculate()
+
+    def _collect(self, task: _Task, attempt: _Attempt) -> None:
+        """Takes the outcome of a finished attempt, completing the task unless the
+        attempt died while another is still running."""
+        try:
+            outcome = attempt.conn.recv()
+        except (EOFError, OSError):
+            outcome = (None, f"Worker process for {task.path!r} exited with "
+                             f"code {attempt.process.exitcode}\n")
+            if len(task.attempts) > 1:
+                attempt.kill()
+                task.attempts.remove(attempt)
+                return
+        self._finish(task, attempt, outcome)
+
+    def _finish(self, task: _Task, winner: Optional[_Attempt], outcome: Any) -> None:
+        for attempt in task.attempts:
+            if attempt is not winner:
+                attempt.kill()
+        if winner:
+            winner.process.join()
+            winner.conn.close()
+        try:
+            if winner and winner.kind == DUPLICATE:
+                _exchange(winner.folder, task.path)
+                shutil.rmtree(winner.folder, ignore_errors=True)  # The straggler's
+            if task.speculated and winner:
+                _note_winner(task.path, winner.kind, time.time() - task.started)
+        except OSError:
+            outcome = (None, traceback.format_exc())
+        for attempt in task.attempts:
+            if attempt.kind == DUPLICATE and attempt is not winner:
+                shutil.rmtree(attempt.folder, ignore_errors=True)
+        task.attempts = []
+        self.tasks.remove(task)
+        if winner:
+            self.durations.append(time.time() - task.started)
+        task.future.set_result(outcome)
+
+    def _speculate(self) -> None:
+        """Starts a duplicate of each straggler, while workers are free."""
+        running = sum(len(t.attempts) for t in self.tasks)
+        baseline = statistics.median(self.durations) \
+            if len(self.durations) >= MIN_SAMPLES else None
+        for task in self.tasks:
+            if running >= self.workers:
+                return
+            expected = task.expected if task.expected is not None else baseline
+            elapsed = time.time() - task.started
+            if task.speculated or expected is None or elapsed < self.min_seconds or \
+                    elapsed < self.speculate * expected:
+                continue
+            task.speculated = True
+            folder = _scratch_folder(task.path)
+            try:
+                _copy_entries(task.path, folder, task.entries)
+            except OSError:       # e.g. a file removed by the run while copied
+                shutil.rmtree(folder, ignore_errors=True)
+                continue
+            task.attempts.append(self._start(DUPLICATE, task, folder))
+            running += 1
+
+    def _start(self, kind: str, task: _Task, folder: str) -> _Attempt:
+        receiver, sender = self._context.Pipe(duplex=False)
+        manager = self.manager if self._context.get_start_method() == "fork" else None
+        process = self._context.Process(
+            target=_run_attempt, daemon=True,
+            args=(sender, manager, folder, task.call["do_spec"], task.call["args"],
+                  task.call["kwargs"], task.call["env"]))
+        process.start()
+        sender.close()
+        return _Attempt(kind, process, receiver, folder)
+
+
+def _run_attempt(sender: connection.Connection, manager, folder: str,
+                 do_spec: Union[str, Callable, None], args: Iterable,
+                 kwargs: Dict[str, Any], env: Dict[str, str]) -> None:
+    """(In a forked process) Runs the Dat at 'folder', sending (result, error)."""
+    from dvc_dat.do_fn import _map_worker
+    outcome = _map_worker(manager, folder, do_spec, args, kwargs, env)
+    try:
+        sender.send(outcome)
+    except Exception:    # e.g. an unpicklable result
+        sender.send((None, traceback.format_exc()))
+    sender.close()
+
+
+def _scratch_folder(path: str) -> str:
+    """Returns a new scratch folder path on the same file system as 'path'."""
+    root = os.path.join(Dat.manager.sync_folder, _SCRATCH_FOLDER)
+    os.makedirs(root, exist_ok=True)
+    if os.stat(root).st_dev != os.stat(os.path.dirname(path)).st_dev:
+        root = os.path.dirname(path)
+    name = f".{os.path.basename(path)}.{uuid.uuid4().hex[:8]}"
+    return os.path.join(root, name)
+
+
+def _list_entries(folder: str) -> Set[str]:
+    """Returns the relative paths of the files and folders within 'folder'."""
+    entries = set()
+    for root, dirs, files in os.walk(folder):
+        for name in dirs + files:
+            entries.add(os.path.relpath(os.path.join(root, name), folder))
+    return entries
+
+
+def _copy_entries(source: str, target: str, entries: Set[str]) -> None:
+    """Copies the given entries of folder 'source' (see _list_entries) to 'target'."""
+    def ignore(folder: str, names: List[str]) -> List[str]:
+        return [name for name in names
+                if os.path.relpath(os.path.join(folder, name), source) not in entries]
+    shutil.copytree(source, target, symlinks=True, ignore=ignore)
+
+
+def _exchange(a: str, b: str) -> None:
+    """Atomically exchanges two folders (if the OS allows, else with two renames)."""
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.renameat2(_AT_FDCWD, a.encode(), _AT_FDCWD, b.encode(),
+                          _RENAME_EXCHANGE) == 0:
+            return
+    except (AttributeError, OSError):   # No renameat2 (e.g. not on Linux)
+        pass
+    aside = f"{a}.aside"
+    os.rename(b, aside)
+    os.rename(a, b)
+    os.rename(aside, a)
+
+
+def _note_winner(path: str, winner: str, seconds: float) -> None:
+    """Notes in a speculated Dat's results which of its runs was kept."""
+    results_path = os.path.join(path, _RESULT_JSON)
+    try:
+        with open(results_path) as f:
+            results = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        results = {}
+    Dat.set(results, _DAT_SPECULATED, {"winner": winner, "seconds": round(seconds, 3)})
+    with open(results_path, "w") as f:
+        json.dump(results, f, indent=2)
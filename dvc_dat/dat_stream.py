@@ -0,0 +1,165 @@
+import os
+import json
+import shutil
+import urllib.parse
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Tuple
+
+import pandas as pd
+from pandas import DataFrame
+from dvc_dat.dat_columns import ColumnStore
+
+"""
+Streams the points of a Cube to disk in fixed-size chunks, so Cubes (and reports)
+with more points than fit in memory can be built.  (Used by 'Cube(..., stream=)'
+and the 'dat_report' "stream" setting.)
+
+LAYOUT
+    FOLDER/_stream.json ........................ The format, partition columns, etc.
+    FOLDER/COL1=VALUE/COL2=VALUE/part-00000.parquet .. Rows of one chunk and partition
+
+- Each chunk of 'chunk_rows' points is split by the values of the 'partition_by'
+  columns (e.g. the 'docs' and then 'sheets' of a report), and each part is written
+  to the folder of its values.  Values are %-quoted, and rows without the column
+  go in 'COL=__null__'.  The partition columns are also kept within the files.
+- Parts are written as Parquet if pyarrow (or fastparquet) is installed, and as
+  CSV otherwise, or when a chunk's values can not be written as Parquet.
+- An existing stream folder is replaced, but other non-empty folders are not.
+
+READING
+- 'read_stream(FOLDER)' returns all of the points as a single DataFrame, while
+  'iter_partitions(FOLDER, depth)' yields the DataFrame of each partition of the
+  first 'depth' partition columns, so a report can load only one doc at a time.
+"""
+
+CHUNK_ROWS = 100_000
+_MANIFEST = "_stream.json"
+_NULL = "__null__"        # The folder value of rows without a partition column
+
+
+class CubeStream(object):
+    """Writes points to a stream folder in chunks (see module doc)."""
+
+    def __init__(self, folder: str, *, partition_by: List[str] = None,
+                 chunk_rows: int = CHUNK_ROWS):
+        if chunk_rows < 1:
+            raise ValueError(f"CubeStream: chunk_rows must be positive, not "
+                             f"{chunk_rows!r}")
+        self.folder, self.chunk_rows = folder, chunk_rows
+        self.partition_by = list(partition_by or [])
+        self.store, self.chunks, self.rows = ColumnStore(), 0, 0
+        self.engine = _parquet_engine()
+        if os.path.exists(os.path.join(folder, _MANIFEST)):
+            shutil.rmtree(folder)
+        elif os.path.isdir(folder) and os.listdir(folder):
+            raise Exception(f"CubeStream: {folder!r} is not empty")
+        os.makedirs(folder, exist_ok=True)
+        self._write_manifest(done=False)
+
+    def extend(self, points: Iterable[Dict[str, Any]],
+               indicies: Dict[Hashable, str] = None) -> None:
+        """Appends points (which may be a generator), writing each full chunk."""
+        batch = []
+        for point in points:
+            batch.append(point)
+            if len(self.store) + len(batch) >= self.chunk_rows:
+                self.store.extend(batch, indicies)
+                batch = []
+                self.flush()
+        if batch:
+            self.store.extend(batch, indicies)
+
+    def flush(self) -> None:
+        """Writes the buffered points as a chunk."""
+        if not len(self.store):
+            return
+        df = self.store.get_df()
+        columns = [column for column in self.partition_by if column in df.columns]
+        if not columns:
+            self._write_part(df, [])
+        else:
+            groups = df.groupby(columns, observed=True, dropna=False, sort=False)
+            for values, part in groups:
+                values = dict(zip(columns, values))
+                self._write_part(part, [
+                    f"{column}={_quote(values.get(column))}"
+                    for column in self.partition_by])
+        self.rows += len(self.store)
+        self.chunks += 1
+        self.store = ColumnStore()
+
+    def close(self) -> None:
+        """Writes any buffered points, and marks the stream as done."""
+        self.flush()
+        self._write_manifest(done=True)
+
+    def _write_part(self, df: DataFrame, folders: List[str]) -> None:
+        folder = os.path.join(self.folder, *folders)
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"part-{self.chunks:05d}")
+        if self.engine:
+            try:
+                df.to_parquet(f"{path}.parquet", engine=self.engine, index=False)
+                return
+            except (TypeError, ValueError):   # e.g. a column of mixed types
+                if os.path.exists(f"{path}.parquet"):
+                    os.remove(f"{path}.parquet")
+        df.to_csv(f"{path}.csv", index=False)
+
+    def _write_manifest(self, done: bool) -> None:
+        manifest = {"format": "parquet" if self.engine else "csv",
+                    "partition_by": self.partition_by, "chunk_rows": self.chunk_rows,
+                    "chunks": self.chunks, "rows": self.rows, "done": done}
+        with open(os.path.join(self.folder, _MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+
+def read_stream(folder: str) -> DataFrame:
+    """Returns all of the points of a stream folder as one DataFrame."""
+    frames = [df for _, df in iter_partitions(folder)]
+    return pd.concat(frames, ignore_index=True) if frames else DataFrame()
+
+
+def iter_partitions(folder: str, depth: int = 0
+                    ) -> Iterator[Tuple[Dict[str, str], DataFrame]]:
+    """Yields the ({COLUMN: VALUE}, DataFrame) of each partition of a stream folder,
+    split by its first 'depth' partition columns (one DataFrame if 'depth' is 0)."""
+    if not os.path.exists(os.path.join(folder, _MANIFEST)):
+        raise Exception(f"iter_partitions: {folder!r} is not a Cube stream")
+    groups: Dict[Tuple[str, ...], List[str]] = {}
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        parts = os.path.relpath(root, folder).split(os.sep)
+        parts = [] if parts == ["."] else parts
+        for name in sorted(files):
+            if name.startswith("part-"):
+                groups.setdefault(tuple(parts[:depth]), []).append(
+                    os.path.join(root, name))
+    for parts, paths in groups.items():
+        values = dict(part.split("=", 1) for part in parts)
+        values = {k: None if v == _NULL else urllib.parse.unquote(v)
+                  for k, v in values.items()}
+        yield values, pd.concat([_read_part(path) for path in paths],
+                                ignore_index=True)
+
+
+def _read_part(path: str) -> DataFrame:
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def _quote(value: Any) -> str:
+    if value is None or (isinstance(value, float) and value != value):    # NaN
+        return _NULL
+    return urllib.parse.quote(str(value), safe=" ")
+
+
+def _parquet_engine() -> str:
+    """Returns the installed Parquet engine ("" if there is none)."""
+    for engine in ("pyarrow", "fastparquet"):
+        try:
+            __import__(engine)
+            return engine
+        except ImportError:
+            pass
+    return ""
@@ -0,0 +1,150 @@
+import copy
+import json
+import time
+import itertools
+from typing import Any, Dict, List, Tuple
+
+from dvc_dat.dat import Dat, DatContainer
+
+"""
+Parameter sweeps, which expand one template into many Dats and run them in parallel.
+
+    dat --sweep model.lr=0.1,0.01,0.001 --sweep model.depth=2,4 my_cmd --jobs 8
+    dat --sweep model.lr=0.1,0.01 --sweep model.depth=2,4 --zip my_cmd
+
+SPEC SECTION
+    dat:
+      sweep:
+        params: {model.lr: [0.1, 0.01], model.depth: [2, 4]}   # Dotted spec keys
+        zip: false        # If true, the Nth values of all params form the Nth point
+                          # (else the cartesian product of the params is used)
+        workers: 8        # Number of points run at once (defaults to the CPUs)
+        executor: process # "process" or "thread", as in do.map
+        speculate: 2.0    # Reruns points taking 2x their expected time (do.map)
+
+RUNNING
+- 'do' of a template with a "dat.sweep.params" section runs it as a sweep.
+- The template (and its 'dat.base' specs) is expanded once, and each point becomes a
+  child Dat of a DatContainer created at the template's 'dat.path'.
+- While running, "sweep.progress" in the container's results is updated, and on
+  completion "sweep.points" holds the params, status, and result of each point.
+"""
+
+_DAT_SWEEP_PARAMS = "dat.sweep.params"
+_SWEEP_PROGRESS = "sweep.progress"
+_SWEEP_POINTS = "sweep.points"
+_PROGRESS_SECONDS = 10     # Max seconds between saves of the sweep's progress
+
+
+def is_sweep(spec: Dict) -> bool:
+    return bool(Dat.get(spec, _DAT_SWEEP_PARAMS, None))
+
+
+def parse_sweep_arg(text: str) -> Tuple[str, List[Any]]:
+    """Parses a 'KEY=V1,V2,...' sweep argument into its key and list of values."""
+    if "=" not in text:
+        raise Exception(f"SWEEP: Expected KEY=VALUE1,VALUE2,... not {text!r}")
+    key, values = text.split("=", 1)
+    return key.strip(), [_parse_scalar(v) for v in values.split(",")]
+
+
+def sweep_points(params: Dict[str, List[Any]], *, zip_: bool = False) -> \
+        List[Dict[str, Any]]:
+    """Returns the list of {KEY: VALUE, ...} points for the swept params."""
+    keys = list(params)
+    values = [v if isinstance(v, list) else [v] for v in params.values()]
+    if zip_:
+        if len(set(map(len, values))) > 1:
+            raise Exception(f"SWEEP: Zipped params must have equal lengths: {params}")
+        combos = zip(*values)
+    else:
+        combos = itertools.product(*values)
+    return [dict(zip(keys, combo)) for combo in combos]
+
+
+def point_spec(spec: Dict, point: Dict[str, Any]) -> Dict:
+    """Returns a copy of the spec with the values of one point of a sweep set."""
+    spec = copy.deepcopy(spec)
+    for key, value in point.items():
+        Dat.set(spec, key, value)
+    return spec
+
+
+def sweep_specs(spec: Dict) -> List[Dict]:
+    """Returns the spec of each point of a (expanded) sweep spec."""
+    spec = copy.deepcopy(spec)
+    sweep = spec["dat"].pop("sweep")
+    points = sweep_points(sweep["params"], zip_=_parse_bool(sweep.get("zip", False)))
+    return [point_spec(spec, point) for point in points]
+
+
+def run_sweep(template: Dict, *args, do=None, **kwargs) -> Dict[str, Any]:
+    """Runs each point of the template's "dat.sweep" section as a child Dat of a
+    new DatContainer, and returns a summary of the sweep."""
+    if do is None:
+        from dvc_dat import do
+    spec = do.expand_spec(template)
+    sweep, path = spec["dat"].pop("sweep"), spec["dat"].pop("path", None)
+    overwrite = spec["dat"].pop("path_overwrite", False)
+    spec["dat"].pop("base", None)      # The children share this one expansion
+    points = sweep_points(sweep["params"], zip_=_parse_bool(sweep.get("zip", False)))
+    container: DatContainer = Dat.manager.create(
+        path=path, overwrite=overwrite,
+        spec={"dat": {"class": "DatContainer", "sweep": sweep}, "template": spec})
+    width = len(str(len(points) - 1))
+    children = []
+    for i, point in enumerate(points):
+        path = f"{container.get_path()}/point{i:0{width}d}"
+        children.append(do.dat_from_template(point_spec(spec, point), path=path,
+                                             ephemeral=False))
+    entries = [{"point": child.get_path_tail(), "params": point, "status": "pending"}
+               for child, point in zip(children, points)]
+    progress = {"total": len(points), "done": 0, "failed": 0}
+    last_save = 0
+    workers = int(sweep["workers"]) if sweep.get("workers") else None
+    speculate = float(sweep["speculate"]) if sweep.get("speculate") else None
+    for mapped in do.map(None, children, *args, workers=workers,
+                         executor=sweep.get("executor", "process"),
+                         speculate=speculate, **kwargs):
+        entry = entries[mapped.index]
+        if mapped.error:
+            progress["failed"] += 1
+            entry.update(status="failed", error=mapped.error.strip().split("\n")[-1])
+        else:
+            progress["done"] += 1
+            entry.update(status="done", result=describe_result(mapped.result))
+        finished = progress["done"] + progress["failed"]
+        if time.time() - last_save > _PROGRESS_SECONDS or finished == len(points):
+            last_save = time.time()
+            Dat.set(container.get_results(), _SWEEP_PROGRESS, dict(progress))
+            container.save()
+            print(f"# Sweep {container.get_path_name()}: {progress['done']}/"
+                  f"{len(points)} done, {progress['failed']} failed", flush=True)
+    Dat.set(container.get_results(), _SWEEP_POINTS, entries)
+    container.save()
+    return {"path": container.get_path_name(), **progress}
+
+
+def describe_result(result: Any) -> Any:
+    """Returns the result as is if it is JSON, else its (truncated) repr."""
+    try:
+        json.dumps(result)
+        return result
+    except (TypeError, ValueError):
+        return repr(result)[:200]
+
+
+def _parse_scalar(text: str) -> Any:
+    """Parses text as an int, as a float, else as a string (like Dat.sets)."""
+    text = text.strip()
+    for kind in (int, float):
+        try:
+            return kind(text)
+        except ValueError:
+            pass
+    return text
+
+
+def _parse_bool(value: Any) -> bool:
+    return value is True or str(value).lower() in ("true", "1", "yes")
+
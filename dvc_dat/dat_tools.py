@@ -1,10 +1,18 @@
 import os
+import functools
+import itertools
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
 from typing import Union, Iterable, Dict, List, Any, Callable, Tuple
 
 import numpy as np
 import pandas as pd
 from pandas import DataFrame, ExcelWriter, Series
 from dvc_dat import Dat, DatContainer
+from dvc_dat.dat_trace import traced
+from dvc_dat.dat_metric_cache import MetricCache, metric_key
+from dvc_dat.dat_columns import ColumnStore
+from dvc_dat.dat_stream import CubeStream, CHUNK_ROWS, read_stream, iter_partitions
 
 """
 Helper functions for creating data frames and manipulating data frames.
@@ -14,18 +22,45 @@ API
 - from_dat(dats, point_fns)
 - as_points(df)
 - get_excel(df, path)
+- read_stream(folder), iter_partitions(folder, depth)
 - Cube.from_df(df)
-- Cube(dats, point_fns)
+- Cube(dats, point_fns, workers=, executor=, cache=, stream=, partition_by=,
+       chunk_rows=)
   .get_df()
   .points
-
+  .store
+
+PARALLEL CUBES
+- With 'workers', the point_fns are run on that many Dats at once, in threads (the
+  default 'executor') or in the warm worker processes of 'do' (for CPU-bound
+  point_fns, which must then be importable functions or dotted names).
+- Points are added in the same order as they would be serially, and the exception
+  of a failing point_fn is recorded in the 'error' column of its Dat's point,
+  rather than stopping the Cube.
+
+CACHED CUBES
+- With 'cache=True', the output of each point_fn on each Dat is saved in the Dat's
+  folder's metric cache, and reused by later Cubes until the Dat's files or the
+  point_fn's source change (see dat_metric_cache).  So a report over a large
+  container only runs its metrics on the Dats added since it was last built.
+
+STREAMED CUBES
+- With 'stream=FOLDER', points are written to FOLDER in chunks of 'chunk_rows'
+  points, split into sub-folders by the values of the 'partition_by' columns, as
+  Parquet files (or CSV files without pyarrow; see dat_stream).  So point_fns
+  returning (or yielding, as generators) more points than fit in memory can be used.
+- The point_fns are run on one Dat (or 'workers' Dats) at a time, whose points
+  are written before the next Dats are run.  Generators are consumed as the points
+  are written, except in parallel Cubes, where they are consumed by the workers.
+- 'dat_report' streams with its "stream" setting (a folder, or true for the folder
+  'TITLE_points' within its report folder), partitioned by its docs and then its
+  sheets, and loads one doc at a time to write the Excel files.
 
 """
 
 
 Points = List[Dict[str, Any]]
 PointFn = Callable[[Dat], Any]
-_INDICIES = "indicies"   # Temp key used to store the indicies in cube points
 
 SOURCE = "source"
 METRICS = "metrics"
@@ -35,6 +70,12 @@ DOCS = "docs"
 SHEETS = "sheets"
 VERBOSE = "verbose"
 SHOW = "show"
+JOBS = "jobs"
+CACHE = "cache"
+STREAM = "stream"
+CHUNK = "chunk_rows"
+EXECUTOR = "executor"
+ERROR = "error"          # Column of the exceptions raised by point_fns (if parallel)
 
 
 def cmd_list(prefix: str = ""):
@@ -59,6 +100,7 @@ def from_dat(source: Union[Dat, str, Iterable],
     return df
 
 
+@traced("to_excel", arg="title")
 def to_excel(df: DataFrame, *,
              average: bool = False,
              columns: List[str] = None,
@@ -168,7 +210,7 @@ def to_excel(df: DataFrame, *,
         return path
     else:   # Splits the dataframe into multiple Excel files
         section_values: Tuple
-        for section_values, section_df in df.groupby(docs):
+        for section_values, section_df in df.groupby(docs, observed=True):
             section_path = (title + " " if title else "") + '-'.join(section_values)
             section_path = os.path.join(folder, section_path + ".xlsx")
             _create_sheets(section_path, section_df, "", sheets,
@@ -183,7 +225,7 @@ def _create_sheets(path, df, sheet_prefix, sheets, columns, verbose, show, index
         if not sheets:
             df.to_excel(writer, sheet_name=sheet_prefix or "Sheet1", index=index)
         else:
-            for sheet_values, sheet_df in df.groupby(sheets):
+            for sheet_values, sheet_df in df.groupby(sheets, observed=True):
                 sheet_values = [sheet_values] if isinstance(sheet_values,
                                                             str) else list(sheet_values)
                 sheet_title = sheet_prefix+" " if sheet_prefix else ''
@@ -227,10 +269,19 @@ def dat_report(
         columns: List[str] = None,
         formatted_columns: List[str] = None,
         verbose: bool = True,
-        show: bool = None) -> DataFrame:
+        show: bool = None,
+        jobs: int = None,
+        executor: str = None,
+        cache: bool = None,
+        stream: Union[str, bool] = None,
+        chunk_rows: int = None) -> Union[DataFrame, str]:
     """A dat script that runs the specified metrics over the specified "Dats".
     The results are saved to an Excel file.  The metrics are defined in the spec
-    (see to_excel for more details).
+    (see to_excel for more details).  With 'jobs', the metrics are computed on that
+    many Dats at once, and with 'cache' only the metrics of new or changed Dats
+    are computed (see Cube).  With 'stream', the points are streamed to that folder
+    (which is returned instead of the DataFrame) and the report is written from it
+    one doc at a time.
     """
     d: dict = spec.get_spec() if isinstance(spec, Dat) else spec
     mm = d.get("dat_report") or {}
@@ -244,7 +295,25 @@ def dat_report(
     formatted_columns = formatted_columns or mm.get("formatted_columns")
     verbose = mm.get(VERBOSE) if verbose is None else verbose
     show = mm.get(SHOW) if show is None else show
-    df = Cube(dats=source, point_fns=metrics).get_df()
+    jobs = jobs or mm.get(JOBS)
+    executor = executor or mm.get(EXECUTOR) or "thread"
+    cache = mm.get(CACHE, False) if cache is None else cache
+    stream = mm.get(STREAM) if stream is None else stream
+    chunk_rows = chunk_rows or mm.get(CHUNK) or CHUNK_ROWS
+    if stream:
+        stream = os.path.join(folder, f"{title or 'output'}_points") \
+            if stream is True else stream
+        Cube(dats=source, point_fns=metrics, workers=jobs and int(jobs),
+             executor=executor, cache=cache, stream=stream,
+             partition_by=(docs or []) + (sheets or []), chunk_rows=int(chunk_rows))
+        for _, df in iter_partitions(stream, len(docs or [])):
+            if formatted_columns:
+                _add_formatted_columns(df, formatted_columns)
+            to_excel(df, title=title, folder=folder, docs=docs, sheets=sheets,
+                     columns=columns, verbose=verbose, show=show)
+        return stream
+    df = Cube(dats=source, point_fns=metrics, workers=jobs and int(jobs),
+              executor=executor, cache=cache).get_df()
     if formatted_columns:
         _add_formatted_columns(df, formatted_columns)
     to_excel(df, title=title, folder=folder, docs=docs, sheets=sheets,
@@ -258,7 +327,8 @@ class Cube(object):
     information according to a defined set of axes.  The Cube class encodes a data-cube
     as a list of data points that are each encoded as a dict. The dict's key-value pairs
     indicate both and the indicies of each point within the data cube as well as data
-    values contained in those locations.
+    values contained in those locations.  (The points are stored as typed columns in
+    its 'store', and '.points' builds these dicts on each use; see dat_columns.)
 
     The cube's points are computed by calling all "do_fns" that are defined at the
     moment each dat is added to the cube.  Each do_fn returns a list of points that
@@ -271,7 +341,20 @@ class Cube(object):
       the name of the point_fn as the key and the scalar value as the value.
     - a dict, which is added to the cube as a data point.
     - a list of dicts, which are all added to the cube as a points.
+    - a generator of dicts, whose points are added as they are yielded.
     ==> Index keys are added to each dict to indicate which dat it came from.
+
+    PARALLEL:
+    With 'workers', point functions are run on that many Dats at once, using
+    'executor' threads or processes (see the module doc).
+
+    CACHE:
+    With 'cache' (True or a MetricCache), point function outputs are reused from
+    earlier Cubes over unchanged Dats (see the module doc).
+
+    STREAM:
+    With 'stream' (a folder), points are written there in chunks rather than kept,
+    and 'get_df' and 'points' read them back (see the module doc).
     """
     @staticmethod
     def from_df(df: DataFrame):
@@ -280,94 +363,192 @@ class Cube(object):
 
     def __init__(self, *, points: Points = None,
                  dats: Union[Dat, str, Iterable] = None,
-                 point_fns: List[Union[str, PointFn]] = None):
+                 point_fns: List[Union[str, PointFn]] = None,
+                 workers: int = None,
+                 executor: str = "thread",
+                 cache: Union[bool, MetricCache] = False,
+                 stream: str = None,
+                 partition_by: List[str] = None,
+                 chunk_rows: int = CHUNK_ROWS):
         # from . import do
-        self.points: Points = list(points) if points else []
+        if executor not in ("process", "thread"):
+            raise ValueError(f"Cube: Unknown executor {executor!r}")
+        self.store = ColumnStore()
+        self.stream = stream and CubeStream(stream, partition_by=partition_by,
+                                            chunk_rows=chunk_rows)
+        if points:
+            self._extend(points, {})
         self.point_fns: List[Callable[[Dat], Any]] = []
+        self.point_specs: List[Union[str, PointFn]] = list(point_fns or [])
+        self.workers, self.executor = workers, executor
+        self.cache = (MetricCache() if cache is True else cache) or None
         for fn_spec in point_fns or []:
             fn = Dat.manager.do.load(fn_spec) if isinstance(fn_spec, str) else fn_spec
             self.point_fns.append(fn)
         if dats:
             self._add_dats(dats, 1, {})
-            self._inject_indicies()
+        if self.stream:
+            self.stream.close()
 
     def __str__(self):
-        return f"Cube({len(self.points)} points)"
+        return f"Cube({self._point_count()} points)"
 
     def __repr__(self):
         result = f"+---- Cube" + \
-                 f"{len(self.points)} points, {len(self.point_fns)} do_fns) ----\n"
+                 f"{self._point_count()} points, {len(self.point_fns)} do_fns) ----\n"
         for point in self.points:
             items = [f"{k}={v!r}" for k, v in point.items()]
             result += f"| {', '.join(items)}\n"
         return result + "+------------------------------------"
 
+    def _point_count(self) -> int:
+        return self.stream.rows if self.stream else len(self.store)
+
+    @property
+    def points(self) -> Points:
+        """The cube's points, each as a dict with its indicies first."""
+        if self.stream:
+            return self.get_df().to_dict(orient="records")
+        return self.store.get_points()
+
     def get_df(self) -> DataFrame:
-        """Returns the cube as a Pandas DataFrame."""
-        return DataFrame(self.points)
+        """Returns the cube as a Pandas DataFrame (reading all of a streamed cube)."""
+        return read_stream(self.stream.folder) if self.stream else self.store.get_df()
 
+    @traced("Cube._add_dats", arg="source")
     def _add_dats(self, source: Union[Dat, str, Iterable],
             this_index: Union[int, str], indicies: Dict[str, str]) -> None:
-        """Recursively scans 'source' adding points derived from each md.Dat."""
+        """Adds the points derived from each Dat within 'source' (in order).  A
+        streamed cube computes (and writes) the points of 'workers' Dats at a time,
+        so only those Dats' outputs are held in memory."""
+        found: List[Tuple[Dat, Dict[str, str]]] = []
+        self._find_dats(source, this_index, indicies, found)
+        batch = (self.workers or 1) if self.stream else max(len(found), 1)
+        for start in range(0, len(found), batch):
+            batch_found = found[start:start + batch]
+            dats = [dat for dat, _ in batch_found]
+            for (_, dat_indicies), points in zip(batch_found, self._map_points(dats)):
+                self._extend(points, dat_indicies)
+
+    def _extend(self, points: Iterable[Dict[str, Any]],
+                indicies: Dict[str, str]) -> None:
+        (self.stream or self.store).extend(points, indicies)
+
+    def _find_dats(self, source: Union[Dat, str, Iterable],
+            this_index: Union[int, str], indicies: Dict[str, str],
+            found: List[Tuple[Dat, Dict[str, str]]]) -> None:
+        """Recursively scans 'source' appending each md.Dat and its indicies."""
         if isinstance(source, DatContainer):
-            self._add_dats(source.get_dats(), source.get_path_name(), indicies)
+            self._find_dats(source.get_dats(), source.get_path_name(), indicies, found)
         elif isinstance(source, Dat):
-            the_point, points = {}, []
-            for fn in self.point_fns:
-                output = fn(source)
-                if isinstance(output, str) or isinstance(output, int) or \
-                        isinstance(output, float) or isinstance(output, bool):
-                    the_point[fn.__name__] = output  # Adding single scalar to point
-                elif isinstance(output, Dict):
-                    the_point.update(output)  # Adding many values to point
-                elif isinstance(output, List):
-                    points += output  # Adding many points to result
-                else:
-                    raise Exception(
-                        f"The point_fn, {fn}, must return a list of dict "
-                        f"not {output!r}")
-            if the_point:
-                points.append(the_point)
-            for point in points:
-                sub_indicies = dict(indicies)
-                sub_indicies[this_index] = source.get_path_tail()
-                point[_INDICIES] = sub_indicies
-            self.points += points
+            sub_indicies = dict(indicies)
+            sub_indicies[this_index] = source.get_path_tail()
+            found.append((source, sub_indicies))
         elif isinstance(source, str):
-            self._add_dats(Dat.manager.load(source), this_index, indicies)
+            self._find_dats(Dat.manager.load(source), this_index, indicies, found)
         elif isinstance(source, List):
             for element in source:
-                self._add_dats(element, len(indicies) + 1, indicies)
+                self._find_dats(element, len(indicies) + 1, indicies, found)
         else:
             raise Exception(f"Expected a Dat, not: {source!r}")
 
-    def _inject_indicies(self) -> None:
-        """Scans points to find all existing indicies and builds a safe renaming
-            of these indicies to avoid index name collisions.  Then this renaming is
-            used to destructively inject indicies into each point in the cube."""
-
-        def rename_index(key: Union[int, str]) -> str:
-            if key in renaming:
-                return renaming[key]
-            if key not in point_keys and isinstance(key, str):
-                return key
-            # "list" used for unique unnamed indicies (encoded as ints)
-            new_key = base = "list" if isinstance(key, int) else key
-            i = 2
-            while new_key in point_keys:
-                i += 1
-                new_key = f"{base}{i}"
-            renaming[key] = new_key
-            return new_key
-
-        point_keys, renaming = set(), {}
-        for point in self.points:
-            point_keys.update(point.keys())
-        for point in self.points:
-            new_point = {}
-            for k, v in point[_INDICIES].items():
-                new_point[rename_index(k)] = v
-            new_point.update(point)     # Adds the point's data after indices
-            point.clear()
-            point.update(new_point)
-            del point[_INDICIES]
+    def _map_points(self, dats: List[Dat]) -> List[Iterable[Dict[str, Any]]]:
+        """Returns the points of each Dat, computing the outputs of its point_fns (in
+        parallel if so set) unless they are cached."""
+        capture = bool(self.workers)
+        if self.cache:
+            metrics = [metric_key(spec, fn)
+                       for spec, fn in zip(self.point_specs, self.point_fns)]
+            cached = [self.cache.lookup(dat, metrics) for dat in dats]
+        else:
+            cached = [{} for _ in dats]
+        todo = [[i for i in range(len(self.point_fns)) if i not in hits]
+                for hits in cached]
+        computed = self._map_outputs(dats, todo, capture)
+        points = []
+        for dat, hits, indices, outputs in zip(dats, cached, todo, computed):
+            new = {i: output for i, (output, error) in zip(indices, outputs)
+                   if error is None}
+            if self.cache and new:
+                self.cache.store(dat, metrics, new)
+            outputs = dict(zip(indices, outputs))
+            outputs.update({i: (output, None) for i, output in hits.items()})
+            points.append(_assemble_points(
+                self.point_fns, [outputs[i] for i in range(len(self.point_fns))],
+                capture))
+        return points
+
+    def _map_outputs(self, dats: List[Dat], todo: List[List[int]],
+                     capture: bool) -> List[List[Tuple[Any, Union[str, None]]]]:
+        """Returns the (output, error) of the point_fns with the 'todo' indices on
+        each Dat, running them on 'workers' Dats at once if it is set."""
+        fns = [[self.point_fns[i] for i in indices] for indices in todo]
+        if not self.workers:
+            return [_dat_outputs(dat, dat_fns) for dat, dat_fns in zip(dats, fns)]
+        elif self.executor == "thread":
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                return list(pool.map(functools.partial(_dat_outputs, capture=True),
+                                     dats, fns))
+        with Dat.manager.do._make_executor("process", self.workers) as pool:  # noqa
+            futures = [pool.submit(_dat_outputs_at, dat.get_path(),
+                                   [self.point_specs[i] for i in indices])
+                       for dat, indices in zip(dats, todo)]
+            return [future.result() for future in futures]
+
+
+def _dat_outputs(dat: Dat, point_fns: List[PointFn],
+                 capture: bool = False) -> List[Tuple[Any, Union[str, None]]]:
+    """Returns the (output, None) of each point_fn on a Dat.  If 'capture' is set
+    (as in workers), a failing point_fn gives (None, ERROR_MESSAGE) rather than
+    raising, and generators are consumed (into lists)."""
+    outputs = []
+    for fn in point_fns:
+        try:
+            output = fn(dat)
+            if capture and isinstance(output, Iterator):
+                output = list(output)
+            outputs.append((output, None))
+        except Exception as e:
+            if not capture:
+                raise
+            outputs.append((None, f"{getattr(fn, '__name__', fn)}: "
+                                  f"{type(e).__name__}: {e}"))
+    return outputs
+
+
+def _dat_outputs_at(path: str, point_specs: List[Union[str, PointFn]]
+                    ) -> List[Tuple[Any, Union[str, None]]]:
+    """(In a worker process) Returns the outputs for the Dat at 'path'."""
+    fns = [Dat.manager.do.load(spec) if isinstance(spec, str) else spec
+           for spec in point_specs]
+    Dat.manager.evict(path)    # A warm worker's cached copy may be stale
+    return _dat_outputs(Dat.manager.load(path), fns, capture=True)
+
+
+def _assemble_points(point_fns: List[PointFn],
+                     outputs: List[Tuple[Any, Union[str, None]]],
+                     capture: bool = False) -> Iterable[Dict[str, Any]]:
+    """Returns the points of a Dat from the (output, error) of each point_fn (lazily,
+    so generators are consumed as the points are used).  If 'capture' is set,
+    errors are recorded in the ERROR column of its point."""
+    the_point, points, errors = {}, [], []
+    for fn, (output, error) in zip(point_fns, outputs):
+        if isinstance(output, str) or isinstance(output, int) or \
+                isinstance(output, float) or isinstance(output, bool):
+            the_point[fn.__name__] = output  # Adding single scalar to point
+        elif isinstance(output, Dict):
+            the_point.update(output)  # Adding many values to point
+        elif isinstance(output, List) or isinstance(output, Iterator):
+            points.append(output)  # Adding many points to result
+        elif error is None and not capture:
+            raise Exception(
+                f"The point_fn, {fn}, must return a list of dict "
+                f"not {output!r}")
+        else:
+            errors.append(error or f"{getattr(fn, '__name__', fn)}: must return "
+                                   f"a scalar, dict, or list, not {output!r}")
+    if errors:
+        the_point[ERROR] = "; ".join(errors)
+    if the_point:
+        points.append([the_point])
+    return itertools.chain.from_iterable(points)
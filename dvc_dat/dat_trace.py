@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import inspect
+import threading
+import functools
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+"""
+Opt-in hierarchical tracing of do calls, Dat runs, loads, creates, and reports.
+
+API
+---
+- start_trace() ..................... Begins recording spans
+- stop_trace(folder=) -> [PATH, ...]  Stops recording and exports the trace
+- tracing(folder=) .................. Context manager for start/stop_trace
+- span(NAME, **args) ................ Context manager recording one span
+- @traced(NAME, arg=) ............... Decorator recording a span per call
+
+SPANS
+- Each span records its name, start, duration, process, thread, and its parent
+  span.  Parents propagate via contextvars, so spans nest correctly across nested
+  'do' calls, threads started with a copied context, and asyncio tasks.
+- When no trace is active, spans cost a single global check.
+
+EXPORT
+- The trace is written as both:
+    trace.json .... Chrome trace-event JSON (open in chrome://tracing or Perfetto)
+    trace.jsonl ... one JSON span per line
+- Files are written into the folder of the top-level Dat that was run while
+  tracing (or the CWD if no Dat was run), unless a folder is specified.
+"""
+
+TRACE_JSON = "trace.json"
+TRACE_JSONL = "trace.jsonl"
+
+_current_span: ContextVar[Optional["_Span"]] = ContextVar("dat_span", default=None)
+
+
+class _Tracer(object):
+    """Collects the spans recorded between start_trace and stop_trace."""
+
+    def __init__(self):
+        self.spans: List[Dict[str, Any]] = []
+        self.origin = time.perf_counter_ns()
+        self.started_at = time.time()
+        self._ids = iter(range(1, 2**62))
+        self._lock = threading.Lock()
+
+    def next_id(self) -> int:
+        with self._lock:
+            return next(self._ids)
+
+
+_tracer: Optional[_Tracer] = None
+
+
+class _Span(object):
+    """A context manager that records one span into the active tracer."""
+    __slots__ = ("tracer", "name", "args", "folder", "id", "parent", "depth",
+                 "start", "token")
+
+    def __init__(self, tracer: _Tracer, name: str, args: Dict[str, Any],
+                 folder: str = None):
+        self.tracer, self.name, self.args, self.folder = tracer, name, args, folder
+
+    def __enter__(self) -> "_Span":
+        parent = _current_span.get()
+        self.id = self.tracer.next_id()
+        self.parent = parent.id if parent else None
+        self.depth = parent.depth + 1 if parent else 0
+        self.token = _current_span.set(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        end = time.perf_counter_ns()
+        _current_span.reset(self.token)
+        record = {"id": self.id, "parent": self.parent, "name": self.name,
+                  "start_us": (self.start - self.tracer.origin) // 1000,
+                  "duration_us": (end - self.start) // 1000,
+                  "depth": self.depth, "pid": os.getpid(),
+                  "tid": threading.get_ident(), "args": self.args}
+        if self.folder:
+            record["folder"] = self.folder
+        if exc_type:
+            record["error"] = f"{exc_type.__name__}: {exc}"
+        self.tracer.spans.append(record)
+
+
+class _NullSpan(object):
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc, tb):
+        return None
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def is_tracing() -> bool:
+    return _tracer is not None
+
+
+def start_trace() -> None:
+    """Begins recording spans (discarding any trace already in progress)."""
+    global _tracer
+    _tracer = _Tracer()
+
+
+def stop_trace(folder: str = None) -> List[str]:
+    """Stops recording spans, and writes the trace into 'folder' (by default the
+    folder of the top-level Dat run while tracing).  Returns the paths written."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is None:
+        return []
+    spans = sorted(tracer.spans, key=lambda s: s["start_us"])
+    if folder is None:
+        roots = [s for s in spans if s.get("folder")]
+        roots.sort(key=lambda s: (s["depth"], s["start_us"]))
+        folder = roots[0]["folder"] if roots else os.getcwd()
+    events = [{"name": s["name"], "cat": "dvc_dat", "ph": "X", "ts": s["start_us"],
+               "dur": s["duration_us"], "pid": s["pid"], "tid": s["tid"],
+               "args": {"id": s["id"], "parent": s["parent"], **s["args"],
+                        **({"error": s["error"]} if "error" in s else {})}}
+              for s in spans]
+    json_path = os.path.join(folder, TRACE_JSON)
+    with open(json_path, "w") as out:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms",
+                   "otherData": {"started_at": tracer.started_at}}, out)
+    jsonl_path = os.path.join(folder, TRACE_JSONL)
+    with open(jsonl_path, "w") as out:
+        for s in spans:
+            out.write(json.dumps(s, default=repr) + "\n")
+    return [json_path, jsonl_path]
+
+
+class tracing(object):
+    """Context manager that traces its body:   with tracing(): do("my_cmd")"""
+
+    def __init__(self, folder: str = None):
+        self.folder = folder
+        self.paths: List[str] = []
+
+    def __enter__(self) -> "tracing":
+        start_trace()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.paths = stop_trace(self.folder)
+
+
+def span(name: str, *, folder: str = None, **args) -> Any:
+    """Returns a context manager recording a span named 'name' with 'args'.
+    'folder' marks the span as the run of the Dat stored in that folder."""
+    if _tracer is None:
+        return _NULL_SPAN
+    return _Span(_tracer, name, args, folder)
+
+
+def traced(name: str = None, *, arg: str = None) -> Callable:
+    """Decorator recording a span for each call of the decorated fn.
+    If 'arg' names a parameter of the fn, its value is recorded with the span."""
+    def decorate(fn: Callable) -> Callable:
+        label = name or fn.__qualname__
+        signature = inspect.signature(fn) if arg else None
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return fn(*args, **kwargs)
+            details = {}
+            if signature:
+                bound = signature.bind_partial(*args, **kwargs).arguments
+                if arg in bound:
+                    details[arg] = _describe(bound[arg])
+            with _Span(_tracer, label, details):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _describe(value: Any) -> Any:
+    """Returns a short JSON safe description of a traced argument."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return repr(value)[:200]
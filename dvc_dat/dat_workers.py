@@ -0,0 +1,112 @@
+import os
+import functools
+import threading
+import multiprocessing
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Tuple
+
+"""
+A persistent pool of forked worker processes, shared by the parallel paths of a
+DoManager (do.map, sweeps, and pipelines) across calls.
+
+WARM WORKERS
+- Workers are forked from the parent process, so they start with its mount index,
+  parsed bases, and imported modules (do.map loads each Dat's do fn in the parent
+  before submitting, so it is imported once rather than once per worker).
+- The workers are kept between calls, so short tasks skip process startup.
+
+RECYCLING
+- A worker's pool is replaced by a freshly forked one after one of its workers has
+  run 'max_tasks' tasks, or has grown by more than 'max_growth_mb' of resident
+  memory since its first task.  Tasks already submitted finish in the old pool.
+- The pool is also replaced after its DoManager mounts or reloads code (so workers
+  never run stale modules), and after a worker dies.
+"""
+
+MAX_TASKS = 500           # Tasks run by a worker before its pool is recycled
+MAX_GROWTH_MB = 1024      # Memory growth of a worker before its pool is recycled
+
+_tasks_run = 0            # (In a worker) Number of tasks it has run
+_baseline_rss = None      # (In a worker) Its resident memory before its first task
+
+
+class WarmPool(Executor):
+    """A process pool whose forked workers persist across uses, and are recycled
+    once they have run too many tasks or grown too large."""
+
+    def __init__(self, workers: int, *,
+                 max_tasks: int = MAX_TASKS,
+                 max_growth_mb: float = MAX_GROWTH_MB):
+        self.workers = workers
+        self.max_tasks = max_tasks
+        self.max_growth_mb = max_growth_mb
+        self.recycles = 0
+        self._retiring = False
+        self._lock = threading.Lock()
+        self._pool = self._new_pool()
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        with self._lock:
+            if self._retiring:
+                self._recycle()
+            try:
+                inner = self._pool.submit(_pooled_call, fn, args, kwargs)
+            except BrokenProcessPool:       # A worker died, so start over
+                self._recycle()
+                inner = self._pool.submit(_pooled_call, fn, args, kwargs)
+        outer = Future()
+        outer.set_running_or_notify_cancel()
+        inner.add_done_callback(functools.partial(self._task_done, outer))
+        return outer
+
+    def retire(self) -> None:
+        """Replaces the workers (once current tasks are submitted) with new forks."""
+        self._retiring = True
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        self._pool.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+    def _task_done(self, outer: Future, inner: Future) -> None:
+        try:
+            result, tasks_run, growth_mb = inner.result()
+        except BaseException as e:      # noqa -- Passed on to the caller's future
+            if isinstance(e, BrokenProcessPool):
+                self._retiring = True
+            outer.set_exception(e)
+            return
+        if tasks_run >= self.max_tasks or growth_mb > self.max_growth_mb:
+            self._retiring = True
+        outer.set_result(result)
+
+    def _recycle(self) -> None:
+        old, self._pool = self._pool, self._new_pool()
+        old.shutdown(wait=False)
+        self._retiring = False
+        self.recycles += 1
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork") if "fork" in methods else None
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+
+
+def _pooled_call(fn: Callable, args: Tuple, kwargs: Dict[str, Any]) -> \
+        Tuple[Any, int, float]:
+    """(In a worker) Calls fn, returning its result, the number of tasks this worker
+    has run, and its growth in resident memory (MB) since its first task."""
+    global _tasks_run, _baseline_rss
+    if _baseline_rss is None:
+        _baseline_rss = _resident_mb()
+    result = fn(*args, **kwargs)
+    _tasks_run += 1
+    return result, _tasks_run, _resident_mb() - _baseline_rss
+
+
+def _resident_mb() -> float:
+    """Returns the resident memory of this process in MB (0 if unknown)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return 0.0
@@ -9,8 +9,17 @@ See DoManager class for details.
 import os
 import sys
 import copy
+import asyncio
+import inspect
+import functools
 import json
 import time
+import traceback
+import tracemalloc
+import contextlib
+import contextvars
+from concurrent.futures import Executor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from collections import Counter
 from datetime import datetime
 from importlib import import_module
 
@@ -18,15 +27,33 @@ import yaml
 import importlib.util
 from pathlib import Path
 from types import ModuleType
-from typing import Type, Union, Any, Dict, Callable, List, Iterable
+from typing import Type, Union, Any, Dict, Callable, List, Iterable, Set, Tuple, \
+    Iterator, NamedTuple, AsyncIterator, ContextManager
+
+try:
+    import resource      # Not available on Windows
+except ImportError:
+    resource = None
 
 from dvc_dat.dat import Dat, MethodManager
+from dvc_dat.dat_trace import span, traced, start_trace, stop_trace
+from dvc_dat.dat_profile import PROFILE_MODES, CPU, profiled_call, profile_folder
+from dvc_dat.dat_run_cache import RunCache, LINK, get_cache_mode, get_source_file, \
+    link_outputs
+from dvc_dat.dat_sweep import is_sweep, parse_sweep_arg, run_sweep, sweep_specs
+from dvc_dat.dat_scheduler import Scheduler, get_resources, thread_env
+from dvc_dat.dat_workers import WarmPool
+from dvc_dat.dat_cost import CostModel, fill_unknown, makespan
+from dvc_dat.dat_speculate import SpeculativePool
+from dvc_dat.dat_capture import capture_output
 
 # The loadable "do" fns, scripts, configs, and methods are in the do_folder
 _DO_EXTENSIONS = [".json", ".yaml", ".py"]
 _DO_ERROR_FLAG = tuple("multiple loadable modules have this same name")
 _DO_NULL = tuple(["-no-value-"])
 _MAIN = "__main__"             # default module var to use when none specified
+_CLI_OPTIONS = ("profile", "trace", "stats", "batch", "enqueue", "worker",
+                "exit_when_empty", "estimate", "resume")  # Only before the command
 
 # Dat Template Parameters
 _DAT_BASE = "dat.base"         # the base spec to expand
@@ -35,20 +62,41 @@ _DAT_PATH_OVERWRITE = "dat.path_overwrite"  # overwrite the path
 _DAT_DO = "dat.do"             # the fn to execute
 _DAT_ARGS = "dat.args"         # prefix args for the dat.do method
 _DAT_KWARGS = "dat.kwargs"     # default kwargs for the dat.do method
+_DAT_EPHEMERAL = "dat.ephemeral"  # run templates in memory, with no Dat folder
 _DAT_RUN_AT = "dat.run_at"     # the time at with dat.do was run
 _DAT_RUN_TIME = "dat.run_time"  # the duration of the dat.do run
+_DAT_RESOURCES = "dat.resources"  # numeric resource usage of the dat.do run
+_DAT_ATTEMPTS = "dat.attempts"  # the number of times dat.do has been run
+_DAT_TOTAL_RUN_TIME = "dat.total_run_time"  # the duration of all dat.do runs
+_DAT_SWEEP_PARAMS = "dat.sweep.params"    # swept params (see the dat_sweep module)
+_DAT_SWEEP_ZIP = "dat.sweep.zip"          # zip the swept params, not their product
+_DAT_SWEEP_WORKERS = "dat.sweep.workers"  # number of sweep points run at once
+_DAT_SWEEP_SPECULATE = "dat.sweep.speculate"  # straggler multiple to rerun points at
 
 Spec = Dict[str, Any]
 
 
+class MapResult(NamedTuple):
+    """The outcome of running one Dat within a 'do.map' batch."""
+    index: int                  # position of the Dat within the mapped sequence
+    dat: Dat                    # the Dat that was run
+    result: Any                 # the value returned by its do fn (None on failure)
+    error: Union[str, None]     # the traceback of a failed run, otherwise None
+
+
 class DoManager(MethodManager):
     """'Do' maps dotted strings to python objects dynamically loaded from .py files.
 
     API:
       .load(dotted_name) ............. # Loads and returns the indexed object
       (do_spec, *args, **kwargs)  .... # Calls the object loaded from the spec name
+      .map(do_spec, dats, workers=) .. # Runs many Dats in parallel
+      .estimate(specs, workers=) ..... # Estimates run times from earlier runs
+      await .acall(do_spec, ...) ..... # Async call, awaiting coroutine do fns
+      async for r in .amap(...) ...... # Runs many Dats concurrently on an event loop
       .mount(at=, value=) ............ # Defines value to be returned by load
       .mount(at=, module=) ........... # Specifies path of module to be loaded
+      .reload([base]) ................ # Discards cached bases whose files changed
 
 
     DOTTED-NAMES
@@ -72,6 +120,52 @@ class DoManager(MethodManager):
     - Spec expansion is the process of recursively loading and merging a spec dict:
     - If a spec has a "dat.base" key, then it is loaded and merged with the spec.
         - This process is repeated until no more "dat.base" keys are found.
+    - Expansions of named specs are cached along with the bases they were built from.
+
+    HOT RELOAD
+    - Bases loaded from .py, .json, or .yaml files are cached after their first load.
+    - 'reload(base)' discards a cached base and every cached spec expansion built
+      from it; 'reload()' does this for each base whose file has changed on disk.
+    - When 'auto_reload' is set, each access to a cached base first checks the
+      mtime of its file, and transparently reloads it when it has changed.
+
+    PROFILING
+    - When 'profile' is "cpu" or "alloc", each top-level Dat run is profiled and its
+      profile saved into the Dat's folder.  (See dat_profile and 'dat --profile'.)
+
+    CHECKPOINTS
+    - Each run of a Dat counts as an attempt, and its results record the number of
+      'dat.attempts' and their 'dat.total_run_time' (failed attempts included).
+    - Long do fns can save their progress with 'dat.checkpoint(state)', and start
+      from 'dat.restore()'.  'dat --resume DAT' reruns an existing Dat after it
+      failed or was killed, so its do fn continues from its last checkpoint.
+    - A successful run removes its checkpoint, so later runs start afresh.
+
+    EPHEMERAL RUNS
+    - A template whose 'dat.ephemeral' is true is run as an in-memory Dat (see
+      Dat.manager.create_ephemeral): no folder, spec, or results are written, and
+      its run time is not recorded.  'do.dat_from_template(spec)' returns such a Dat,
+      which can be run and then saved with 'dat.persist()'.  (do.map and sweeps
+      always create regular Dats, since their runs report back through the Dats.)
+
+    RUN CACHE
+    - A template whose 'dat.cache' is set reuses an earlier run with an identical
+      spec, code, and inputs rather than running again.  (See dat_run_cache.)
+
+    WORKERS
+    - Process workers for do.map (and so sweeps and pipelines) are forked once into
+      'worker_pool', and reused across calls until they are recycled.  Mounting or
+      reloading code recycles them too.  (See dat_workers.)
+
+    SPECULATION
+    - 'do.map(..., speculate=2.0)' runs a straggler again once it has taken twice its
+      expected run time, keeping whichever run finishes first.  (See dat_speculate.)
+
+    COST MODEL
+    - If the .datconfig sets "cost_history", the run time of each Dat run is recorded
+      in 'cost_model', which estimates the run time of new Dats from those of similar
+      earlier ones.  do.map (and so sweeps) and pipelines start the longest runs
+      first.  (See dat_cost.)
 
     """
     do_folder: str                                     # last added loadables folder
@@ -79,12 +173,32 @@ class DoManager(MethodManager):
     base_objects: Dict[str, Any]                       # loaded modules or objects
     do_fns: Dict[str, Dict[str, Callable]]             # externally defined fns
     registered_values: Union[None, Dict[str, Any]]     # values to be returned by load
+    base_mtimes: Dict[str, int]                        # mtime of each file loaded base
+    expanded_specs: Dict[str, Tuple[Spec, Set[str]]]   # named expansions & their bases
+    auto_reload: bool                                  # check mtimes on base access
+    run_cache: RunCache                                # completed runs for 'dat.cache'
+    profile: Union[str, None]                          # 'cpu' or 'alloc' profiles runs
+    counters: Counter                                  # usage counts, see stats()
+    load_counts: Counter                               # number of loads per base
+    worker_pool: Union[WarmPool, None]                 # warm process pool for do.map
+    cost_model: CostModel                              # run times of earlier runs
 
     def __init__(self):
         self.base_objects = {}
         self.base_locations = {}  # all paths must be absolute & module names qualified
         self.registered_values = None
-
+        self.base_mtimes = {}
+        self.expanded_specs = {}
+        self.auto_reload = False
+        self.run_cache = RunCache()
+        self.profile = None
+        self._profiling = False
+        self.counters = Counter()
+        self.load_counts = Counter()
+        self.worker_pool = None
+        self.cost_model = CostModel()
+
+    @traced("do", arg="do_spec")
     def __call__(self, do_spec: Union[Spec, Dat, str], *args, **kwargs) -> Any:
         """Loads and executes a 'do-method'.
 
@@ -110,11 +224,234 @@ class DoManager(MethodManager):
                 result = obj(*args, **kwargs)
                 return result
             else:
-                dat = self.dat_from_template(spec=obj)
+                return self._run_template(obj, args, kwargs)
+        except Exception as e:
+            raise Exception(F"In {do_spec!r}") from e
+
+    def _run_template(self, template: Spec, args: Iterable,
+                      kwargs: Dict[str, Any]) -> Any:
+        """Creates and runs a Dat from a template spec.  When the spec's 'dat.cache'
+        is set, a prior run with the same spec, code, and inputs is reused instead.
+        (See the dat_run_cache module.)"""
+        template = self._deepcopy(template)
+        spec = self.expand_spec(template)     # (Expanded once, for the Dat as well)
+        if is_sweep(spec):
+            return run_sweep(spec, *args, do=self, **kwargs)
+        elif Dat.get(spec, _DAT_EPHEMERAL, False):
+            dat = self._dat_from_expanded(template, spec)
+            try:
                 return self._run_dat(dat, *args, **kwargs)
+            finally:
+                dat.delete(must_exist=False)    # Its folder, if the run made one
+        elif not (mode := get_cache_mode(spec)):
+            return self._run_dat(self._dat_from_expanded(template, spec),
+                                 *args, **kwargs)
+        fn = Dat.get(spec, _DAT_DO, None)
+        source = get_source_file(self.load(fn) if isinstance(fn, str) else fn)
+        key = self.run_cache.key(spec, fn, source, args, kwargs)
+        if entry := self.run_cache.get(key):
+            if mode == LINK:
+                link_outputs(Dat.manager.load(entry["path"]),
+                             self._dat_from_expanded(template, spec))
+            return entry["result"]
+        dat = self._dat_from_expanded(template, spec)
+        result = self._run_dat(dat, *args, **kwargs)
+        self.run_cache.put(key, dat, result)
+        return result
+
+    def map(self,
+            do_spec: Union[str, Callable, None],
+            dats_or_templates: Iterable[Union[Dat, Spec, str]],
+            *args,
+            workers: int = None,
+            executor: str = "process",
+            speculate: float = None,
+            **kwargs) -> Iterator[MapResult]:
+        """Runs many Dats in parallel, yielding a MapResult for each as it completes.
+
+        Each element of 'dats_or_templates' is a Dat, the name or path of a Dat, or a
+        template spec that is first instantiated using 'dat_from_template'.  Each Dat
+        is run just as 'do(dat, *args, **kwargs)' would run it, except that when
+        'do_spec' is given it is called in place of the Dat's own 'dat.do' fn.
+
+        A failing run does not stop the batch; its MapResult holds the traceback.
+        Runs are started longest estimated run first (see the dat_cost module), as
+        the CPUs and memory declared in their 'dat.resources' fit on this machine.
+        (See the dat_scheduler module.)
+
+        Parameters
+        ----------
+        workers: int
+            The number of parallel workers (defaults to the number of CPUs)
+        executor: str
+            "process" runs each Dat in a warm worker process (which reloads the Dat
+            from its path and saves its results there), "thread" runs them in
+            threads.
+        speculate: float
+            If given, a run taking this multiple of its expected run time is run
+            again in a scratch folder, keeping whichever run finishes first.
+            (See the dat_speculate module.)
+        """
+        dats = [self._as_dat(d) for d in dats_or_templates]
+        if executor not in ("process", "thread"):
+            raise ValueError(f"do.map: Unknown executor {executor!r}")
+        elif speculate and executor != "process":
+            raise ValueError("do.map: Speculation requires the 'process' executor")
+        if executor == "process":     # Imported before forking, so workers inherit them
+            self._warm([do_spec] if do_spec else [Dat.get(d, _DAT_DO, None)
+                                                  for d in dats])
+        scheduler = Scheduler(slots=workers)
+        resources = [scheduler.fit(get_resources(dat)) for dat in dats]
+        pending, futures = self.cost_model.order(dats), {}
+        if speculate:
+            pool_context = SpeculativePool(scheduler.slots, speculate, manager=self)
+        else:
+            pool_context = self._make_executor(executor, workers)
+        with pool_context as pool:
+            while pending or futures:
+                while (i := scheduler.next_runnable(pending, resources)) is not None:
+                    if speculate:
+                        future = pool.submit(dats[i].get_path(), do_spec, args, kwargs,
+                                             thread_env(resources[i]),
+                                             expected=self.cost_model.estimate(dats[i]))
+                    elif executor == "process":  # Workers re-load the Dat from its path
+                        future = pool.submit(_map_worker, None, dats[i].get_path(),
+                                             do_spec, args, kwargs,
+                                             thread_env(resources[i]))
+                    else:   # The copied context carries the trace span into the thread
+                        future = pool.submit(contextvars.copy_context().run,
+                                             _map_worker, self, dats[i], do_spec, args,
+                                             kwargs)
+                    futures[future] = i
+                finished, _ = wait(list(futures), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    i = futures.pop(future)
+                    scheduler.release(resources[i])
+                    try:
+                        result, error = future.result()
+                    except Exception:    # e.g. an unpicklable result
+                        result, error = None, traceback.format_exc()
+                    if executor == "process":
+                        Dat.manager.load_results(dats[i])
+                    yield MapResult(i, dats[i], result, error)
+
+    def estimate(self, specs: Iterable[Union[Dat, Spec, str]], *,
+                 workers: int = None) -> Dict[str, Any]:
+        """Estimates the run times of Dats, templates, or named templates (with each
+        point of a sweep template estimated separately) from the run times of
+        similar earlier runs, without running anything.
+
+        Returns {"seconds": [SECONDS or None, ...], "unknown": COUNT, "total": SUM,
+        "makespan": SECONDS TO RUN ALL ON 'workers' (DEFAULT: CPUS) WORKERS}
+        (The total and makespan count unknown runs as the longest known one.)
+        """
+        expanded = []
+        for spec in specs:
+            if isinstance(spec, str):
+                spec = Dat.manager.load(spec) if Dat.manager.exists(spec) else \
+                    self.expand_spec(spec)
+            elif not isinstance(spec, Dat):
+                spec = self.expand_spec(spec)
+            expanded += sweep_specs(spec) if is_sweep(spec) else [spec]
+        seconds = [self.cost_model.estimate(spec) for spec in expanded]
+        costs = fill_unknown(seconds)
+        return {"seconds": seconds, "unknown": seconds.count(None),
+                "total": round(sum(costs), 3),
+                "makespan": round(makespan(costs, workers or os.cpu_count() or 1), 3)}
+
+    def _warm(self, fn_specs: Iterable[Union[str, Callable, None]]) -> None:
+        """Loads each named do fn (ignoring failures, which are reported by the run)."""
+        for fn_spec in set(f for f in fn_specs if isinstance(f, str)):
+            try:
+                self.load(fn_spec)
+            except Exception:    # noqa
+                pass
+
+    def _as_dat(self, source: Union[Dat, Spec, str]) -> Dat:
+        """Returns the Dat named by 'source', or instantiated from it as a template."""
+        if isinstance(source, Dat):
+            return source
+        elif isinstance(source, str):
+            return Dat.manager.load(source)
+        elif isinstance(source, dict):
+            return self.dat_from_template(spec=source, ephemeral=False)
+        else:
+            raise ValueError(f"Expected a Dat, a Dat name, or a template: {source!r}")
+
+    def _make_executor(self, executor: str,
+                       workers: Union[int, None]) -> ContextManager[Executor]:
+        """Returns a context with a new thread pool, or with this manager's persistent
+        pool of warm worker processes (which the context leaves running)."""
+        global _map_manager
+        workers = workers or os.cpu_count() or 1
+        if executor == "thread":
+            return ThreadPoolExecutor(max_workers=workers)
+        _map_manager = self     # Forked workers inherit this manager and its modules
+        if self.worker_pool is None or self.worker_pool.workers < workers:
+            if self.worker_pool:
+                self.worker_pool.shutdown(wait=False)
+            self.worker_pool = WarmPool(workers)
+        return contextlib.nullcontext(self.worker_pool)
+
+    def _code_changed(self) -> None:
+        """Discards what was derived from the mounted code: the cached spec expansions
+        and the warm workers."""
+        self.expanded_specs.clear()
+        if self.worker_pool:
+            self.worker_pool.retire()
+
+    async def acall(self, do_spec: Union[Spec, Dat, str], *args, **kwargs) -> Any:
+        """Async version of 'do(do_spec, ...)'.
+
+        Coroutine do fns (e.g. an 'async def' bound via 'dat.do') are awaited on the
+        running event loop, while plain do fns are run in the loop's default executor
+        so they do not block it.  Run info is recorded just as in the sync path.
+        """
+        obj = self.load(do_spec) if isinstance(do_spec, str) else do_spec
+        try:
+            if isinstance(obj, Dat):
+                return await self._arun_dat_with(obj, Dat.get(obj, _DAT_DO, None),
+                                                 args, kwargs)
+            elif callable(obj):
+                result = obj(*args, **kwargs)
+                return (await result) if inspect.isawaitable(result) else result
+            else:
+                dat = self.dat_from_template(spec=obj)
+                try:
+                    return await self._arun_dat_with(dat, Dat.get(dat, _DAT_DO, None),
+                                                     args, kwargs)
+                finally:
+                    if dat.is_ephemeral():
+                        dat.delete(must_exist=False)
         except Exception as e:
             raise Exception(F"In {do_spec!r}") from e
 
+    async def amap(self,
+                   do_spec: Union[str, Callable, None],
+                   dats_or_templates: Iterable[Union[Dat, Spec, str]],
+                   *args,
+                   limit: int = 64,
+                   **kwargs) -> AsyncIterator[MapResult]:
+        """Async version of 'map' that runs Dats concurrently on the event loop,
+        with at most 'limit' runs in flight at once.  (See 'map' and 'acall'.)
+
+            async for r in do.amap("fetch.main", templates, limit=200): ...
+        """
+        semaphore = asyncio.Semaphore(limit)
+        dats = [self._as_dat(d) for d in dats_or_templates]
+
+        async def run_one(i: int, dat: Dat) -> MapResult:
+            async with semaphore:
+                fn_spec = Dat.get(dat, _DAT_DO, None) if do_spec is None else do_spec
+                try:
+                    result = await self._arun_dat_with(dat, fn_spec, args, kwargs)
+                    return MapResult(i, dat, result, None)
+                except Exception:
+                    return MapResult(i, dat, None, traceback.format_exc())
+        tasks = [asyncio.ensure_future(run_one(i, dat)) for i, dat in enumerate(dats)]
+        for task in asyncio.as_completed(tasks):
+            yield await task
+
     def keys(self) -> Iterable[str]:
         """Returns the list of all defined names."""
         return self.base_locations.keys()
@@ -140,9 +477,10 @@ class DoManager(MethodManager):
         """
         parts = dotted_name.split(".")
         file_base = parts[0]
+        self.load_counts[file_base] += 1
         if self.registered_values and _DO_NULL != \
                 (value := self.registered_values.get(dotted_name, _DO_NULL)):
-            return copy.deepcopy(value) if isinstance(value, dict) else value
+            return self._deepcopy(value) if isinstance(value, dict) else value
         obj = self.get_base(file_base, default=None)
         if obj is None:
             if default is _DO_NULL:
@@ -182,7 +520,7 @@ class DoManager(MethodManager):
             if kind and not isinstance(result, kind):
                 raise KeyError(F"DO: Expected {dotted_name!r} of type {kind} " +
                                F"but found {result!r}")
-            return copy.deepcopy(result) if isinstance(result, dict) else result
+            return self._deepcopy(result) if isinstance(result, dict) else result
         except Exception as e:
             raise e from KeyError(F"WHILE loading {dotted_name!r}")
 
@@ -225,6 +563,7 @@ class DoManager(MethodManager):
                 self._reg_module(base, path)
         elif file:
             self.base_locations[at] = os.path.join(relative_to, file)
+            self._code_changed()
         elif module:
             self._reg_module(at, module)
         elif value:
@@ -254,6 +593,7 @@ class DoManager(MethodManager):
         for base, path in _build_loadables_index(do_folder).items():
             self._reg_module(base, path)
         self.registered_values = None
+        self._code_changed()
 
     def get_base(self, base: str, default: Any = _DO_NULL) -> Any:
         """Returns the module or base object associated with a given base name.
@@ -265,19 +605,76 @@ class DoManager(MethodManager):
         default: Any
             The value to return if the base name is not found
         """
+        if base in self.base_objects and self.auto_reload and self._is_stale(base):
+            self.reload(base)
         if base in self.base_objects:
             result = self.base_objects[base]
         elif base in self.base_locations:
-            self.base_objects[base] = _load_base_entity(base,
-                                                        self.base_locations[
-                                                            base])
+            location, start = self.base_locations[base], time.perf_counter()
+            self.base_objects[base] = _load_base_entity(base, location)
+            self.base_mtimes[base] = _get_mtime(location)
+            is_module = isinstance(self.base_objects[base], ModuleType)
+            kind = "module" if is_module else "file"
+            self.counters[f"{kind}_loads"] += 1
+            self.counters[f"{kind}_load_time"] += time.perf_counter() - start
             result = self.base_objects[base]
         elif default is _DO_NULL:
             raise KeyError(f"The do base file {base + '...'!r} is not defined.")
         else:
             result = default
         if isinstance(result, dict):
-            result = copy.deepcopy(result)
+            result = self._deepcopy(result)
+        return result
+
+    def reload(self, base: str = None) -> List[str]:
+        """Discards the cached module or spec for 'base' along with all cached spec
+        expansions built from it, so they are re-read on their next access.
+        If 'base' is None, this is done for every base whose file has changed.
+        Returns the list of bases that were discarded.
+
+        Only bases loaded from files are discarded; directly mounted modules and
+        values have no file to be reloaded from.
+        """
+        if base is None:
+            bases = [b for b in list(self.base_objects) if self._is_stale(b)]
+        elif _get_mtime(self.base_locations.get(base)) is None:
+            bases = []
+        else:
+            bases = [base]
+        for b in bases:
+            self.base_objects.pop(b, None)
+            self.base_mtimes.pop(b, None)
+        if bases and self.worker_pool:
+            self.worker_pool.retire()
+        stale = set(bases)
+        for name, (_, deps) in list(self.expanded_specs.items()):
+            if deps & stale:
+                del self.expanded_specs[name]
+        return bases
+
+    def _is_stale(self, base: str) -> bool:
+        """True if 'base' was loaded from a file that has since been modified."""
+        if base not in self.base_mtimes:
+            return False
+        return _get_mtime(self.base_locations.get(base)) != self.base_mtimes[base]
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns counts of modules and spec files loaded (and the seconds spent
+        loading them), of deep copies made (and their estimated size in bytes), and
+        of the 'load' calls made for each base."""
+        keys = ["module_loads", "module_load_time", "file_loads", "file_load_time",
+                "deep_copies", "deep_copy_bytes"]
+        result = {k: round(self.counters[k], 6) for k in keys}
+        result["loads_per_base"] = dict(self.load_counts.most_common())
+        return result
+
+    def _deepcopy(self, value: Any) -> Any:
+        """Deep copies a value, counting the copy and estimating its size."""
+        memo = {}
+        result = copy.deepcopy(value, memo)
+        memo.pop(id(memo), None)    # The memo's own list of kept-alive originals
+        self.counters["deep_copies"] += 1
+        self.counters["deep_copy_bytes"] += sum(map(sys.getsizeof, memo.values()))
         return result
 
     def merge_configs(self, base: Spec, override: Spec) -> Spec:
@@ -297,34 +694,121 @@ class DoManager(MethodManager):
     def expand_spec(self, spec: Union[Spec, str]) -> Spec:
         """Expands a spec by recursively loading and expanding its 'dat.base' spec,
         and then merging its keys as an override to the expanded base."""
+        return self._expand_spec(spec, set())
+
+    def _expand_spec(self, spec: Union[Spec, str], bases: Set[str]) -> Spec:
+        """Expands 'spec' while adding the names of all bases it uses to 'bases'."""
         if isinstance(spec, str):
-            spec = self.load(spec)
-            spec = copy.deepcopy(spec)
+            spec, deps = self._expand_named_spec(spec)
+            bases.update(deps)
+            return self._deepcopy(spec)
         if base := Dat.get(spec, _DAT_BASE, None):
-            sub_spec = self.expand_spec(base)
+            sub_spec = self._expand_spec(base, bases)
             return self.merge_configs(sub_spec, spec)
         else:
             return spec
 
+    def _expand_named_spec(self, name: str) -> Tuple[Spec, Set[str]]:
+        """Returns the (cached) expansion of the spec loaded from the dotted 'name',
+        along with the set of bases that expansion was built from."""
+        cached = self.expanded_specs.get(name)
+        if cached and not (self.auto_reload and any(map(self._is_stale, cached[1]))):
+            return cached
+        bases = {name.split(".")[0]}
+        spec = self._expand_spec(self.load(name), bases)
+        if isinstance(spec, dict):
+            self.expanded_specs[name] = spec, bases
+        return spec, bases
+
     def dat_from_template(
             self,
             spec: Spec,
             *,
-            path: str = None
+            path: str = None,
+            ephemeral: bool = None
     ) -> Dat:
-        """Creates a mew Dat object from a template spec."""
-        spec, count = copy.deepcopy(spec), 1
+        """Creates a mew Dat object from a template spec.  The Dat is ephemeral (only
+        in memory) if 'ephemeral' is true or, by default, if 'dat.ephemeral' is."""
+        spec = self._deepcopy(spec)
         # Dat.set(spec, _MAIN_ARGS, args or [])
         # Dat.set(spec, _MAIN_KWARGS, kwargs or {})
+        return self._dat_from_expanded(spec, self.expand_spec(spec), path=path,
+                                       ephemeral=ephemeral)
+
+    @staticmethod
+    def _dat_from_expanded(spec: Spec, expanded: Spec, *, path: str = None,
+                           ephemeral: bool = None) -> Dat:
+        """(See dat_from_template) Creates a Dat from a copy of a template spec and
+        its expansion, which the Dat then owns."""
+        if ephemeral is None:       # Dats given a path are never ephemeral by default
+            ephemeral = path is None and Dat.get(expanded, _DAT_EPHEMERAL, False)
+        if ephemeral:
+            return Dat.manager.create_ephemeral(spec=expanded)
         path = path or Dat.get(spec, _DAT_PATH, None)
         overwrite = Dat.get(spec, _DAT_PATH_OVERWRITE, False) and \
             path.lower() != "{cwd}"  # for safety, we disallow overwriting cwd
-        spec = self.expand_spec(spec)
         path = Dat.manager.expand_dat_path(path, overwrite=overwrite)  # noqa
-        return Dat.manager.create(path=path, spec=spec, overwrite=overwrite)
+        return Dat.manager.create(path=path, spec=expanded, overwrite=overwrite)
 
     def _run_dat(self, dat: Dat, *args, **kwargs) -> Any:
         """Runs the dat.do method of an instantiated object."""   # noqa
+        return self._run_dat_with(dat, Dat.get(dat, _DAT_DO, None), args, kwargs)
+
+    def _run_dat_with(self, dat: Dat, fn_spec: Union[str, Callable, None],
+                      args: Iterable, kwargs: Dict[str, Any]) -> Any:
+        """Runs 'fn_spec' on 'dat' and records its run info in the Dat's results."""
+        fn, args, kwargs = self._resolve_run(dat, fn_spec, args, kwargs)
+        if fn is None:
+            return dat.get_spec()
+        folder = None if dat.is_ephemeral() else dat.get_path()
+        with span("_run_dat", folder=folder, dat=dat.get_path_name()), \
+                capture_output(dat):
+            run_at, before = datetime.now(), _resource_snapshot()
+            with _attempt(dat):
+                if self.profile and not self._profiling:   # Nested runs are profiled
+                    self._profiling = True
+                    try:
+                        result = profiled_call(self.profile, profile_folder(dat),
+                                               _call_do_fn, fn, dat, args, kwargs)
+                    finally:
+                        self._profiling = False
+                else:
+                    result = _call_do_fn(fn, dat, args, kwargs)
+            self._record_run(dat, run_at, before, args, kwargs)
+            if self.cost_model.path and not dat.is_ephemeral():   # (Opt-in)
+                self.cost_model.record(dat)
+        return result
+
+    async def _arun_dat_with(self, dat: Dat, fn_spec: Union[str, Callable, None],
+                             args: Iterable, kwargs: Dict[str, Any]) -> Any:
+        """Async version of '_run_dat_with'."""
+        fn, args, kwargs = self._resolve_run(dat, fn_spec, args, kwargs)
+        if fn is None:
+            return dat.get_spec()
+        folder = None if dat.is_ephemeral() else dat.get_path()
+        with span("_run_dat", folder=folder, dat=dat.get_path_name()), \
+                capture_output(dat):
+            run_at, before = datetime.now(), _resource_snapshot()
+            with _attempt(dat):
+                if inspect.iscoroutinefunction(fn):
+                    result = await fn(dat, *args, **kwargs)
+                else:
+                    loop = asyncio.get_running_loop()
+                    call = functools.partial(contextvars.copy_context().run,
+                                             fn, dat, *args, **kwargs)
+                    result = await loop.run_in_executor(None, call)
+                    if inspect.isawaitable(result):
+                        result = await result
+            self._record_run(dat, run_at, before, args, kwargs)
+            if self.cost_model.path and not dat.is_ephemeral():   # (Opt-in)
+                self.cost_model.record(dat)
+        return result
+
+    def _resolve_run(self, dat: Dat, fn_spec: Union[str, Callable, None],
+                     args: Iterable, kwargs: Dict[str, Any]
+                     ) -> Tuple[Union[Callable, None], List[Any], Dict[str, Any]]:
+        """Returns the fn to run on 'dat' (or None if it has no 'dat.do') along with
+        its args and kwargs after merging in 'dat.args' and 'dat.kwargs'."""
         obj = dat.get_spec()
         if dat_args := Dat.get(obj, _DAT_ARGS, None):
             args = dat_args + list(args)
@@ -332,30 +816,28 @@ class DoManager(MethodManager):
             dat_kwargs = dict(dat_kwargs)
             dat_kwargs.update(kwargs)
             kwargs = dat_kwargs
-        fn_spec = Dat.get(obj, _DAT_DO, None)
         if fn_spec is None:
-            return obj
+            return None, args, kwargs
         if isinstance(fn_spec, str):
             fn_spec = self.load(fn_spec)
         if not callable(fn_spec):
             raise Exception(F"'{_DAT_DO}' in {dat!r} of type {type(fn_spec)} "
                             + "is not callable")
-        run_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        before = time.time()
-        result = fn_spec(dat, *args, **kwargs)
-        time_ms = (time.time() - before) * 1000
-        if args:
-            Dat.set(dat.get_results(), _DAT_ARGS, args)
-        if kwargs:
-            Dat.set(dat.get_results(), _DAT_KWARGS, kwargs)
-        exec_time = (time.strftime("%H:%M:%S", time.gmtime(time_ms // 1000)) +
-                     ".{:03d}".format(int(time_ms % 1000)))
+        return fn_spec, args, kwargs
+
+    @staticmethod
+    def _record_run(dat: Dat, run_at: datetime, before: Dict[str, float],
+                    args: Iterable, kwargs: Dict[str, Any]) -> None:
+        """Records the time, resource usage, and args of a completed run, and then
+        saves the Dat.  ('before' is the '_resource_snapshot' taken at its start.)"""
+        resources = _resource_usage(before)
+        exec_time = _format_run_time(resources["wall_time"])
         Dat.set(dat.get_results(), _DAT_RUN_TIME, exec_time)
-        Dat.set(dat.get_results(), _DAT_RUN_AT, run_at)
+        Dat.set(dat.get_results(), _DAT_RUN_AT, run_at.strftime("%Y-%m-%d %H:%M:%S"))
+        Dat.set(dat.get_results(), _DAT_RESOURCES, resources)
         Dat.set(dat.get_results(), _DAT_ARGS, args)
         Dat.set(dat.get_results(), _DAT_KWARGS, kwargs)
         dat.save()
-        return result
 
     def _reg_module(self, at: str, module_spec: Union[str, ModuleType], *,
                     allow_redefine=False):
@@ -369,6 +851,7 @@ class DoManager(MethodManager):
         if not allow_redefine and at in self.base_locations and \
                 self.base_locations[at] != module_spec:
             raise Exception(F"Base {at!r} is already defined")
+        self._code_changed()
         if isinstance(module_spec, ModuleType):
             self.base_locations[at] = "--directly-assigned--"
             self.base_objects[at] = module_spec
@@ -380,6 +863,7 @@ class DoManager(MethodManager):
         if self.registered_values is None:
             self.registered_values = {}
         self.registered_values[dotted_name] = value
+        self._code_changed()
         # base = dotted_name.split(".")[0]
         # if base not in self.base_locations:
         #     self.base_locations[base] = "--registered-value--"
@@ -387,6 +871,141 @@ class DoManager(MethodManager):
         # # print(f "Registered {dotted_name} as {value} in {self}")
 
 
+_map_manager: Union[DoManager, None] = None   # The manager used by 'do.map' workers
+
+
+def _map_worker(manager: Union[DoManager, None], dat: Union[Dat, str],
+                do_spec: Union[str, Callable, None], args: Iterable,
+                kwargs: Dict[str, Any],
+                env: Dict[str, str] = None) -> Tuple[Any, Union[str, None]]:
+    """Runs one Dat (or the Dat at a given path) for 'do.map', with 'env' added to
+    the (worker process's) environment.
+    Returns its result and None, or None and the traceback of its failure."""
+    os.environ.update(env or {})
+    if manager is None:
+        manager = _map_manager
+    if manager is None:    # a spawned worker has only the default manager
+        from . import do as manager
+    try:
+        if isinstance(dat, str):    # A warm worker's cached copy may be stale
+            Dat.manager.evict(dat)
+            dat = Dat.manager.load(dat)
+        if do_spec is None:
+            do_spec = Dat.get(dat, _DAT_DO, None)
+        return manager._run_dat_with(dat, do_spec, args, kwargs), None
+    except Exception:
+        return None, traceback.format_exc()
+
+
+def _call_do_fn(fn: Callable, dat: Dat, args: Iterable, kwargs: Dict[str, Any]) -> Any:
+    """Calls a do fn on a Dat, running it to completion if it is a coroutine fn."""
+    if inspect.iscoroutinefunction(fn):
+        return asyncio.run(fn(dat, *args, **kwargs))
+    else:
+        return fn(dat, *args, **kwargs)
+
+
+@contextlib.contextmanager
+def _attempt(dat: Dat) -> Iterator[None]:
+    """Counts a run of 'dat' as one more attempt, adding its duration to the total
+    run time of its attempts (in its results).  Failed attempts are recorded too, as
+    are those that died after saving a checkpoint (whose time is counted until it)."""
+    results, checkpoint = dat.get_results(), dat.get_checkpoint_info()
+    attempts = max(Dat.get(results, _DAT_ATTEMPTS, 0), checkpoint.get("attempt", 0))
+    prior = max(_parse_run_time(Dat.get(results, _DAT_TOTAL_RUN_TIME, None)),
+                checkpoint.get("run_seconds", 0.0))
+    started = time.time()
+    dat._run_clock = started, prior, attempts + 1     # noqa -- For 'dat.checkpoint'
+    try:
+        yield
+    except BaseException:
+        _count_attempt(dat, attempts + 1, prior + time.time() - started)
+        dat.save()
+        raise
+    else:     # Saved along with the rest of the run's info
+        _count_attempt(dat, attempts + 1, prior + time.time() - started)
+        dat.clear_checkpoint()     # So the next run starts afresh
+    finally:
+        dat._run_clock = None     # noqa
+
+
+def _count_attempt(dat: Dat, attempts: int, seconds: float) -> None:
+    Dat.set(dat.get_results(), _DAT_ATTEMPTS, attempts)
+    Dat.set(dat.get_results(), _DAT_TOTAL_RUN_TIME, _format_run_time(seconds))
+
+
+def _format_run_time(seconds: float) -> str:
+    """Returns 'seconds' as "HH:MM:SS.mmm" (with more hour digits past 99 hours)."""
+    time_ms = int(seconds * 1000)
+    secs = time_ms // 1000
+    return f"{secs // 3600:02d}:{secs // 60 % 60:02d}:{secs % 60:02d}." \
+           f"{time_ms % 1000:03d}"
+
+
+def _parse_run_time(run_time: Union[str, None]) -> float:
+    """Returns the seconds of an "HH:MM:SS.mmm" run time (0.0 if it is None)."""
+    if not run_time:
+        return 0.0
+    hours, minutes, seconds = run_time.split(":")
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def _resource_snapshot() -> Dict[str, float]:
+    """Returns the current process counters that '_resource_usage' measures from."""
+    snapshot = {"wall_time": time.perf_counter()}
+    if resource:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        snapshot.update(user_time=usage.ru_utime, system_time=usage.ru_stime)
+    snapshot.update(_read_proc_io())
+    if tracemalloc.is_tracing() and hasattr(tracemalloc, "reset_peak"):
+        tracemalloc.reset_peak()
+    return snapshot
+
+
+def _resource_usage(before: Dict[str, float]) -> Dict[str, float]:
+    """Returns the resources used since the 'before' snapshot was taken:
+      wall_time, user_time, system_time ... seconds
+      peak_rss_mb ........................ peak resident memory of the process
+      read_bytes, write_bytes ............ bytes read & written (from /proc/self/io)
+      tracemalloc_peak_mb ................ peak traced allocations (when tracing)
+
+    These are process wide counters, so runs executing concurrently in threads
+    of one process are each charged for the others' usage.
+    """
+    tracing = tracemalloc.is_tracing()
+    traced_peak = tracemalloc.get_traced_memory()[1] if tracing else None
+    after = _resource_snapshot()
+    usage = {k: round(after[k] - before[k], 6) for k in before if k in after}
+    if resource:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        scale = 1 if sys.platform == "darwin" else 1024    # bytes on macOS, else KB
+        usage["peak_rss_mb"] = round(max_rss * scale / 2**20, 3)
+    if traced_peak is not None:
+        usage["tracemalloc_peak_mb"] = round(traced_peak / 2**20, 3)
+    return usage
+
+
+def _read_proc_io() -> Dict[str, int]:
+    """Returns the bytes read and written by this process (on Linux only)."""
+    try:
+        with open("/proc/self/io") as f:
+            counters = dict(line.split(":") for line in f if ":" in line)
+        return {"read_bytes": int(counters["rchar"]),
+                "write_bytes": int(counters["wchar"])}
+    except (OSError, KeyError, ValueError):
+        return {}
+
+
+def _get_mtime(source_spec: Any) -> Union[int, None]:
+    """Returns the mtime of a file based source spec, or None for other specs."""
+    if not isinstance(source_spec, str) or "/" not in source_spec:
+        return None
+    try:
+        return os.stat(source_spec).st_mtime_ns
+    except OSError:
+        return None
+
+
 def _load_base_entity(base, source_spec: str) -> Union[ModuleType, Spec]:
     ext = os.path.splitext(source_spec)[1]
     if ext == ".py" or "/" not in source_spec:
@@ -471,9 +1090,23 @@ SYNOPSIS
     do --get DOTTED.KEY
     do --set DOTTED.KEY=VALUE
     do --sets "DOTTED.KEY1=VALUE1, DOTTED.KEY2=VALUE2"
+    do --profile [cpu|alloc] CMD_NAME ...
+    do --stats [CMD_NAME ...]
+    do --server
+    do --batch FILE|- [--jobs N] [--summary PATH]
+    do --enqueue [DAT ...] [--queue NAME] [--do CMD_NAME]
+    do --worker [--queue NAME] [--lease SECONDS] [--exit-when-empty]
+    do --sweep DOTTED.KEY=V1,V2,... ... [--zip] CMD_NAME ... [--jobs N] [--speculate X]
+    do --estimate CMD_NAME ... [--jobs N]
+    do --resume DAT [ARGS ...]
 
 DESCRIPTION
     Executes the do command named by CMD_NAME.
+
+    The dat options --trace, --stats, --profile, --batch, --enqueue, --worker,
+    --exit-when-empty, --estimate, --resume, --sweep, and --zip are only read
+    before CMD_NAME (or the first DAT), so after it they are passed to the do fn
+    like any other keyword args.
     
     --usage     Prints the command-specific usage info if it exists
     
@@ -484,6 +1117,60 @@ DESCRIPTION
     --get DOTTED.NAME
                 Expands the config for a command and returns an arg from it
     
+    --trace     Traces nested do calls, Dat runs, loads, and creates, saving
+                trace.json (for chrome://tracing or Perfetto) and trace.jsonl
+                into the folder of the top-level Dat run (or the CWD).
+    
+    --stats     Prints Dat and do statistics (cache hits, files parsed, loads
+                per base, ...) after running the command, if any.
+    
+    --profile [cpu|alloc]
+                Profiles the command (with cProfile, or tracemalloc for alloc),
+                saving the profile into the folder of the Dat it runs (or the
+                CWD) and printing a summary of the hottest functions.
+    
+    --server    Runs a warm server for this .datconfig folder.  While it runs,
+                'dat' commands are forwarded to it and skip interpreter and
+                mount startup (set DAT_NO_SERVER=1 to run them in-process).
+    
+    --batch FILE|-
+                Runs each line of FILE (or stdin) as a dat command in this one
+                process, either as its argv or as a JSON object with "args",
+                "overrides", and "kwargs" keys.  '--jobs N' runs N lines at a
+                time, and '--summary PATH' saves each line's status, seconds,
+                and result as JSON lines.  Exits with 1 if any line failed.
+    
+    --enqueue [DAT ...]
+                Queues existing Dats (by name or path) to be run by workers,
+                and prints the status of the queue ('--queue NAME' selects the
+                queue, and '--do CMD_NAME' runs it in place of 'dat.do').
+    
+    --worker    Runs queued Dats, one at a time, until interrupted (or until
+                none remain, with '--exit-when-empty').  Any number of workers
+                on any hosts that share the sync folder can serve one queue;
+                runs of workers that die are retried once their '--lease'
+                (default 60 seconds) expires.
+    
+    --sweep DOTTED.NAME=VALUE1,VALUE2,...
+                Runs the command once for each value (or for each combination
+                of values when several --sweep's are given) as child Dats of a
+                new DatContainer.  '--zip' instead pairs the Nth values of all
+                swept names, and '--jobs N' runs N points at a time.
+                '--speculate X' reruns points that take X times their expected
+                run time in a scratch folder, keeping the first to finish.
+    
+    --estimate  Prints the estimated run time of the command (and of each of
+                its points if it is a sweep) from the run times of similar
+                earlier runs, and the time to run them all on '--jobs N'
+                workers, without running anything.
+    
+    --resume DAT
+                Runs an existing Dat (by name or path) again, e.g. after it
+                failed or was killed, rather than creating a new one.  Its do
+                fn continues from the state last saved by 'dat.checkpoint' (as
+                returned by 'dat.restore'), and its results record the number
+                of attempts and their total run time.
+    
     --set DOTTED.NAME=VALUE
     --sets DOTTED.NAME1=VALUE1,DOTTED.NAME2=VALUE2,...
                 Expands the config for a command and updates the indicated
@@ -515,7 +1202,69 @@ def do_argv(argv):
     looks at the "usage" key in config for usage, else print default usage
     """
     from . import do
-    overrides, args, kwargs = _parse_argv(argv[1:])
+    overrides, args, kwargs, options = _parse_argv(argv[1:])
+    profile, trace = options.get("profile"), options.get("trace")
+    stats, batch = options.get("stats"), options.get("batch")
+    worker, enqueue = options.get("worker"), options.get("enqueue")
+    resume = options.get("resume")
+    if options.get("exit_when_empty"):
+        kwargs["exit_when_empty"] = True
+    if batch:
+        run = functools.partial(_do_batch, do, batch, kwargs)
+    elif resume:
+        run = functools.partial(_do_resume, do, resume, args, kwargs)
+    elif worker or enqueue:
+        run = functools.partial(_do_queue, do, worker, args, kwargs)
+    else:
+        run = functools.partial(_do_argv, do, overrides, args, kwargs,
+                                estimate=bool(options.get("estimate")))
+    if not profile and not trace and not stats:
+        return run()
+    do.profile = profile
+    if trace:
+        start_trace()
+    try:
+        if args or batch or worker or enqueue or resume or not stats:  # Else stats
+            return run()
+    finally:
+        do.profile = None
+        if trace:
+            print(f"# Trace saved to {stop_trace()[0]}")
+        if stats:
+            print(json.dumps({"dats": Dat.manager.stats(), "do": do.stats()}, indent=2))
+
+
+def _do_batch(do: DoManager, batch: str, kwargs: Dict[str, Any]):
+    from dvc_dat.dat_batch import run_batch, OK
+    entries = run_batch(batch, jobs=int(kwargs.get("jobs", 1)),
+                        summary=kwargs.get("summary"), do=do)
+    if any(entry["status"] != OK for entry in entries):
+        raise SystemExit(1)
+
+
+def _do_queue(do: DoManager, worker: bool, args: List[str], kwargs: Dict[str, Any]):
+    from dvc_dat.dat_queue import WorkQueue, run_worker, LEASE_SECONDS
+    queue = WorkQueue(kwargs.get("queue"))
+    if worker:
+        run_worker(queue, lease=float(kwargs.get("lease", LEASE_SECONDS)),
+                   exit_when_empty=bool(kwargs.get("exit_when_empty")), do=do)
+    elif args:
+        entries = queue.enqueue(args, do_spec=kwargs.get("do"))
+        print(f"# Queued {len(entries)} Dats in {queue.folder}")
+    print(json.dumps(queue.status()))
+
+
+def _do_resume(do: DoManager, name: str, args: List[str], kwargs: Dict[str, Any]):
+    dat = Dat.manager.load(name)
+    Dat.manager.load_results(dat)       # For its attempts so far
+    result = do(dat, *args, **kwargs)
+    if result is not None:
+        print(result)
+    return result
+
+
+def _do_argv(do: DoManager, overrides: Spec, args: List[str], kwargs: Dict[str, Any],
+             *, estimate: bool = False):
     # print(F"DO  args={args!r}   kwargs={kwargs!r}")
     if "usage" in kwargs or (not args and not kwargs):
         print(USAGE)
@@ -541,7 +1290,16 @@ def do_argv(argv):
         kwargs = [F"{k}={repr(v)}" for k, v in kwargs.items()]
         print(F"  do({', '.join(args + kwargs)})")
         return
+    elif spec and estimate:
+        workers = kwargs.get("jobs") or Dat.get(spec, _DAT_SWEEP_WORKERS, None)
+        estimate = do.estimate([spec], workers=int(workers) if workers else None)
+        print(json.dumps(estimate, indent=2))
+        return estimate
     elif spec:
+        if is_sweep(spec) and "jobs" in kwargs:
+            Dat.set(spec, _DAT_SWEEP_WORKERS, int(kwargs.pop("jobs")))
+        if is_sweep(spec) and "speculate" in kwargs:
+            Dat.set(spec, _DAT_SWEEP_SPECULATE, float(kwargs.pop("speculate")))
         args_ = Dat.get(spec, _DAT_ARGS, [])
         kwargs_ = Dat.get(spec, _DAT_KWARGS, {})
         kwargs_.update(kwargs)
@@ -552,6 +1310,8 @@ def do_argv(argv):
     elif overrides:
         print("Error: Cannot specify --set or --sets on a do w/o a config")
         return
+    elif do.profile:     # No Dat is created, so the profile is saved in the CWD
+        result = profiled_call(do.profile, os.getcwd(), do, *args, **kwargs)
     else:
         result = do(*args, **kwargs)
     if result is not None:
@@ -559,8 +1319,11 @@ def do_argv(argv):
     return result
 
 
-def _parse_argv(argv):
-    overrides, args, kwargs, i, argv = {}, [], {}, 0, argv + ["--end-of-args"]
+def _parse_argv(argv) -> Tuple[Spec, List[str], Dict[str, Any], Dict[str, Any]]:
+    """Returns the (overrides, args, kwargs, options) of a command line, where
+    'options' are the _CLI_OPTIONS given before the command name (or first arg)."""
+    overrides, args, kwargs, options = {}, [], {}, {}
+    i, argv = 0, argv + ["--end-of-args"]
     while i < len(argv) - 1:
         arg = argv[i]
         flag = _get_flag(arg)
@@ -574,6 +1337,22 @@ def _parse_argv(argv):
             except json.decoder.JSONDecodeError:
                 print(F"Illegal JSON: {argv[i+2]}")
             i += 2
+        elif flag in _CLI_OPTIONS and not args:
+            if flag == "profile":
+                options[flag] = argv[i + 1] if argv[i + 1] in PROFILE_MODES else CPU
+                i += argv[i + 1] in PROFILE_MODES
+            elif flag in ("batch", "resume"):
+                options[flag] = argv[i + 1]
+                i += 1
+            else:
+                options[flag] = True
+        elif arg == "--sweep" and not args:
+            key, values = parse_sweep_arg(argv[i + 1])
+            Dat.set(overrides, _DAT_SWEEP_PARAMS, {
+                **Dat.get(overrides, _DAT_SWEEP_PARAMS, {}), key: values})
+            i += 1
+        elif arg == "--zip" and not args:
+            Dat.set(overrides, _DAT_SWEEP_ZIP, True)
         elif arg == '--set':
             Dat.set(overrides, argv[i + 1], argv[i + 2])
             # overrides.append((argv[i+1], argv[i+2]))
@@ -591,7 +1370,7 @@ def _parse_argv(argv):
             kwargs[flag] = argv[i + 1]
             i += 1
         i += 1
-    return overrides, args, kwargs
+    return overrides, args, kwargs, options
 
 
 def _get_flag(arg):
@@ -0,0 +1,90 @@
+import os
+import sys
+import json
+import socket
+import struct
+import hashlib
+import tempfile
+from typing import List, Optional
+
+"""
+The 'dat' command's entry point.  It forwards the command to a running 'dat
+--server' before importing dvc_dat (which discovers the .datconfig and mounts its
+do modules), so forwarded commands skip that startup; it only imports dvc_dat to
+run the command in-process when no server is running.
+
+(Kept outside the dvc_dat package, and to the standard library, since importing
+any module of the package runs its '__init__'.  See dvc_dat.dat_server.)
+"""
+
+_STDOUT, _STDERR, _EXIT = b"o", b"e", b"x"    # Frame channels
+_HEADER = struct.Struct(">cI")                # Frame header: (channel, length)
+_NO_SERVER_ENV = "DAT_NO_SERVER"
+_DAT_CONFIGS = (".datconfig.json", ".datconfig.yaml")   # As found by DatManager
+
+
+def main():
+    if (code := forward(list(sys.argv))) is not None:
+        sys.exit(code)
+    from dvc_dat.__main__ import start
+    return start(list(sys.argv))
+
+
+def config_folder(cwd: str = None) -> str:
+    """Returns the .datconfig folder of 'cwd' (or of the CWD), as DatManager does:
+    the nearest folder with a .datconfig file, or else 'cwd' itself."""
+    start = folder = os.path.abspath(cwd or os.getcwd())
+    while True:
+        if any(os.path.exists(os.path.join(folder, name)) for name in _DAT_CONFIGS):
+            return folder
+        if folder == "/":
+            return start
+        folder = os.path.dirname(folder)
+
+
+def socket_path(folder: str = None) -> str:
+    """Returns the server socket path for a .datconfig folder."""
+    folder = os.path.abspath(folder or config_folder())
+    digest = hashlib.sha1(folder.encode()).hexdigest()[:12]
+    name = f"dat-server-{os.getuid()}-{digest}.sock"
+    return os.path.join(tempfile.gettempdir(), name)
+
+
+def forward(argv: List[str], folder: str = None) -> Optional[int]:
+    """Runs 'argv' on the server for 'folder', streaming back its output.
+    Returns its exit code, or None if no server is running."""
+    if os.environ.get(_NO_SERVER_ENV) or argv[1:] == ["--server"]:
+        return None
+    elif "-" in argv[1:]:     # Commands reading stdin run in-process
+        return None
+    elif not os.path.exists(path := socket_path(folder)):
+        return None
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(path)
+    except OSError:           # A stale socket left by a server that was killed
+        conn.close()
+        return None
+    with conn:
+        request = {"argv": list(argv), "cwd": os.getcwd(), "env": dict(os.environ)}
+        conn.sendall(json.dumps(request).encode() + b"\n")
+        reader, received = conn.makefile("rb"), False
+        while len(header := reader.read(_HEADER.size)) == _HEADER.size:
+            channel, size = _HEADER.unpack(header)
+            data = reader.read(size)
+            if channel == _EXIT:
+                return int(data)
+            out = sys.stdout if channel == _STDOUT else sys.stderr
+            out.flush()
+            out.buffer.write(data)
+            out.buffer.flush()
+            received = True
+    if not received:          # The server restarted before running the command
+        return None
+    print("Error: The dat server exited before the command finished.",
+          file=sys.stderr)
+    return 1
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 import os
-from dvc_dat import Dat, do, DatContainer, DAT_VERSION
+from dvc_dat import Dat, do, DatContainer, DAT_VERSION, dat_pipeline
 
 """
 HELLO-MSPIPE - Hello-world example of a configurable multi-stage mcproc pipeline.
@@ -33,7 +33,9 @@ __main__ = {
 
 # NOTE: We split the building and running of these DATS; using DVC and ML FLOW this will
 # enable us to construct and DVC cache many runs and then execute them across
-# a distributed farm of cloud instances.
+# a distributed farm of cloud instances.  (To run built stages on a farm sharing the
+# sync folder, queue them with 'dat_queue.WorkQueue().enqueue(dats)' or
+# 'dat --enqueue', and start 'dat --worker' on each instance.)
 def mspipe_build_and_run(dc: DatContainer):
     mspipe_build(dc)
     return mspipe_run(dc)
@@ -51,13 +53,11 @@ def mspipe_build(dc: DatContainer):
 
 
 def mspipe_run(dc: DatContainer):
-    """Sequentially runs each stage in the pipeline."""
-    for stage_name, stage_spec in dc.get_spec()["stages"].items():
-        dat_name = f"{dc.get_path_name()}/{stage_name}"
-        stage_dat = Dat.manager.load(dat_name)
-        print(f"Running {dat_name}")
-        do(stage_dat)
+    """Runs the stages of the pipeline, running independent stages in parallel.
+    (Stage dependencies are declared by each stage's 'dat.inputs' paths.)"""
+    print(f"Running {len(dc.get_spec()['stages'])} stages of {dc.get_path_name()}")
     Dat.set(dc.get_results(), "dat.version", DAT_VERSION)
+    dat_pipeline.run_pipeline(dc)
     return f"Ran {len(dc.get_spec()['stages'])} stages in {dc.get_path_name()}"
 
 
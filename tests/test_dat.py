@@ -189,6 +189,20 @@ class TestCreateSaveAndLoad:
         ]
 
 
+    def test_failed_creates_release_their_folder(self, do):
+        path = "test_dats/failed{unique}"
+        with pytest.raises(Exception):
+            Dat.manager.create(path=path, spec={"bad": object()})
+        assert not os.path.exists(Dat.manager.resolve_path("test_dats/failed"))
+        dat = Dat.manager.create(path=path)
+        assert dat.get_path_name() == "test_dats/failed"
+        dat.delete()
+        with pytest.raises(Exception):     # (The template path is expanded twice)
+            do.dat_from_template({"dat": {"path": path}, "bad": object()})
+        assert not os.path.exists(Dat.manager.resolve_path("test_dats/failed"))
+        assert not Dat.manager.claimed_paths
+
+
 class TestDatLoadingAndSaving:
     def test_create(self):
         assert Dat.manager.create(spec={}, path=TMP_PATH, overwrite=True)
@@ -0,0 +1,71 @@
+import os
+import sys
+import json
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from dvc_dat import do, do_argv, Dat
+from dvc_dat.dat_batch import run_batch, parse_batch_line, OK, FAILED
+
+BATCH = """
+# Nightly commands
+hello1
+dat hello_config --sets lucky_number=9
+{"args": ["hello_config"], "overrides": {"lucky_number": 11}}
+no_such_command
+{"args": ["hello1"
+"""
+
+
+@pytest.fixture
+def batch_file(tmp_path):
+    path = tmp_path / "batch.txt"
+    path.write_text(BATCH)
+    return str(path)
+
+
+class TestParseBatchLine:
+    def test_argv_and_json_lines(self):
+        assert parse_batch_line("dat cmd --sets a.b=1 x --k v") == \
+               ({"a": {"b": 1}}, ["cmd", "x"], {"k": "v"})
+        assert parse_batch_line('{"args": "cmd x", "kwargs": {"k": 1}}') == \
+               ({}, ["cmd", "x"], {"k": 1})
+
+    def test_cli_only_flags_are_rejected(self):
+        with pytest.raises(Exception, match="--jobs"):
+            parse_batch_line("cmd --jobs 4")
+
+
+class TestRunBatch:
+    @pytest.mark.parametrize("jobs", [1, 3])
+    def test_summary(self, batch_file, tmp_path, jobs):
+        summary = str(tmp_path / "summary.jsonl")
+        entries = run_batch(batch_file, jobs=jobs, summary=summary)
+        assert [e["line"] for e in entries] == [3, 4, 5, 6, 7]
+        assert [e["status"] for e in entries] == [OK, OK, OK, FAILED, FAILED]
+        assert [e.get("result") for e in entries[:3]] == ["Hello from hello1!", 9, 11]
+        assert "was not found" in entries[3]["error"]
+        with open(summary) as f:
+            assert [json.loads(line) for line in f] == entries
+
+    def test_parallel_lines_get_unique_dats(self, tmp_path):
+        os.system(f"rm -r '{Dat.manager.sync_folder}/anonymous'")
+        path = tmp_path / "batch.txt"
+        path.write_text("\n".join(f"hello_config --sets lucky_number={n}"
+                                  for n in range(1, 13)))
+        entries = run_batch(str(path), jobs=6)
+        assert sorted(e["result"] for e in entries) == list(range(1, 13))
+        folder = Dat.manager.resolve_path("anonymous")
+        runs = [Dat.manager.load(os.path.join(folder, name))
+                for name in os.listdir(folder)]
+        assert sorted(Dat.get(d, "lucky_number") for d in runs) == list(range(1, 13))
+
+    def test_do_argv_exits_on_failures(self, batch_file):
+        with pytest.raises(SystemExit):
+            do_argv(["dat", "--batch", batch_file, "--jobs", "2"])
+
+
+class TestCleanup:
+    def test_cleanup(self):
+        os.system(f"rm -r '{Dat.manager.sync_folder}/anonymous'")
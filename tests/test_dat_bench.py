@@ -0,0 +1,87 @@
+import os
+import sys
+import shutil
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from dvc_dat import do, Dat, DatContainer
+from dvc_dat.dat_bench import make_sync_folder, bench_point, BENCH_SPEC
+
+TMP_PATH = "/tmp/bench_test"
+TINY = {"dats": 12, "depth": 2, "spec_keys": 3, "payload_bytes": 16, "repeat": 1,
+        "cli_runs": 0, "baseline": "bench_test/baseline"}
+
+
+@pytest.fixture
+def bench_folder():
+    shutil.rmtree(TMP_PATH, ignore_errors=True)
+    yield TMP_PATH
+    shutil.rmtree(TMP_PATH, ignore_errors=True)
+
+
+def run_bench(path, **params):
+    spec = do.load("bench")
+    Dat.set(spec, "dat.path", path)
+    spec["bench"].update(TINY, **params)
+    do(spec)
+    return Dat.manager.load(path)
+
+
+class TestMakeSyncFolder:
+    @pytest.mark.parametrize("fmt", ["yaml", "json"])
+    def test_nested_leaves(self, bench_folder, fmt):
+        leaves = make_sync_folder(bench_folder, dats=20, depth=2, spec_keys=4,
+                                  payload_bytes=64, fmt=fmt)
+        assert len(leaves) == 20
+        assert all(len(os.path.relpath(p, bench_folder).split("/")) == 3
+                   for p in leaves)
+        dat = Dat.manager.load(leaves[7])
+        assert Dat.get(dat, "index") == 7
+        assert len(Dat.get(dat, "params")) == 4
+        assert os.path.getsize(os.path.join(leaves[7], "payload.bin")) == 64
+        root = Dat.manager.load(bench_folder)
+        assert isinstance(root, DatContainer)
+
+
+class TestBench:
+    def test_bench_records_timings_and_regressions(self):
+        shutil.rmtree(Dat.manager.resolve_path("bench_test"), ignore_errors=True)
+        dat = run_bench("bench_test/run1", save_baseline=True)
+        timings = Dat.get(dat.get_results(), "bench.timings")
+        assert set(timings) == {"load", "resolve_path", "get_dats", "expand_spec_cold",
+                                "expand_spec_warm", "cube", "to_excel"}
+        assert Dat.manager.exists("bench_test/baseline")
+        assert set(bench_point(dat)) == {"run_at", *timings}
+
+        dat = run_bench("bench_test/run2", tolerance=0.0)   # Every timing counts as a regression
+        regressions = Dat.get(dat.get_results(), "bench.regressions")
+        assert set(regressions) == set(timings)
+
+    def test_each_repeat_loads_the_dats(self):
+        before = Dat.manager.stats()["dat_cache_misses"]
+        run_bench("bench_test/uncached", repeat=2)
+        assert Dat.manager.stats()["dat_cache_misses"] - before >= 2 * 2 * TINY["dats"]
+        assert not [p for p in Dat.manager.dat_cache.keys() if "dat_bench_" in p]
+
+    def test_bench_runs_within_the_sync_folder(self, monkeypatch):
+        from dvc_dat import dat_bench
+        roots, envs = [], []
+        make, run = dat_bench.make_sync_folder, dat_bench.subprocess.run
+        monkeypatch.setattr(dat_bench, "make_sync_folder",
+                            lambda root, **kw: roots.append(root) or make(root, **kw))
+        monkeypatch.setattr(dat_bench.subprocess, "run",
+                            lambda *a, **kw: envs.append(kw["env"]) or run(*a, **kw))
+        run_bench("bench_test/in_sync", cli_runs=1)
+        assert os.path.dirname(os.path.dirname(roots[0])) == Dat.manager.sync_folder
+        assert not os.path.exists(roots[0])
+        assert envs[0]["DAT_NO_SERVER"] == "1"     # Not forwarded to a 'dat --server'
+
+    def test_bench_command_is_mounted(self):
+        assert Dat.get(do.load("bench"), "dat.do") == BENCH_SPEC["dat"]["do"]
+        assert callable(do.load(BENCH_SPEC["dat"]["do"]))
+
+
+class TestCleanup:
+    def test_cleanup(self):
+        shutil.rmtree(Dat.manager.resolve_path("bench_test"), ignore_errors=True)
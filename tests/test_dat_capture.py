@@ -0,0 +1,143 @@
+import os
+import sys
+import logging
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from dvc_dat import do, Dat
+from dvc_dat import dat_capture
+from dvc_dat.dat_capture import STDOUT_LOG, STDERR_LOG
+do.mount(at="test_dat_capture", module="tests.test_dat_capture")
+
+TMP_PATH = "capture_test"
+
+
+def chatty(dat: Dat):
+    """Prints, writes to stderr, and logs its Dat's 'text' ('times' times)."""
+    text = Dat.get(dat, "text", dat.get_path_name())
+    for _ in range(Dat.get(dat, "times", 1)):
+        print(text)
+    print(f"err {text}", file=sys.stderr)
+    logging.getLogger("chatty").warning("logged %s", text)
+    if Dat.get(dat, "fail", False):
+        raise ValueError("Failed as requested")
+    return text
+
+
+def make_dat(name: str, **spec) -> Dat:
+    spec = {"dat": {"do": "test_dat_capture.chatty",
+                    "capture": spec.pop("capture", True)}, **spec}
+    if spec["dat"]["capture"] is None:
+        del spec["dat"]["capture"]
+    return Dat.manager.create(path=f"{TMP_PATH}/{name}", spec=spec, overwrite=True)
+
+
+def read(dat: Dat, name: str) -> str:
+    with open(os.path.join(dat.get_path(), name)) as f:
+        return f.read()
+
+
+class TestCapture:
+    def test_output_is_captured(self):
+        stdout = sys.stdout
+        dat = make_dat("basic", text="hello")
+        assert do(dat) == "hello"
+        assert sys.stdout is stdout
+        assert read(dat, STDOUT_LOG) == "hello\n"
+        stderr = read(dat, STDERR_LOG)
+        assert stderr.startswith("err hello\n")
+        assert "WARNING chatty: logged hello" in stderr
+
+    def test_failures_record_their_traceback(self):
+        dat = make_dat("failing", fail=True)
+        try:
+            do(dat)
+            assert False, "Should have failed"
+        except Exception as e:
+            assert isinstance(e.__cause__, ValueError)
+        assert "ValueError: Failed as requested" in read(dat, STDERR_LOG)
+
+    def test_capture_can_be_disabled(self):
+        dat = make_dat("disabled", capture=False)
+        do(dat)
+        assert not os.path.exists(os.path.join(dat.get_path(), STDOUT_LOG))
+
+    def test_capture_is_off_by_default(self):
+        dat = make_dat("default", capture=None)
+        do(dat)
+        assert not os.path.exists(os.path.join(dat.get_path(), STDOUT_LOG))
+
+    def test_flushes_after_close_do_not_reopen_the_log(self):
+        dat = make_dat("closed", text="x")
+        do(dat)
+        log = dat_capture._LogFile(os.path.join(dat.get_path(), STDOUT_LOG),
+                                   max_bytes=100, backups=1, buffer_bytes=100)
+        log.write("before\n")
+        log.close()
+        log.write("after\n")
+        log.flush()
+        assert read(dat, STDOUT_LOG) == "x\nbefore\n" and log._file is None
+        assert dat_capture._flusher is None     # Joined when the last run ended
+
+    def test_parallel_runs_are_kept_apart(self):
+        dats = [make_dat(f"parallel/run{i}", times=50) for i in range(4)]
+        list(do.map(None, dats, workers=4, executor="thread"))
+        for dat in dats:
+            assert set(read(dat, STDOUT_LOG).split("\n")) == {dat.get_path_name(), ""}
+
+    def test_full_buffers_drop_output(self):
+        dat = make_dat("dropped", text="x" * 40, times=10,
+                       capture={"buffer_bytes": 100})
+        do(dat)
+        stdout = read(dat, STDOUT_LOG)
+        assert 2 <= stdout.count("x" * 40) < 10
+        assert "bytes of output dropped ...]" in stdout
+
+    def test_dropped_output_is_marked_where_it_was_dropped(self):
+        dat = make_dat("marked", text="x")
+        do(dat)
+        log = dat_capture._LogFile(os.path.join(dat.get_path(), STDOUT_LOG),
+                                   max_bytes=1000, backups=1, buffer_bytes=14)
+        log.write("before\n")
+        log.write("too long\n")
+        log.write("after\n")         # (Would fit, but follows dropped output)
+        log.flush()
+        assert read(dat, STDOUT_LOG) == \
+            "x\nbefore\n\n[... 15 bytes of output dropped ...]\n"
+
+    def test_unwritten_output_is_marked_as_dropped(self):
+        dat = make_dat("unwritten", text="x")
+        do(dat)
+        log = dat_capture._LogFile(os.path.join(dat.get_path(), STDOUT_LOG),
+                                   max_bytes=1000, backups=1, buffer_bytes=100)
+        log.write("lost\n")
+        log._append = lambda data: open("/no/such/folder/log", "ab")
+        try:
+            log.flush()
+        except OSError:
+            pass
+        del log._append
+        log.write("also lost\n")
+        log.close()
+        assert read(dat, STDOUT_LOG) == "x\n\n[... 15 bytes of output dropped ...]\n"
+
+    def test_logs_are_rotated(self):
+        dat = make_dat("rotated", text="x" * 40, capture={"max_bytes": 60})
+        do(dat)
+        do(dat)
+        assert read(dat, STDOUT_LOG) == "x" * 40 + "\n"
+        assert read(dat, STDOUT_LOG + ".1") == "x" * 40 + "\n"
+
+    def test_logs_are_truncated_without_backups(self):
+        dat = make_dat("truncated", text="x" * 40, times=3,
+                       capture={"max_bytes": 60, "backups": 0})
+        do(dat)
+        do(dat)
+        stdout = read(dat, STDOUT_LOG)
+        assert stdout.startswith("x" * 40 + "\n" + "x" * 19 + "\n[... truncated")
+        assert stdout.count("truncated") == 1
+
+
+class TestCleanup:
+    def test_cleanup(self):
+        os.system(f"rm -r '{Dat.manager.resolve_path(TMP_PATH)}'")
@@ -0,0 +1,73 @@
+import os
+import sys
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from dvc_dat import Dat
+from dvc_dat.dat_columns import ColumnStore
+from dvc_dat.dat_tools import Cube
+
+TMP_PATH = "/tmp/columns_test"
+points = [{"a": 1, "b": 1.5, "c": "x", "d": True},
+          {"a": 2, "b": 2, "c": "y", "d": False},
+          {"a": 3, "c": None, "e": [1, 2]}]
+
+
+def always_1(_dat: Dat):
+    return 1
+
+
+class TestColumnStore:
+    def test_points_round_trip(self):
+        store = ColumnStore(points)
+        assert len(store) == 3
+        assert store.get_points() == points
+        assert [type(p["a"]) for p in store.get_points()] == [int, int, int]
+
+    def test_types_match_a_dataframe_of_points(self):
+        df = ColumnStore(points).get_df()
+        assert df["a"].dtype == np.int64 and df["b"].dtype == np.float64
+        assert np.isnan(df["b"][2]) and df["d"].dtype == object
+        assert ColumnStore([{"x": 1}, {"x": "s"}]).get_points() == \
+               [{"x": 1}, {"x": "s"}]
+        assert ColumnStore([{"x": 1}, {"y": 2}]).get_df()["x"].tolist()[0] == 1.0
+
+    def test_df_shares_the_buffers(self):
+        store = ColumnStore([{"n": float(i), "i": i} for i in range(100)])
+        df = store.get_df()
+        assert np.shares_memory(df["n"].to_numpy(), store.columns["n"].buffer)
+        assert np.shares_memory(df["i"].to_numpy(), store.columns["i"].buffer)
+
+    def test_index_columns(self):
+        store = ColumnStore()
+        store.extend([{"v": 1}, {"v": 2}], {"runs": "run1", 2: "a"})
+        store.extend([{"v": 3}], {"runs": "run2", 2: "b"})
+        store.extend([{"list": 4}], {"runs": "run2"})
+        df = store.get_df()
+        assert list(df.columns) == ["runs", "list3", "v", "list"]
+        assert df["runs"].dtype == "category"
+        assert df["runs"].tolist() == ["run1", "run1", "run2", "run2"]
+        assert store.get_points()[3] == {"runs": "run2", "list": 4}
+
+    def test_same_named_indicies_are_merged(self):
+        store = ColumnStore()
+        store.extend([{"v": 1}], {1: "outer", 2: "inner"})
+        store.extend([{"v": 2}], {1: "other"})
+        assert store.get_points() == [{"list": "inner", "v": 1},
+                                      {"list": "other", "v": 2}]
+
+
+class TestColumnarCube:
+    def test_containers_are_categorical_indicies(self):
+        dats = [Dat.manager.create(path=f"{TMP_PATH}/dat{i}", overwrite=True)
+                for i in range(3)]
+        df = Cube(dats=[dats], point_fns=[always_1]).get_df()
+        assert df["list"].dtype == "category"
+        assert df["list"].tolist() == ["dat0", "dat1", "dat2"]
+        assert df["always_1"].tolist() == [1, 1, 1]
+
+
+class TestCleanup:
+    def test_cleanup(self):
+        os.system(f"rm -r '{TMP_PATH}'")
@@ -0,0 +1,185 @@
+import os
+import sys
+import json
+import subprocess
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from dvc_dat import do, Dat, DatContainer, DoManager
+from dvc_dat.dat_cost import CostModel, key_params, makespan
+from dvc_dat.dat_pipeline import critical_paths, run_pipeline
+do.mount(at="test_dat_cost", module="tests.test_dat_cost")
+
+TMP_PATH = "/tmp/cost_test"
+ENV = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(__file__)))
+STARTED = f"{TMP_PATH}/started.txt"
+
+
+def note_start(dat: Dat):
+    """Notes the size of each Dat in the order they are started."""
+    with open(STARTED, "a") as f:
+        f.write(f"{Dat.get(dat, 'size')}\n")
+    return Dat.get(dat, "size")
+
+
+def always_1(_dat: Dat):
+    return 1
+
+
+def started():
+    with open(STARTED) as f:
+        sizes = [int(line) for line in f.read().split()]
+    os.remove(STARTED)
+    return sizes
+
+
+def spec(size=1, fn="test_dat_cost.note_start", **more):
+    return {"dat": {"do": fn, "kind": "Sized"}, "size": size, **more}
+
+
+def run_spec():
+    run = spec(size=1, fn="test_dat_cost.always_1")
+    run["dat"]["path"] = f"{TMP_PATH}/runs/run{{unique}}"
+    return run
+
+
+def new_model(name: str) -> CostModel:
+    path = f"{TMP_PATH}/{name}.jsonl"
+    os.makedirs(TMP_PATH, exist_ok=True)
+    if os.path.exists(path):
+        os.remove(path)
+    return CostModel(path)
+
+
+class TestCostModel:
+    def test_identical_params_use_their_median(self):
+        model = new_model("identical")
+        for seconds in (1, 2, 9):
+            model.record(spec(size=5), seconds)
+        model.record(spec(size=6), 100)
+        assert model.estimate(spec(size=5)) == 2
+
+    def test_similar_params_use_the_nearest_runs(self):
+        model = new_model("similar")
+        for size, seconds in ((1, 1), (10, 10), (100, 100), (1000, 1000)):
+            model.record(spec(size=size), seconds)
+        assert model.estimate(spec(size=90)) == 100
+        assert model.estimate(spec(size=1, extra="x")) == 10
+
+    def test_fallbacks(self):
+        model = new_model("fallbacks")
+        model.record(spec(size=1), 4)
+        other_kind = spec(size=1)
+        other_kind["dat"]["kind"] = "Other"
+        assert model.estimate(other_kind) == 4
+        assert model.estimate(spec(fn="test_dat_cost.other")) is None
+        assert model.estimate({"size": 1}) is None
+
+    def test_history_is_shared(self):
+        model = new_model("shared")
+        model.record(spec(size=3), 7)
+        assert CostModel(model.path).estimate(spec(size=3)) == 7
+        CostModel(model.path).record(spec(size=3), 9)
+        assert model.estimate(spec(size=3)) == 8
+
+    def test_learn_from_existing_dats(self):
+        model = new_model("learn")
+        dat = Dat.manager.create(path=f"{TMP_PATH}/learn/run", spec=spec(size=2),
+                                 overwrite=True)
+        Dat.set(dat.get_results(), "dat.run_time", "00:01:02.500")
+        assert model.learn([dat]) == 1
+        assert model.estimate(spec(size=2)) == 62.5
+
+    def test_history_is_opt_in(self):
+        assert CostModel().path is None
+        manager = DoManager()
+        manager.mount(at="test_dat_cost", module="tests.test_dat_cost")
+        manager(run_spec())
+        assert manager.cost_model.runs == {}
+        assert manager.cost_model.learn([spec(size=1)]) == 0      # (Not yet run)
+
+    def test_configured_history_is_read_lazily(self, monkeypatch):
+        path = f"{TMP_PATH}/configured.jsonl"
+        monkeypatch.setitem(Dat.manager.config, "cost_history", path)
+        if os.path.exists(path):
+            os.remove(path)
+        manager = DoManager()
+        manager.mount(at="test_dat_cost", module="tests.test_dat_cost")
+        assert manager.cost_model.path == path
+        manager(run_spec())
+        with open(path) as f:
+            assert len(f.readlines()) == 1
+        assert manager.cost_model.runs == {}        # Only read by estimates
+        assert manager.cost_model.estimate(run_spec()) is not None
+
+    def test_key_params(self):
+        assert key_params(spec(size=2, model={"lr": 0.1, "layers": [1, 2]})) == \
+            {"model.lr": 0.1, "size": 2}
+        declared = spec(size=2, other=3)
+        declared["dat"]["cost_params"] = ["size"]
+        assert key_params(declared) == {"size": 2}
+
+    def test_unknown_runs_are_ordered_as_the_longest(self):
+        model = new_model("order")
+        model.record(spec(size=1), 1)
+        model.record(spec(size=2), 2)
+        specs = [spec(size=1), spec(fn="x.y"), spec(size=2)]
+        assert model.order(specs) == [1, 2, 0]
+
+    def test_makespan(self):
+        assert makespan([2, 3, 2, 3], 2) == 5
+        assert makespan([1, 5, 1], 2) == 5
+        assert makespan([], 4) == 0
+
+
+class TestOrdering:
+    def test_map_starts_longest_first(self):
+        manager = DoManager()
+        manager.mount(at="test_dat_cost", module="tests.test_dat_cost")
+        manager.cost_model = new_model("map")
+        for size in (1, 2, 3):
+            manager.cost_model.record(spec(size=size), size)
+        list(manager.map(None, [spec(size=s) for s in (2, 1, 3, 4)], workers=1,
+                         executor="thread"))
+        assert started() == [3, 2, 4, 1]   # 4 is estimated from its nearest: 3, 2, 1
+
+    def test_pipeline_starts_the_longest_chain_first(self):
+        costs = {"a": 1, "b": 1, "c": 5, "d": 1}
+        graph = {"a": set(), "b": {"a"}, "c": set(), "d": {"b"}}
+        assert critical_paths(graph, costs) == {"a": 3, "b": 2, "c": 5, "d": 1}
+        dc = DatContainer.manager.create(path=f"{TMP_PATH}/pipe", overwrite=True,
+                                         spec={"dat": {"class": "DatContainer"}})
+        for name, size in (("a", 1), ("b", 2), ("c", 3)):
+            Dat.manager.create(path=f"{dc.get_path()}/{name}", spec=spec(size=size))
+        do.cost_model = new_model("pipeline")
+        for size, seconds in ((1, 1), (2, 1), (3, 5)):
+            do.cost_model.record(spec(size=size), seconds)
+        run_pipeline(dc, workers=1)
+        assert started() == [3, 1, 2]
+
+    def test_estimate(self):
+        manager = DoManager()
+        manager.cost_model = new_model("estimate")
+        for size in (1, 2, 3):
+            manager.cost_model.record(spec(size=size), size)
+        estimate = manager.estimate([spec(size=1), spec(size=3), spec(fn="x.y")],
+                                    workers=2)
+        assert estimate == {"seconds": [1, 3, None], "unknown": 1, "total": 7,
+                            "makespan": 4}
+        sweep = spec(size=1)
+        sweep["dat"]["sweep"] = {"params": {"size": [1, 2, 3]}}
+        assert manager.estimate([sweep])["seconds"] == [1, 2, 3]
+
+    def test_estimate_from_the_command_line(self):
+        result = subprocess.run(
+            [sys.executable, "-m", "dvc_dat", "--estimate", "hello_config"],
+            capture_output=True, text=True, env=ENV)
+        assert result.returncode == 0
+        assert json.loads(result.stdout)["unknown"] in (0, 1)
+        assert "lucky number" not in result.stdout     # The command was not run
+
+
+class TestCleanup:
+    def test_cleanup(self):
+        do.cost_model = CostModel()
+        os.system(f"rm -r '{TMP_PATH}'")
@@ -0,0 +1,94 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from dvc_dat import do, Dat
+from dvc_dat import dat_metric_cache
+from dvc_dat.dat_metric_cache import MetricCache, metric_key
+from dvc_dat.dat_tools import Cube
+do.mount(at="test_dat_metric_cache", module="tests.test_dat_metric_cache")
+
+TMP_PATH = "/tmp/metric_cache_test"
+calls = []
+
+
+def size(dat: Dat):
+    """Counts its calls, and returns the size of the Dat's data file."""
+    calls.append(dat.get_path_tail())
+    with open(os.path.join(dat.get_path(), "data.txt")) as f:
+        return len(f.read())
+
+
+def rows(dat: Dat):
+    calls.append(dat.get_path_tail())
+    return [{"row": i} for i in range(2)]
+
+
+def make_dats(name: str, count: int):
+    dats = []
+    for i in range(count):
+        dat = Dat.manager.create(path=f"{TMP_PATH}/{name}/dat{i}", overwrite=True)
+        with open(os.path.join(dat.get_path(), "data.txt"), "w") as f:
+            f.write("x" * i)
+        dats.append(dat)
+    return dats
+
+
+def build(dats, **kwargs):
+    calls.clear()
+    return Cube(dats=dats, point_fns=[size, rows], cache=True, **kwargs).points
+
+
+class TestMetricCache:
+    def test_unchanged_dats_are_not_recomputed(self):
+        dats = make_dats("unchanged", 3)
+        first = build(dats)
+        assert len(calls) == 6
+        assert build(dats) == first
+        assert calls == []
+
+    def test_new_and_changed_dats_are_computed(self):
+        dats = make_dats("changed", 3)
+        build(dats)
+        dats += make_dats("changed_more", 1)
+        with open(os.path.join(dats[1].get_path(), "data.txt"), "a") as f:
+            f.write("more")
+        points = build(dats)
+        assert sorted(calls) == ["dat0", "dat0", "dat1", "dat1"]
+        assert [p["size"] for p in points if "size" in p] == [0, 5, 2, 0]
+
+    def test_parallel_cubes_use_the_cache(self):
+        dats = make_dats("parallel", 4)
+        serial = build(dats)
+        assert build(dats, workers=2) == serial and calls == []
+
+    def test_keys(self):
+        dats = make_dats("keys", 1)
+        cache, metrics = MetricCache(), [metric_key(size, size)]
+        assert metrics[0][0].endswith("test_dat_metric_cache.size")
+        assert metric_key("test_dat_metric_cache.size", size)[1] == metrics[0][1]
+        assert cache.lookup(dats[0], metrics) == {}
+        cache.store(dats[0], metrics, {0: 7})
+        assert MetricCache().lookup(dats[0], metrics) == {0: 7}
+        assert MetricCache().lookup(dats[0], [("other", metrics[0][1])]) == {}
+        cache.store(dats[0], metrics, {0: object()})     # Not JSON, so not cached
+        assert MetricCache().lookup(dats[0], metrics) == {0: 7}
+
+    def test_replaced_entries_are_compacted(self, monkeypatch):
+        monkeypatch.setattr(dat_metric_cache, "_MIN_COMPACT_LINES", 5)
+        dats = make_dats("compacted", 1)
+        metrics = [metric_key(size, size)]
+        for value in range(10):
+            cache = MetricCache()
+            cache.lookup(dats[0], metrics)
+            cache.store(dats[0], metrics, {0: value})
+        MetricCache().lookup(dats[0], metrics)
+        with open(f"{TMP_PATH}/compacted/.dat_metric_cache.jsonl") as f:
+            assert len(f.readlines()) <= 5
+        assert MetricCache().lookup(dats[0], metrics) == {0: 9}
+
+
+class TestCleanup:
+    def test_cleanup(self):
+        os.system(f"rm -r '{TMP_PATH}'")
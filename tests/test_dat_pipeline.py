@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from dvc_dat import do, Dat
+from dvc_dat.dat_pipeline import run_pipeline, stage_graph
+do.mount(at="test_dat_pipeline", module="tests.test_dat_pipeline")
+
+TMP_PATH = "/tmp/pipeline_test"
+
+
+def sleepy_stage(dat: Dat):
+    time.sleep(Dat.get(dat, "sleep", 0))
+    if Dat.get(dat, "fail", False):
+        raise ValueError(f"Stage {dat.get_path_tail()} failed")
+    with open(os.path.join(dat.get_path(), "out.txt"), "w") as f:
+        f.write(dat.get_path_tail())
+    return dat.get_path_tail()
+
+
+def make_pipeline(stages):
+    dc = Dat.manager.create(path=TMP_PATH, spec={"dat": {"class": "DatContainer"}},
+                            overwrite=True)
+    for name, spec in stages.items():
+        Dat.set(spec, "dat.do", "test_dat_pipeline.sleepy_stage")
+        Dat.manager.create(path=os.path.join(TMP_PATH, name), spec=spec)
+    return dc
+
+
+@pytest.fixture
+def diamond():
+    return make_pipeline({
+        "a": {"sleep": 0.3},
+        "b": {"sleep": 0.3, "dat": {"depends_on": ["a"]}},
+        "c": {"sleep": 0.3, "dat": {"inputs": ["../a/out.txt"]}},
+        "d": {"dat": {"inputs": ["../b/out.txt", "../c/out.txt", "/etc/hosts"]}}})
+
+
+class TestStageGraph:
+    def test_graph_from_depends_on_and_inputs(self, diamond):
+        assert stage_graph(diamond) == {
+            "a": set(), "b": {"a"}, "c": {"a"}, "d": {"b", "c"}}
+
+    def test_cycles_are_rejected(self):
+        dc = make_pipeline({"a": {"dat": {"depends_on": ["b"]}},
+                            "b": {"dat": {"depends_on": ["a"]}}})
+        with pytest.raises(Exception, match="cycle"):
+            stage_graph(dc)
+
+
+class TestRunPipeline:
+    def test_independent_stages_run_in_parallel(self, diamond):
+        start = time.time()
+        results = run_pipeline(diamond, workers=4)
+        assert time.time() - start < 0.85
+        assert results == {"a": "a", "b": "b", "c": "c", "d": "d"}
+        timeline = Dat.manager.load(TMP_PATH).get_results()["pipeline"]["timeline"]
+        assert [t["stage"] for t in timeline][0] == "a"
+        assert [t["stage"] for t in timeline][-1] == "d"
+        assert all(t["status"] == "done" for t in timeline)
+
+    def test_dependents_of_failed_stages_are_skipped(self):
+        dc = make_pipeline({"a": {"fail": True},
+                            "b": {"dat": {"depends_on": ["a"]}},
+                            "c": {"dat": {"depends_on": ["b"]}},
+                            "x": {}})
+        with pytest.raises(Exception, match="'a' failed"):
+            run_pipeline(dc, workers=2)
+        status = {t["stage"]: t["status"]
+                  for t in dc.get_results()["pipeline"]["timeline"]}
+        assert status == {"a": "failed", "b": "skipped", "c": "skipped", "x": "done"}
+
+
+class TestCleanup:
+    def test_cleanup(self):
+        os.system(f"rm -r '{TMP_PATH}'")
@@ -0,0 +1,134 @@
+import os
+import sys
+import json
+import time
+import subprocess
+import multiprocessing
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from dvc_dat import do, Dat
+from dvc_dat.dat_queue import WorkQueue, run_worker, DONE, FAILED
+do.mount(at="test_dat_queue", module="tests.test_dat_queue")
+
+TMP_PATH = "queue_test"
+ENV = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(__file__)))
+
+
+def record_run(dat: Dat):
+    """Appends the worker's pid to the Dat's 'runs.txt', and returns the pid."""
+    with open(os.path.join(dat.get_path(), "runs.txt"), "a") as f:
+        f.write(f"{os.getpid()}\n")
+    if Dat.get(dat, "fail", False):
+        raise ValueError("Failed as requested")
+    return os.getpid()
+
+
+def make_dats(name: str, count: int, **spec):
+    spec = {"dat": {"do": "test_dat_queue.record_run"}, **spec}
+    return [Dat.manager.create(path=f"{TMP_PATH}/{name}/run{i}", spec=spec,
+                               overwrite=True) for i in range(count)]
+
+
+def make_queue(name: str) -> WorkQueue:
+    folder = Dat.manager.resolve_path(f"{TMP_PATH}/queues/{name}")
+    os.system(f"rm -rf '{folder}'")
+    return WorkQueue(folder=folder)
+
+
+def run_count(dat: Dat) -> int:
+    with open(os.path.join(dat.get_path(), "runs.txt")) as f:
+        return len(f.read().split())
+
+
+class TestWorkQueue:
+    def test_worker_runs_queued_dats(self):
+        queue = make_queue("basic")
+        dats = make_dats("basic", 3)
+        entries = queue.enqueue(dats)
+        assert queue.status()["pending"] == 3
+        counts = run_worker(queue, exit_when_empty=True)
+        assert counts == {DONE: 3, FAILED: 0}
+        assert [run_count(dat) for dat in dats] == [1, 1, 1]
+        outcomes = queue.wait(entries, timeout=1)
+        assert [outcomes[e]["status"] for e in entries] == [DONE] * 3
+        assert [outcomes[e]["dat"] for e in entries] == \
+            [dat.get_path_name() for dat in dats]
+        assert Dat.get(Dat.manager.load_results(dats[0]), "dat.run_time")
+
+    def test_failures_are_recorded(self):
+        queue = make_queue("failing")
+        entries = queue.enqueue(make_dats("failing", 1, fail=True))
+        assert run_worker(queue, exit_when_empty=True) == {DONE: 0, FAILED: 1}
+        outcome = queue.outcome(entries[0])
+        assert outcome["status"] == FAILED
+        assert "Failed as requested" in outcome["error"]
+
+    def test_claims_are_exclusive(self):
+        queue = make_queue("exclusive")
+        entries = queue.enqueue(make_dats("exclusive", 2))
+        first, second = queue.claim(), queue.claim()
+        assert [first.entry, second.entry] == entries
+        assert queue.claim() is None
+        assert queue.status()["running"] == 2
+
+    def test_expired_claims_are_reclaimed(self):
+        queue = make_queue("expired")
+        entries = queue.enqueue(make_dats("expired", 1))
+        stale = queue.claim(lease=0.2)    # Its worker "dies" without a heartbeat
+        assert queue.claim() is None
+        time.sleep(0.3)
+        fresh = queue.claim()
+        assert fresh.entry == entries[0]
+        assert not stale.is_held() and fresh.is_held()
+        assert not queue.complete(stale, {"result": "stale"})
+        assert queue.complete(fresh, {"result": "fresh"})
+        assert queue.outcome(entries[0])["result"] == "fresh"
+
+    def test_heartbeat_renews_claims(self):
+        queue = make_queue("heartbeat")
+        queue.enqueue(make_dats("heartbeat", 1))
+        with queue.claim(lease=0.3):
+            time.sleep(0.6)
+            assert queue.claim() is None
+
+    def test_parallel_workers_run_each_dat_once(self):
+        queue = make_queue("parallel")
+        dats = make_dats("parallel", 12)
+        queue.enqueue(dats)
+        context = multiprocessing.get_context("fork")
+        workers = [context.Process(target=run_worker, args=(queue,),
+                                   kwargs={"exit_when_empty": True})
+                   for _ in range(3)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(timeout=30)
+        assert [run_count(dat) for dat in dats] == [1] * 12
+        assert queue.status() == {"pending": 0, "running": 0, DONE: 12, FAILED: 0}
+
+
+class TestCommandLine:
+    def test_enqueue_and_worker(self):
+        queue = WorkQueue("cli")
+        dats = [Dat.manager.create(path=f"{TMP_PATH}/cli/run{i}", overwrite=True,
+                                   spec={"dat": {"do": "dat_bench.bench_point"}})
+                for i in range(2)]
+        names = [dat.get_path_name() for dat in dats]
+        command = [sys.executable, "-m", "dvc_dat"]
+        result = subprocess.run(command + ["--enqueue", *names, "--queue", "cli"],
+                                capture_output=True, text=True, env=ENV)
+        assert json.loads(result.stdout.split("\n")[1])["pending"] == 2
+        result = subprocess.run(command + ["--worker", "--exit-when-empty",
+                                           "--queue", "cli"],
+                                capture_output=True, text=True, env=ENV)
+        assert result.returncode == 0
+        assert json.loads(result.stdout.strip().split("\n")[-1])[DONE] == 2
+        for dat in dats:
+            assert Dat.get(Dat.manager.load_results(dat), "dat.run_at")
+        os.system(f"rm -r '{os.path.dirname(queue.folder)}'")   # The queues folder
+
+
+class TestCleanup:
+    def test_cleanup(self):
+        os.system(f"rm -r '{Dat.manager.resolve_path(TMP_PATH)}'")
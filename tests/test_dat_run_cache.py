@@ -0,0 +1,95 @@
+import os
+import sys
+import shutil
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from dvc_dat import do, Dat
+from dvc_dat.dat_run_cache import RunCache, get_cache_mode
+do.mount(at="test_dat_run_cache", module="tests.test_dat_run_cache")
+
+INPUT_PATH = "/tmp/run_cache_test_input.txt"
+runs = []
+
+
+def counted_run(dat: Dat, offset=0):
+    runs.append(dat.get_path())
+    with open(os.path.join(dat.get_path(), "output.txt"), "w") as f:
+        f.write("output")
+    return Dat.get(dat, "n") + offset
+
+
+@pytest.fixture
+def run_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(do, "run_cache", RunCache(str(tmp_path)))
+    mounted_runs().clear()
+    shutil.rmtree(Dat.manager.resolve_path("run_cache_test"), ignore_errors=True)
+    with open(INPUT_PATH, "w") as f:
+        f.write("input")
+    return do.run_cache
+
+
+def mounted_runs():
+    """The 'runs' list of this module as mounted in do (a separate module instance)."""
+    return do.load("test_dat_run_cache.runs")
+
+
+def template(n, cache="reuse"):
+    return {"dat": {"do": "test_dat_run_cache.counted_run", "cache": cache,
+                    "cache_inputs": [INPUT_PATH], "path": "run_cache_test/run{unique}"},
+            "n": n}
+
+
+class TestCacheMode:
+    def test_modes(self):
+        assert get_cache_mode({}) is None
+        assert get_cache_mode({"dat": {"cache": True}}) == "reuse"
+        assert get_cache_mode({"dat": {"cache": "true"}}) == "reuse"
+        assert get_cache_mode({"dat": {"cache": "link"}}) == "link"
+
+
+class TestRunCache:
+    def test_identical_runs_are_reused(self, run_cache):
+        assert do(template(1)) == 1
+        assert do(template(1)) == 1
+        assert len(mounted_runs()) == 1
+
+    def test_changes_to_spec_args_or_inputs_rerun(self, run_cache):
+        assert do(template(1)) == 1
+        assert do(template(2)) == 2
+        assert do(template(2), offset=10) == 12
+        with open(INPUT_PATH, "w") as f:
+            f.write("changed input")
+        os.utime(INPUT_PATH, ns=(0, os.stat(INPUT_PATH).st_mtime_ns + 10**9))
+        assert do(template(2)) == 2
+        assert len(mounted_runs()) == 4
+
+    def test_missing_inputs_rerun_once_created(self, run_cache):
+        os.remove(INPUT_PATH)
+        do(template(5))
+        do(template(5))
+        with open(INPUT_PATH, "w") as f:
+            f.write("created")
+        do(template(5))
+        assert len(mounted_runs()) == 2
+
+    def test_deleted_dats_are_rerun(self, run_cache):
+        do(template(3))
+        Dat.manager.load(mounted_runs()[0]).delete()
+        do(template(3))
+        assert len(mounted_runs()) == 2
+
+    def test_link_mode_links_outputs(self, run_cache):
+        assert do(template(4, "link")) == 4
+        assert do(template(4, "link")) == 4
+        assert len(mounted_runs()) == 1
+        linked = Dat.manager.load("run_cache_test/run_2")
+        assert os.path.samefile(os.path.join(mounted_runs()[0], "output.txt"),
+                                os.path.join(linked.get_path(), "output.txt"))
+        assert Dat.get(linked.get_results(), "dat.cached_from") == "run_cache_test/run"
+
+
+class TestCleanup:
+    def test_cleanup(self):
+        os.system(f"rm -r test_sync_folder/run_cache_test '{INPUT_PATH}'")
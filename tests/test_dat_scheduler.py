@@ -0,0 +1,82 @@
+import os
+import sys
+import time
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from dvc_dat import do, Dat
+from dvc_dat.dat_scheduler import Resources, Scheduler, get_resources, thread_env
+do.mount(at="test_dat_scheduler", module="tests.test_dat_scheduler")
+
+TMP_PATH = "scheduler_test"
+
+
+def timed_run(dat: Dat):
+    began = time.time()
+    time.sleep(0.1)
+    return began, time.time(), os.environ.get("OMP_NUM_THREADS")
+
+
+def make_dats(resources_list):
+    return [do.dat_from_template({"dat": {"do": "test_dat_scheduler.timed_run",
+                                          "path": f"{TMP_PATH}/run{{unique}}",
+                                          "resources": resources}})
+            for resources in resources_list]
+
+
+class TestScheduler:
+    def test_get_resources(self):
+        dat = make_dats([{"cpus": 2, "mem_gb": 1.5, "exclusive": "true"}])[0]
+        assert get_resources(dat) == Resources(cpus=2, mem_gb=1.5, exclusive=True)
+        assert thread_env(get_resources(dat))["OMP_NUM_THREADS"] == "2"
+
+    def test_packing(self):
+        scheduler = Scheduler(slots=8, cpus=4, mem_gb=16)
+        resources = [scheduler.fit(r) for r in [
+            Resources(cpus=2, mem_gb=12), Resources(cpus=2, mem_gb=8),
+            Resources(cpus=1, mem_gb=2), Resources(cpus=1, mem_gb=2),
+            Resources(cpus=64, mem_gb=1)]]
+        assert resources[4] == Resources(cpus=4, mem_gb=1, exclusive=True)
+        pending = list(range(len(resources)))
+        started = []
+        while (i := scheduler.next_runnable(pending, resources)) is not None:
+            started.append(i)
+        assert started == [0, 2, 3]     # 1 does not fit in memory, 4 is exclusive
+        scheduler.release(resources[0])
+        assert scheduler.next_runnable(pending, resources) == 1
+        assert scheduler.next_runnable(pending, resources) is None
+
+    def test_undeclared_cpus_share_the_machine(self):
+        scheduler = Scheduler(slots=4, cpus=2, mem_gb=8)
+        assert scheduler.fit(Resources()) == Resources(cpus=0.5)
+
+    @pytest.mark.parametrize("cpus", [1, 3, 8, 16, 24, 64])
+    def test_all_default_shares_are_admitted(self, cpus):
+        for workers in range(1, 65):
+            scheduler = Scheduler(slots=workers, cpus=cpus, mem_gb=8)
+            resources = [scheduler.fit(Resources()) for _ in range(workers)]
+            pending = list(range(workers))
+            while scheduler.next_runnable(pending, resources) is not None:
+                pass
+            assert pending == [], f"{workers} workers on {cpus} CPUs"
+
+
+class TestMapScheduling:
+    def test_exclusive_runs_run_alone(self):
+        dats = make_dats([{}, {"exclusive": True}, {}, {}, {"exclusive": True}])
+        spans = {r.index: r.result[:2]
+                 for r in do.map(None, dats, workers=4, executor="thread")}
+        for i in (1, 4):
+            assert all(spans[i][1] <= spans[j][0] or spans[j][1] <= spans[i][0]
+                       for j in spans if j != i)
+
+    def test_process_workers_get_thread_env(self):
+        dats = make_dats([{"cpus": 1}, {}])
+        envs = [r.result[2] for r in do.map(None, dats, workers=2)]
+        assert envs == ["1", "1"]
+
+
+class TestCleanup:
+    def test_cleanup(self):
+        os.system(f"rm -r '{Dat.manager.resolve_path(TMP_PATH)}'")
@@ -0,0 +1,83 @@
+import os
+import sys
+import time
+import signal
+import subprocess
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from dvc_dat import dat_server
+
+ENV = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(__file__)))
+
+
+def dat(*args, **env):
+    return subprocess.run([sys.executable, "-m", "dvc_dat", *args], capture_output=True,
+                          text=True, env=dict(ENV, **env))
+
+
+@pytest.fixture
+def server():
+    proc = subprocess.Popen([sys.executable, "-m", "dvc_dat", "--server"], env=ENV,
+                            stdout=subprocess.PIPE, text=True)
+    assert proc.stdout.readline().startswith("# Dat server listening on")
+    yield proc
+    proc.send_signal(signal.SIGINT)
+    proc.wait(timeout=10)
+
+
+class TestServer:
+    def test_commands_are_forwarded(self, server):
+        result = dat("hello_world")
+        assert result.returncode == 0
+        assert result.stdout == "   hello world!\nhello world!\n"
+
+    def test_errors_and_exit_codes_are_forwarded(self, server):
+        result = dat("no_such_command")
+        assert result.returncode == 1
+        assert "was not found" in result.stderr
+
+    def test_subprocess_output_is_forwarded(self, server):
+        result = dat("--info")        # Prints the .datconfig file using 'cat'
+        assert result.returncode == 0
+        assert '"sync_folder": "test_sync_folder"' in result.stdout
+
+    def test_client_forwards_without_importing_dvc_dat(self, server):
+        code = "import sys, dvc_dat_client; dvc_dat_client.main()"
+        result = subprocess.run([sys.executable, "-c", code, "hello_world"],
+                                capture_output=True, text=True, env=ENV)
+        assert result.returncode == 0
+        assert result.stdout == "   hello world!\nhello world!\n"
+        code = "import sys, dvc_dat_client; " \
+               "print(dvc_dat_client.forward(['dat', 'hello_world'])); " \
+               "print('dvc_dat' in sys.modules)"
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True,
+                                text=True, env=ENV)
+        assert result.stdout.split("\n")[-3:] == ["0", "False", ""]
+
+    def test_socket_is_private(self, server):
+        assert os.stat(dat_server.socket_path()).st_mode & 0o777 == 0o600
+
+    def test_server_exits_cleanly(self, server):
+        path = dat_server.socket_path()
+        assert os.path.exists(path)
+        server.send_signal(signal.SIGINT)
+        server.wait(timeout=10)
+        assert not os.path.exists(path)
+        assert dat_server.forward(["dat", "hello_world"]) is None
+
+
+class TestFallback:
+    def test_no_server_runs_in_process(self):
+        assert not os.path.exists(dat_server.socket_path())
+        assert dat_server.forward(["dat", "hello_world"]) is None
+        result = dat("hello_world")
+        assert result.returncode == 0
+        assert "hello world!" in result.stdout
+
+    def test_client_runs_in_process(self):
+        result = subprocess.run([sys.executable, "-m", "dvc_dat_client", "hello_world"],
+                                capture_output=True, text=True, env=ENV)
+        assert result.returncode == 0
+        assert "hello world!" in result.stdout
@@ -0,0 +1,104 @@
+import os
+import sys
+import time
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from dvc_dat import do, Dat, dat_speculate
+from dvc_dat.dat_cost import CostModel
+from dvc_dat.dat_speculate import _exchange
+do.mount(at="test_dat_speculate", module="tests.test_dat_speculate")
+
+TMP_PATH = "/tmp/speculate_test"
+
+
+def straggle(dat: Dat):
+    """Sleeps for the first of its 'sleeps' on its first run, else the second."""
+    first = not os.path.exists(marker := Dat.get(dat, "marker"))
+    open(marker, "a").close()
+    time.sleep(Dat.get(dat, "sleeps")[0 if first else 1])
+    run = "first" if first else "second"
+    with open(os.path.join(dat.get_path(), "out.txt"), "w") as f:
+        f.write(run)
+    return run
+
+
+def make_dats(name: str, sleeps):
+    """Makes three quick Dats, and one with the given sleeps for its two runs."""
+    return [Dat.manager.create(
+        path=f"{TMP_PATH}/{name}/run{i}", overwrite=True,
+        spec={"dat": {"do": "test_dat_speculate.straggle"},
+              "marker": f"{TMP_PATH}/{name}/marker{i}",
+              "sleeps": sleeps if i == 3 else [0, 0]}) for i in range(4)]
+
+
+@pytest.fixture
+def no_minimum():
+    """Speculates from the first moment, with expectations from this batch only."""
+    dat_speculate.MIN_SECONDS, minimum = 0, dat_speculate.MIN_SECONDS
+    os.system(f"rm -f '{TMP_PATH}/history.jsonl'")
+    do.cost_model, cost_model = CostModel(f"{TMP_PATH}/history.jsonl"), do.cost_model
+    yield
+    dat_speculate.MIN_SECONDS, do.cost_model = minimum, cost_model
+
+
+class TestSpeculation:
+    def test_duplicate_replaces_a_straggler(self, no_minimum):
+        dats = make_dats("duplicate", [30, 0])
+        start = time.time()
+        results = {r.index: r for r in do.map(None, dats, workers=4, speculate=2)}
+        assert time.time() - start < 20
+        assert results[3].result == "second" and results[3].error is None
+        with open(os.path.join(dats[3].get_path(), "out.txt")) as f:
+            assert f.read() == "second"
+        assert Dat.get(dats[3].get_results(), "dat.speculated.winner") == "duplicate"
+        assert Dat.get(dats[3].get_results(), "dat.run_time")
+        assert Dat.get(dats[0].get_results(), "dat.speculated", None) is None
+        scratch = os.path.join(Dat.manager.sync_folder, ".dat_scratch")
+        assert os.listdir(scratch) == []
+
+    def test_original_kept_if_first_to_finish(self, no_minimum):
+        dats = make_dats("original", [0.5, 30])
+        start = time.time()
+        results = {r.index: r for r in do.map(None, dats, workers=4, speculate=2)}
+        assert time.time() - start < 20
+        assert results[3].result == "first"
+        assert Dat.get(dats[3].get_results(), "dat.speculated.winner") == "original"
+        with open(os.path.join(dats[3].get_path(), "out.txt")) as f:
+            assert f.read() == "first"
+
+    def test_folders_are_only_copied_for_duplicates(self, monkeypatch):
+        copies = []
+        copy = dat_speculate._copy_entries
+        monkeypatch.setattr(dat_speculate, "_copy_entries",
+                            lambda *a: copies.append(a[0]) or copy(*a))
+        dats = make_dats("lazy", [0, 0])
+        assert not [r.error for r in do.map(None, dats, workers=4, speculate=2)
+                    if r.error]
+        assert copies == []
+
+    def test_failures_are_reported(self):
+        dats = make_dats("failing", [0, 0])[:2]
+        dats[0] = Dat.manager.create(path=dats[0].get_path(), overwrite=True,
+                                     spec={"dat": {"do": "test_dat_speculate.straggle"}})
+        results = {r.index: r for r in do.map(None, dats, workers=2, speculate=2)}
+        assert results[0].error and not results[1].error
+
+    def test_requires_processes(self):
+        with pytest.raises(ValueError):
+            list(do.map(None, [], executor="thread", speculate=2))
+
+    def test_exchange(self):
+        for name in ("a", "b"):
+            os.makedirs(f"{TMP_PATH}/swap/{name}", exist_ok=True)
+            with open(f"{TMP_PATH}/swap/{name}/file", "w") as f:
+                f.write(name)
+        _exchange(f"{TMP_PATH}/swap/a", f"{TMP_PATH}/swap/b")
+        with open(f"{TMP_PATH}/swap/a/file") as f:
+            assert f.read() == "b"
+
+
+class TestCleanup:
+    def test_cleanup(self):
+        os.system(f"rm -r '{TMP_PATH}' '{Dat.manager.sync_folder}/.dat_scratch'")
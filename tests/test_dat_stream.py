@@ -0,0 +1,131 @@
+import os
+import subprocess
+import sys
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from dvc_dat import do, Dat
+from dvc_dat import dat_stream
+from dvc_dat.dat_stream import CubeStream, read_stream, iter_partitions
+from dvc_dat.dat_tools import Cube
+
+TMP_PATH = "/tmp/stream_test"
+events = []
+
+
+def rows(dat: Dat):
+    """Yields 5 points for each Dat."""
+    for i in range(5):
+        yield {"kind": "even" if i % 2 == 0 else "odd", "i": i}
+
+
+def ten_rows(dat: Dat):
+    events.append(dat.get_path_tail())
+    return [{"i": i} for i in range(10)]
+
+
+def size(dat: Dat):
+    return len(dat.get_path_tail())
+
+
+@pytest.fixture
+def dats():
+    return [Dat.manager.create(path=f"{TMP_PATH}/dats/dat{i}", overwrite=True)
+            for i in range(3)]
+
+
+def part_files(folder: str):
+    return sorted(os.path.relpath(os.path.join(root, name), folder)
+                  for root, _, files in os.walk(folder)
+                  for name in files if name.startswith("part-"))
+
+
+class TestCubeStream:
+    def test_generators_are_points(self, dats):
+        cube = Cube(dats=dats, point_fns=[rows, size])
+        assert len(cube.points) == 18
+        assert cube.points[:2] == [{"list": "dat0", "kind": "even", "i": 0},
+                                   {"list": "dat0", "kind": "odd", "i": 1}]
+        threaded = Cube(dats=dats, point_fns=[rows, size], workers=2)
+        assert threaded.points == cube.points
+
+    def test_points_are_written_in_chunks(self, dats):
+        folder = f"{TMP_PATH}/chunks"
+        cube = Cube(dats=dats, point_fns=[rows, size], stream=folder,
+                    partition_by=["list", "kind"], chunk_rows=4)
+        assert len(cube.store) == 0 and cube.stream.rows == 18
+        assert cube.stream.chunks == 5
+        files = part_files(folder)
+        assert "list=dat0/kind=even/part-00000.csv" in files
+        assert "list=dat0/kind=__null__/part-00001.csv" in files
+        df = cube.get_df()
+        assert len(df) == 18 and set(df["list"]) == {"dat0", "dat1", "dat2"}
+        assert sorted(df["i"].dropna().tolist()) == sorted(list(range(5)) * 3)
+
+    @pytest.mark.parametrize("workers", [None, 2])
+    def test_flushes_are_interleaved_with_point_fns(self, dats, monkeypatch,
+                                                    workers):
+        flush = CubeStream.flush
+
+        def logged_flush(stream):
+            if len(stream.store):
+                events.append("flush")
+            flush(stream)
+        monkeypatch.setattr(dat_stream.CubeStream, "flush", logged_flush)
+        events.clear()
+        Cube(dats=dats, point_fns=[ten_rows], stream=f"{TMP_PATH}/interleaved",
+             chunk_rows=10, workers=workers)
+        if workers:     # (The Dats of a batch may run in either order)
+            assert sorted(events[:2]) == ["dat0", "dat1"]
+            assert events[2:] == ["flush", "flush", "dat2", "flush"]
+        else:
+            assert events == ["dat0", "flush", "dat1", "flush", "dat2", "flush"]
+
+    def test_partitions_are_read_lazily(self, dats):
+        folder = f"{TMP_PATH}/lazy"
+        Cube(dats=dats, point_fns=[rows], stream=folder, partition_by=["list"])
+        partitions = list(iter_partitions(folder, 1))
+        assert [values for values, _ in partitions] == [
+            {"list": "dat0"}, {"list": "dat1"}, {"list": "dat2"}]
+        assert [len(df) for _, df in partitions] == [5, 5, 5]
+        assert len(read_stream(folder)) == 15
+
+    def test_streams_replace_only_streams(self, dats):
+        folder = f"{TMP_PATH}/replaced"
+        Cube(dats=dats, point_fns=[rows], stream=folder)
+        Cube(dats=dats[:1], point_fns=[rows], stream=folder)
+        assert len(read_stream(folder)) == 5
+        with pytest.raises(Exception):
+            CubeStream(f"{TMP_PATH}/dats")
+        with pytest.raises(ValueError):
+            CubeStream(f"{TMP_PATH}/bad", chunk_rows=0)
+
+    def test_dat_report_stream(self):
+        spec = do.expand_spec("rpt")
+        Dat.set(spec, "dat_report.folder", TMP_PATH)
+        Dat.set(spec, "dat_report.stream", True)
+        Dat.set(spec, "dat_report.chunk_rows", 10)
+        folder = do(spec)
+        assert folder == f"{TMP_PATH}/RPT_points"
+        assert len(read_stream(folder)) == 48
+        reports = [name for name in os.listdir(TMP_PATH) if name.endswith(".xlsx")]
+        assert len(reports) == len(list(iter_partitions(folder, 1))) > 1
+
+
+class TestLazyImports:
+    def test_modules_are_reachable_from_the_package(self):
+        code = "import dvc_dat; print(dvc_dat.dat_stream.CubeStream.__module__, " \
+               "dvc_dat.dat_columns.ColumnStore.__module__)"
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.dirname(
+                                    os.path.abspath(__file__))))
+        assert result.stdout.split()[-2:] == ["dvc_dat.dat_stream",
+                                              "dvc_dat.dat_columns"]
+
+
+class TestCleanup:
+    def test_cleanup(self):
+        os.system(f"rm -r '{TMP_PATH}'")
+        os.system("rm -r test_sync_folder/anonymous")  # remove all anon dats
+        Dat.manager.load("dat_report").delete()
@@ -0,0 +1,77 @@
+import os
+import sys
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from dvc_dat import do, do_argv, Dat, DatContainer
+from dvc_dat.dat_sweep import sweep_points, parse_sweep_arg
+do.mount(at="test_dat_sweep", module="tests.test_dat_sweep")
+
+SWEEP_PATH = "sweep_test/sweep"
+TEMPLATE = {"dat": {"do": "test_dat_sweep.area", "path": SWEEP_PATH,
+                    "path_overwrite": True},
+            "shape": {"width": 1, "height": 1}}
+
+
+def area(dat: Dat):
+    width, height = Dat.get(dat, "shape.width"), Dat.get(dat, "shape.height")
+    if width < 0:
+        raise ValueError("Negative width")
+    return width * height
+
+
+def sweep_spec(params, **sweep):
+    return do.merge_configs(TEMPLATE, {"dat": {"sweep": {"params": params, **sweep}}})
+
+
+class TestSweepPoints:
+    def test_product_and_zip(self):
+        params = {"a": [1, 2], "b": ["x", "y"]}
+        assert sweep_points(params) == [{"a": 1, "b": "x"}, {"a": 1, "b": "y"},
+                                        {"a": 2, "b": "x"}, {"a": 2, "b": "y"}]
+        assert sweep_points(params, zip_=True) == [{"a": 1, "b": "x"},
+                                                   {"a": 2, "b": "y"}]
+        with pytest.raises(Exception, match="equal lengths"):
+            sweep_points({"a": [1, 2], "b": [1]}, zip_=True)
+
+    def test_parse_sweep_arg(self):
+        assert parse_sweep_arg("model.lr=0.1, 0.01,adam") == \
+               ("model.lr", [0.1, 0.01, "adam"])
+
+
+class TestRunSweep:
+    @pytest.mark.parametrize("executor", ["thread", "process"])
+    def test_grid_sweep(self, executor):
+        summary = do(sweep_spec({"shape.width": [1, 2, 3], "shape.height": [10, 20]},
+                                workers=3, executor=executor))
+        assert summary == {"path": SWEEP_PATH, "total": 6, "done": 6, "failed": 0}
+        container = Dat.manager.load(SWEEP_PATH)
+        assert isinstance(container, DatContainer)
+        assert len(container.get_dats()) == 6
+        points = container.get_results()["sweep"]["points"]
+        assert [p["result"] for p in points] == [10, 20, 20, 40, 30, 60]
+        child = Dat.manager.load(f"{SWEEP_PATH}/{points[3]['point']}")
+        assert Dat.get(child, "shape") == {"width": 2, "height": 20}
+        assert "sweep" not in child.get_spec()["dat"]
+
+    def test_failed_points_are_recorded(self):
+        summary = do(sweep_spec({"shape.width": [2, -1]}, executor="thread"))
+        assert (summary["done"], summary["failed"]) == (1, 1)
+        points = Dat.manager.load(SWEEP_PATH).get_results()["sweep"]["points"]
+        assert points[1]["status"] == "failed"
+        assert "Negative width" in points[1]["error"]
+
+    def test_cli_sweep(self):
+        do.mount(value=TEMPLATE, at="sweep_test_cmd")
+        do_argv(["dat", "--sweep", "shape.width=1,2", "--sweep", "shape.height=3,4",
+                 "--zip", "sweep_test_cmd", "--jobs", "2"])
+        container = Dat.manager.load(SWEEP_PATH)
+        points = container.get_results()["sweep"]["points"]
+        assert [p["result"] for p in points] == [3, 8]
+        assert Dat.get(container, "dat.sweep.workers") == 2
+
+
+class TestCleanup:
+    def test_cleanup(self):
+        os.system(f"rm -r '{Dat.manager.resolve_path('sweep_test')}'")
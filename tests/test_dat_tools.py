@@ -158,6 +158,61 @@ class TestFromDat:
         ]
 
 
+def path_tail(dat: Dat):
+    return [{"tail": dat.get_path_tail()}, {"tail_length": len(dat.get_path_tail())}]
+
+
+def fail_on_odd(dat: Dat):
+    if int(dat.get_path_tail()[-1]) % 2:
+        raise ValueError("Odd Dat")
+    return 0
+
+
+def spec_val(dat: Dat):
+    return Dat.get(dat.get_spec(), "val")
+
+
+@pytest.fixture
+def many_dats():
+    return [Dat.manager.create(path=f"{TMP_PATH}_many/dat{i}", overwrite=True)
+            for i in range(8)]
+
+
+class TestParallelCube:
+    @pytest.mark.parametrize("executor", ["thread", "process"])
+    def test_points_match_a_serial_cube(self, many_dats, executor):
+        fns = [always_17, "test_dat_tools.path_tail"]
+        serial = Cube(dats=[many_dats], point_fns=fns)
+        parallel = Cube(dats=[many_dats], point_fns=fns, workers=3, executor=executor)
+        assert parallel.points == serial.points
+        assert len(parallel.points) == 24
+
+    def test_process_cubes_load_recreated_dats(self):
+        for val in [1, 2, 3]:
+            dat = Dat.manager.create(path=f"{TMP_PATH}_recreated", overwrite=True,
+                                     spec={"val": val})
+            cube = Cube(dats=[dat], point_fns=["test_dat_tools.spec_val"],
+                        workers=2, executor="process")
+            assert cube.points == [{"list": "job_test_recreated", "spec_val": val}]
+
+    def test_errors_are_recorded(self, many_dats):
+        cube = Cube(dats=many_dats[:2], point_fns=[always_17, fail_on_odd], workers=2)
+        assert cube.points == [
+            {"list": "dat0", "always_17": 17, "fail_on_odd": 0},
+            {"list": "dat1", "always_17": 17,
+             "error": "fail_on_odd: ValueError: Odd Dat"}]
+        with pytest.raises(ValueError):
+            Cube(dats=many_dats[:2], point_fns=[fail_on_odd])    # Serial cubes raise
+
+    def test_dat_report_jobs(self):
+        spec = do.expand_spec("rpt.simple")
+        serial = do(spec)
+        Dat.set(spec, "dat_report.jobs", 4)
+        assert do(spec).equals(serial)
+        Dat.set(spec, "dat_report.executor", "process")
+        assert do(spec).equals(serial)
+
+
 class TestGetExcel:
     def test_get_excel(self, df_sales):
         path = to_excel(df_sales, title="test1", show=False)
@@ -214,6 +269,8 @@ class TestCleanup:
     def test_cleanup(self):
         os.system("rm *.xlsx")  # remove all excel files
         os.system("rm -r test_sync_folder/anonymous")  # remove all anon dats
+        os.system(f"rm -r '{TMP_PATH}_many'")
+        os.system(f"rm -r '{TMP_PATH}_recreated'")
         Dat.manager.load("simple_report").delete()
         Dat.manager.load("dat_report").delete()
 
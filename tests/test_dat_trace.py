@@ -0,0 +1,62 @@
+import os
+import sys
+import json
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from dvc_dat import do, Dat, DoManager
+from dvc_dat.dat_trace import tracing, span, is_tracing
+from dvc_dat.dat_tools import Cube
+
+
+def inner(dat: Dat):
+    return Dat.get(dat, "n")
+
+
+class TestSpans:
+    def test_spans_are_noops_when_not_tracing(self):
+        assert not is_tracing()
+        with span("nothing") as s:
+            assert s is None
+
+    def test_nested_do_calls_form_a_tree(self, tmp_path):
+        def outer(_dat: Dat):
+            sub = do_.dat_from_template({"dat": {"do": "inner"}, "n": 7})
+            result = do_(sub)
+            sub.delete()
+            return result
+        do_ = DoManager()
+        do_.mount(at="inner", value=inner)
+        do_.mount(at="outer", value=outer)
+        top = do_.dat_from_template({"dat": {"do": "outer"}})
+        with tracing() as trace:
+            assert do_(top) == 7
+        assert trace.paths == [os.path.join(top.get_path(), "trace.json"),
+                               os.path.join(top.get_path(), "trace.jsonl")]
+        with open(trace.paths[1]) as f:
+            spans = {s["id"]: s for s in map(json.loads, f)}
+        by_name = {}
+        for s in spans.values():
+            by_name.setdefault(s["name"], []).append(s)
+        run_outer, run_inner = sorted(by_name["_run_dat"], key=lambda s: s["depth"])
+        assert spans[run_outer["parent"]]["name"] == "do"
+        assert spans[spans[run_inner["parent"]]["parent"]] == run_outer
+        assert spans[by_name["DatManager.create"][0]["parent"]] == run_outer
+        with open(trace.paths[0]) as f:
+            events = json.load(f)["traceEvents"]
+        assert {e["ph"] for e in events} == {"X"}
+        assert len(events) == len(spans)
+        top.delete()
+
+    def test_cube_and_loads_are_traced(self, tmp_path):
+        dat = Dat.manager.create(path=str(tmp_path / "traced"), spec={})
+        with tracing(folder=str(tmp_path)) as trace:
+            Cube(dats=[dat.get_path()], point_fns=[lambda d: 1])
+        with open(trace.paths[1]) as f:
+            names = [json.loads(line)["name"] for line in f]
+        assert "Cube._add_dats" in names and "DatManager.load" in names
+
+
+class TestCleanup:
+    def test_cleanup(self):
+        os.system("rm -r test_sync_folder/anonymous")  # remove all anon dats
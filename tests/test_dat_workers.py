@@ -0,0 +1,93 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from dvc_dat import do, Dat, DoManager
+from dvc_dat.dat_workers import WarmPool
+do.mount(at="test_dat_workers", module="tests.test_dat_workers")
+
+TMP_PATH = "workers_test"
+_ballast = []
+
+
+def worker_pid(dat: Dat = None):
+    return os.getpid()
+
+
+def spec_val(dat: Dat):
+    return Dat.get(dat, "val")
+
+
+def grow(mb: int):
+    _ballast.append(bytearray(mb * 2**20))
+    return os.getpid()
+
+
+def pids(pool: WarmPool, fn, *args, n=8):
+    return {pool.submit(fn, *args).result() for _ in range(n)}
+
+
+class TestWarmPool:
+    def test_workers_are_reused(self):
+        pool = WarmPool(2)
+        try:
+            first = pids(pool, worker_pid)
+            assert os.getpid() not in first
+            assert len(first | pids(pool, worker_pid)) <= 2
+            assert pool.recycles == 0
+        finally:
+            pool.shutdown()
+
+    def test_recycled_after_max_tasks(self):
+        pool = WarmPool(1, max_tasks=3)
+        try:
+            before = pids(pool, worker_pid, n=3)
+            after = pids(pool, worker_pid, n=3)
+            assert len(before) == len(after) == 1
+            assert before != after
+            assert pool.recycles == 1
+        finally:
+            pool.shutdown()
+
+    def test_recycled_after_memory_growth(self):
+        pool = WarmPool(1, max_growth_mb=20)
+        try:
+            first = pool.submit(grow, 50).result()
+            assert pool.submit(worker_pid).result() != first
+        finally:
+            pool.shutdown()
+
+
+class TestDoManagerPool:
+    def test_map_reuses_workers_until_code_changes(self):
+        manager = DoManager()
+        manager.mount(at="test_dat_workers", module="tests.test_dat_workers")
+        dats = [Dat.manager.create(path=f"{TMP_PATH}/run{{unique}}",
+                                   spec={"dat": {"do": "test_dat_workers.worker_pid"}})
+                for _ in range(4)]
+        first = {r.result for r in manager.map(None, dats, workers=1)}
+        pool = manager.worker_pool
+        assert {r.result for r in manager.map(None, dats, workers=1)} == first
+        manager.mount(value={"x": 1}, at="some_value")
+        assert {r.result for r in manager.map(None, dats, workers=1)} != first
+        assert manager.worker_pool is pool and pool.recycles == 1
+        pool.shutdown()
+
+    def test_map_loads_recreated_dats(self):
+        manager = DoManager()
+        manager.mount(at="test_dat_workers", module="tests.test_dat_workers")
+        try:
+            for val in [1, 2, 3]:
+                dat = Dat.manager.create(
+                    path=f"{TMP_PATH}/recreated", overwrite=True,
+                    spec={"dat": {"do": "test_dat_workers.spec_val"}, "val": val})
+                assert [r.result for r in manager.map(None, [dat], workers=2)] == \
+                       [val]
+        finally:
+            manager.worker_pool.shutdown()
+
+
+class TestCleanup:
+    def test_cleanup(self):
+        os.system(f"rm -r '{Dat.manager.resolve_path(TMP_PATH)}'")
@@ -1,5 +1,7 @@
 import os
 import sys
+import time
+import asyncio
 from typing import Callable
 import pytest
 import subprocess
@@ -96,6 +98,31 @@ class TestCommandLine:
                  """  jjj  k  lll  m  nnn  o  ppp  q  rrr  s  ttt  u  vvv  w  xxx  y"""
         assert run_capture_tail(line) == expect
 
+    def test_profile_flag_parsing(self):
+        from dvc_dat.do_fn import _parse_argv
+        assert _parse_argv(["--profile", "my_letters"])[1:] == \
+            (["my_letters"], {}, {"profile": "cpu"})
+        assert _parse_argv(["--profile", "alloc", "my_letters", "x"])[1:] == \
+            (["my_letters", "x"], {}, {"profile": "alloc"})
+
+    def test_dat_flags_after_the_command_are_kwargs(self):
+        from dvc_dat.do_fn import _parse_argv
+        assert _parse_argv(["--stats", "my_cmd", "--profile", "x", "--estimate"]) == \
+            ({}, ["my_cmd"], {"profile": "x", "estimate": True}, {"stats": True})
+        assert _parse_argv(["my_cmd", "--resume", "dat1", "--trace"])[2:] == \
+            ({"resume": "dat1", "trace": True}, {})
+        assert _parse_argv(["my_cmd", "--sweep", "a=1,2", "--zip"])[:3] == \
+            ({}, ["my_cmd"], {"sweep": "a=1,2", "zip": True})
+        assert _parse_argv(["--sweep", "a=1,2", "my_cmd"])[0] == \
+            {"dat": {"sweep": {"params": {"a": [1, 2]}}}}
+
+    def test_profiled_run_saves_profile_in_dat(self):
+        prefix = "# CPU profile saved to "
+        lines = run_capture("./do --profile my_letters").split("\n")
+        saved = [line for line in lines if line.startswith(prefix)]
+        assert len(saved) == 1 and saved[0].endswith("/profile.prof")
+        assert os.path.exists(saved[0][len(prefix):])
+
     def test_setting_multiple_params_at_once(self):
         line = """./do my_letters --sets dat.title=Quickie,start=100,end=110"""
         expect = """D  e  fff  g  h  JACKPOT JACKPOT JACKPOT   j  k  lll  m"""
@@ -179,6 +206,316 @@ class TestDatCallArgs:
         assert do_("baz", a=1, b=2, c=3) == {"a": 1, "b": 2, "c": 3, "d": 44}
 
 
+def _square_or_fail(dat, *_args, **_kwargs):
+    n = dat.get_spec()["n"]
+    if n == 3:
+        raise ValueError("three is not allowed")
+    return n * n
+
+
+class TestResourceAccounting:
+    def test_resources_recorded(self, empty_do_mgr):
+        def busy(_dat):
+            with open(__file__) as f:
+                f.read()
+            return sum(i * i for i in range(200_000))
+        do_ = empty_do_mgr
+        do_.mount(at="busy", value=busy)
+        dat = do_.dat_from_template({"dat": {"do": "busy"}})
+        do_(dat)
+        resources = dat.get_results()["dat"]["resources"]
+        assert resources["wall_time"] > 0
+        assert resources["user_time"] + resources["system_time"] > 0
+        assert resources["peak_rss_mb"] > 0
+        assert resources["read_bytes"] > 0
+        dat.delete()
+
+
+class TestStats:
+    def test_do_stats(self, empty_do_mgr, tmp_path):
+        do_ = empty_do_mgr
+        path = tmp_path / "cfg.json"
+        path.write_text('{"a": {"b": 1}}')
+        do_.mount(at="cfg", file=str(path))
+        assert do_.load("cfg.a") == {"b": 1}
+        assert do_.load("cfg.a.b") == 1
+        stats = do_.stats()
+        assert stats["file_loads"] == 1 and stats["module_loads"] == 0
+        assert stats["loads_per_base"] == {"cfg": 2}
+        assert stats["deep_copies"] >= 2 and stats["deep_copy_bytes"] > 0
+
+    def test_templates_are_expanded_once(self, empty_do_mgr):
+        from dvc_dat import Dat
+        do_ = empty_do_mgr
+        do_.mount(at="base_cfg", value={"dat": {"do": "count_to"}, "n": 1})
+        do_.mount(at="count_to", value=_count_to)
+        do_.expand_spec("base_cfg")
+        before = do_.stats()["deep_copies"]
+        template = {"dat": {"base": "base_cfg", "path": "test_dats/once{unique}"}}
+        assert do_(template) == 1
+        assert do_.stats()["deep_copies"] - before == 2    # The template and its base
+        Dat.manager.load("test_dats/once").delete()
+
+    def test_dat_stats(self):
+        from dvc_dat import Dat
+        before = Dat.manager.stats()
+        dat = Dat.manager.create(path="stats_test", spec={}, overwrite=True)
+        Dat.manager.load("stats_test")
+        del dat
+        Dat.manager.load(Dat.manager.resolve_path("stats_test")).delete()
+        after = Dat.manager.stats()
+        assert after["dat_cache_hits"] > before["dat_cache_hits"]
+        assert after["spec_files_parsed"] == before["spec_files_parsed"] + 1
+        assert after["resolve_path_probes"] > before["resolve_path_probes"]
+
+    def test_stats_command(self):
+        import json
+        stats = json.loads(run_capture("./do --stats"))
+        assert set(stats) == {"dats", "do"}
+
+
+class TestMap:
+    @pytest.mark.parametrize("executor", ["thread", "process"])
+    def test_map_templates(self, empty_do_mgr, executor):
+        do_ = empty_do_mgr
+        do_.mount(at="square", value=_square_or_fail)
+        templates = [{"dat": {"do": "square"}, "n": n} for n in range(5)]
+        results = sorted(do_.map(None, templates, workers=2, executor=executor))
+        assert [r.result for r in results] == [0, 1, 4, None, 16]
+        assert "three is not allowed" in results[3].error
+        assert all(r.error is None for i, r in enumerate(results) if i != 3)
+        assert "run_time" in results[4].dat.get_results()["dat"]
+        for r in results:
+            r.dat.delete()
+
+    def test_map_with_do_spec(self, empty_do_mgr):
+        do_ = empty_do_mgr
+        do_.mount(at="square", value=_square_or_fail)
+        dats = [do_.dat_from_template({"n": n}) for n in (2, 5)]
+        results = do_.map("square", dats, workers=2)
+        assert sorted(r.result for r in results) == [4, 25]
+        for dat in dats:
+            dat.delete()
+
+
+async def _slow_double(dat, *_args, **_kwargs):
+    await asyncio.sleep(0.2)
+    return 2 * dat.get_spec()["n"]
+
+
+class TestAsync:
+    def test_acall_awaits_coroutine_do_fn(self, empty_do_mgr):
+        do_ = empty_do_mgr
+        do_.mount(at="slow_double", value=_slow_double)
+        dat = do_.dat_from_template({"dat": {"do": "slow_double"}, "n": 21})
+        assert asyncio.run(do_.acall(dat)) == 42
+        assert dat.get_results()["dat"]["run_time"] >= "00:00:00.200"
+        assert do_(dat) == 42      # The sync path runs the coroutine too
+        dat.delete()
+
+    def test_amap_runs_concurrently(self, empty_do_mgr):
+        do_ = empty_do_mgr
+        do_.mount(at="slow_double", value=_slow_double)
+        templates = [{"dat": {"do": "slow_double"}, "n": n} for n in range(20)]
+
+        async def collect():
+            return [r async for r in do_.amap(None, templates, limit=20)]
+        start = time.time()
+        results = sorted(asyncio.run(collect()))
+        assert time.time() - start < 2.0
+        assert [r.result for r in results] == [2 * n for n in range(20)]
+        assert all("run_at" in r.dat.get_results()["dat"] for r in results)
+        for r in results:
+            r.dat.delete()
+
+
+class TestEphemeral:
+    def test_ephemeral_runs_write_nothing(self, empty_do_mgr):
+        def folder_count(_dat, n):
+            return n, len(os.listdir("test_sync_folder/anonymous"))
+        do_ = empty_do_mgr
+        do_.mount(at="folder_count", value=folder_count)
+        os.makedirs("test_sync_folder/anonymous", exist_ok=True)
+        before = len(os.listdir("test_sync_folder/anonymous"))
+        spec = {"dat": {"do": "folder_count", "ephemeral": True}}
+        assert [do_(spec, n) for n in range(3)] == [(n, before) for n in range(3)]
+        assert len(os.listdir("test_sync_folder/anonymous")) == before
+
+    def test_ephemeral_profiles_are_kept(self, empty_do_mgr):
+        import shutil
+        from dvc_dat import Dat
+        from dvc_dat.dat_profile import EPHEMERAL_PROFILES
+        do_ = empty_do_mgr
+        do_.mount(at="square", value=lambda _dat, n: n * n)
+        folder = os.path.join(Dat.manager.sync_folder, EPHEMERAL_PROFILES)
+        shutil.rmtree(folder, ignore_errors=True)
+        do_.profile = "cpu"
+        assert do_({"dat": {"do": "square", "ephemeral": True}}, 3) == 9
+        [name] = os.listdir(folder)
+        assert os.listdir(os.path.join(folder, name)) == ["profile.prof"]
+        shutil.rmtree(folder)
+
+    def test_ephemeral_dats_can_be_persisted(self, empty_do_mgr):
+        def write_file(dat):
+            with open(os.path.join(dat.get_path(), "out.txt"), "w") as f:
+                f.write("output")
+            return "done"
+        do_ = empty_do_mgr
+        do_.mount(at="write_file", value=write_file)
+        dat = do_.dat_from_template({"dat": {"do": "write_file", "ephemeral": True,
+                                             "path": "test_dats/ephemeral{unique}"}})
+        assert dat.is_ephemeral()
+        assert do_(dat) == "done"
+        assert dat.get_results()["dat"]["run_time"]
+        saved = dat.persist()
+        assert not saved.is_ephemeral()
+        assert saved.get_path_name().startswith("test_dats/ephemeral")
+        with open(os.path.join(saved.get_path(), "out.txt")) as f:
+            assert f.read() == "output"
+        from dvc_dat import Dat
+        assert Dat.manager.load_results(saved)["dat"]["run_time"]
+        saved.delete()
+
+    def test_map_creates_regular_dats(self, empty_do_mgr):
+        do_ = empty_do_mgr
+        do_.mount(at="square", value=_square_or_fail)
+        templates = [{"dat": {"do": "square", "ephemeral": True}, "n": 2}]
+        results = list(do_.map(None, templates, executor="thread"))
+        assert results[0].result == 4 and not results[0].dat.is_ephemeral()
+        results[0].dat.delete()
+
+
+def _count_to(dat, *_args, **_kwargs):
+    """Counts to 'n' from its last checkpoint, failing at 'fail_at' if it is set."""
+    count = dat.restore(0)
+    while count < dat.get_spec()["n"]:
+        count += 1
+        dat.checkpoint(count)
+        if count == dat.get_spec().get("fail_at"):
+            dat.get_spec()["fail_at"] = None      # Only fails the first time
+            raise ValueError(f"Failed at {count}")
+    return count
+
+
+class TestCheckpoints:
+    def test_checkpoint_and_restore(self, empty_do_mgr):
+        dat = empty_do_mgr.dat_from_template({})
+        assert dat.restore() is None and dat.restore(7) == 7
+        dat.checkpoint({"step": 3})
+        assert dat.restore() == {"step": 3}
+        dat.checkpoint({"step": 4})
+        assert dat.get_checkpoint()["state"] == {"step": 4}
+        assert not [f for f in os.listdir(dat.get_path()) if f.endswith(".tmp")]
+        dat.delete()
+
+    def test_failed_runs_resume_from_their_checkpoint(self, empty_do_mgr):
+        do_ = empty_do_mgr
+        do_.mount(at="count_to", value=_count_to)
+        dat = do_.dat_from_template({"dat": {"do": "count_to"}, "n": 5, "fail_at": 3})
+        with pytest.raises(Exception):
+            do_(dat)
+        assert dat.get_results()["dat"]["attempts"] == 1
+        assert do_(dat) == 5
+        results = dat.get_results()["dat"]
+        assert results["attempts"] == 2
+        assert results["total_run_time"] >= results["run_time"]
+        dat.delete()
+
+    def test_successful_runs_remove_their_checkpoint(self, empty_do_mgr):
+        do_ = empty_do_mgr
+        do_.mount(at="count_to", value=_count_to)
+        dat = do_.dat_from_template({"dat": {"do": "count_to"}, "n": 3})
+        assert do_(dat) == 3
+        assert dat.get_checkpoint() == {} and dat.restore() is None
+        dat.get_spec()["n"] = 2
+        assert do_(dat) == 2      # Counts afresh, rather than from 3
+        assert dat.get_results()["dat"]["attempts"] == 2
+        dat.delete()
+
+    def test_total_run_times_past_a_day(self, empty_do_mgr):
+        from dvc_dat.do_fn import _format_run_time, _parse_run_time
+        assert _format_run_time(3 * 86400 + 3723.5) == "73:02:03.500"
+        assert _parse_run_time("73:02:03.500") == 3 * 86400 + 3723.5
+        do_ = empty_do_mgr
+        do_.mount(at="count_to", value=_count_to)
+        dat = do_.dat_from_template({"dat": {"do": "count_to"}, "n": 1})
+        dat.get_results()["dat"] = {"attempts": 4, "total_run_time": "25:00:00.000"}
+        do_(dat)
+        assert dat.get_results()["dat"]["total_run_time"].startswith("25:00:0")
+        dat.delete()
+
+    def test_killed_runs_are_counted_from_their_checkpoint(self, empty_do_mgr):
+        import multiprocessing
+        from dvc_dat import Dat
+
+        def checkpoint_and_die(dat):
+            if (state := dat.restore()) is not None:
+                return state
+            time.sleep(0.2)
+            dat.checkpoint("partial")
+            os._exit(1)
+        do_ = empty_do_mgr
+        do_.mount(at="die", value=checkpoint_and_die)
+        dat = do_.dat_from_template({"dat": {"do": "die"}})
+        process = multiprocessing.get_context("fork").Process(target=do_, args=(dat,))
+        process.start()
+        process.join()
+        resumed = Dat.manager.load(dat.get_path())
+        assert do_(resumed) == "partial"
+        results = resumed.get_results()["dat"]
+        assert results["attempts"] == 2
+        assert results["total_run_time"] >= "00:00:00.200"
+        dat.delete()
+
+    def test_resume_from_the_command_line(self):
+        from dvc_dat import Dat
+        dat = Dat.manager.create(path="test_dats/resumed", overwrite=True,
+                                 spec={"dat": {"do": "dat_bench.bench_point"}})
+        for _ in range(2):
+            run_capture(f"./do --resume {dat.get_path_name()}")
+        assert Dat.manager.load_results(dat)["dat"]["attempts"] == 2
+        dat.delete()
+
+
+class TestReload:
+    @staticmethod
+    def _write(path, text):
+        with open(path, "w") as f:
+            f.write(text)
+        stat = os.stat(path)     # force an mtime change on coarse filesystems
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    def test_explicit_reload_of_module(self, empty_do_mgr, tmp_path):
+        do_ = empty_do_mgr
+        path = str(tmp_path / "metric.py")
+        self._write(path, "def __main__():\n    return 1\n")
+        do_.mount(at="metric", module=path)
+        assert do_("metric") == 1
+        self._write(path, "def __main__():\n    return 2\n")
+        assert do_("metric") == 1
+        assert do_.reload() == ["metric"]
+        assert do_("metric") == 2
+
+    def test_auto_reload_purges_spec_expansions(self, empty_do_mgr, tmp_path):
+        do_ = empty_do_mgr
+        base_path, spec_path = str(tmp_path / "base.json"), str(tmp_path / "top.yaml")
+        self._write(base_path, '{"a": 1, "b": 1}')
+        self._write(spec_path, "dat:\n  base: base\nb: 2\n")
+        do_.mount(at="base", file=base_path)
+        do_.mount(at="top", file=spec_path)
+        assert do_.expand_spec("top")["a"] == 1
+        assert "top" in do_.expanded_specs
+        self._write(base_path, '{"a": 3, "b": 1}')
+        assert do_.expand_spec("top")["a"] == 1
+        do_.auto_reload = True
+        assert do_.expand_spec("top") == {"dat": {"base": "base"}, "a": 3, "b": 2}
+
+    def test_reload_ignores_directly_mounted_modules(self, empty_do_mgr):
+        do_ = empty_do_mgr
+        do_.mount(at="yyy", module="dvc_dat")
+        assert do_.reload("yyy") == []
+
+
 class TestCleanup:
     def test_cleanup(self):
         os.system("rm -r test_sync_folder/anonymous")  # remove all anon dats